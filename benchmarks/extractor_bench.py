@@ -0,0 +1,156 @@
+"""
+Microbenchmarks for CodeExtractor.extract_code.
+
+Times extraction over large and adversarial model outputs (huge code
+blocks, long explanations, unclosed fences and <code> tags, many small
+blocks) plus every coder response in the benchmark corpus. Each synthetic
+case is also run at 4x its size: for a linear-time extractor that should
+cost about 4x as much, and a much larger growth factor points to a rescan.
+
+    python -m benchmarks.extractor_bench
+    python -m benchmarks.extractor_bench --size 200000 --legacy
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+from core.code_extractor import CodeExtractor
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+# Growth factor for 4x input above which a case is reported as superlinear
+SUPERLINEAR_GROWTH = 8.0
+
+
+def _program(size):
+    lines = []
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines.append(f"def step_{index}(value):\n    return value * {index} + 1\n")
+        index += 1
+    lines.append("print(step_0(1))")
+    return "\n".join(lines)
+
+
+def _prose(size):
+    sentence = "This function multiplies the value and adds one, which keeps the result positive. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+
+# name -> function building a response of roughly `size` characters
+CASES = {
+    "large_block": lambda size: "Here is the program:\n```python\n" + _program(size) + "\n```\nIt prints 1.",
+    "long_explanation": lambda size: "```python\nprint('hi')\n```\n" + _prose(size),
+    "many_blocks": lambda size: "\n\n".join(
+        f"Step {i}:\n```python\nvalue_{i} = {i}\n```" for i in range(size // 40)
+    ),
+    "plain_code": lambda size: "Here's what I'll do:\n" + _program(size) + "\nThis prints 1.",
+    "unclosed_code_tags": lambda size: "<code>x = 1 " * (size // 12),
+    "unclosed_fence": lambda size: "```python\n" + _program(size),
+    "foreign_fences": lambda size: "```bash\npip install nothing\n" * (size // 28),
+    "fence_whitespace": lambda size: ("```python" + " " * 200) * (size // 209),
+}
+
+
+def legacy_extract_code(text):
+    """The regex extractor this module replaced, kept for comparison"""
+    for pattern in (r'```python\s*\n(.*?)\n```', r'```\s*\n(.*?)\n```', r'<code>(.*?)</code>'):
+        matches = re.findall(pattern, text, re.DOTALL)
+        if matches:
+            return max(matches, key=len).strip()
+    code_lines = []
+    in_code = False
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith(('Here', 'This', 'The', 'I', 'You', 'Let', 'Now', 'First', 'Note:')):
+            continue
+        if stripped and (
+            stripped.startswith(('import ', 'from ', 'def ', 'class ', 'if ', 'for ', 'while ', '@', '#'))
+            or '=' in stripped
+            or stripped.startswith(('print(', 'return ', 'yield ', 'raise ', 'try:', 'except'))
+            or in_code
+        ):
+            code_lines.append(line)
+            in_code = True
+        elif in_code and (stripped == '' or stripped.startswith(' ')):
+            code_lines.append(line)
+    if code_lines:
+        extracted = '\n'.join(code_lines).strip()
+        if len(extracted) > 20:
+            return extracted
+    return text.strip()
+
+
+def corpus_responses(corpus_dir=CORPUS_DIR):
+    """Coder responses from the end-to-end benchmark corpus"""
+    responses = {}
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.json"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        name = os.path.splitext(os.path.basename(path))[0]
+        for role, scripted in entry.get("responses", {}).items():
+            if role in ("coder", "patcher"):
+                for index, response in enumerate(scripted):
+                    if isinstance(response, list):
+                        response = "".join(response)
+                    responses[f"corpus/{name}/{role}{index}"] = response
+    return responses
+
+
+def measure(extract, text, repeat):
+    """Median seconds per call; the first (cold analysis cache) call is not counted"""
+    extract(text)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmark CodeExtractor.extract_code")
+    parser.add_argument("--size", type=int, default=50000, help="Characters per synthetic response")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--legacy", action="store_true", help="Also time the old regex extractor (slow on adversarial cases)")
+    parser.add_argument("--fail-on-superlinear", action="store_true",
+                        help=f"Exit 1 when 4x input costs more than {SUPERLINEAR_GROWTH:g}x time")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    header = f"{'case':<40} {'chars':>8} {'ms':>9} {'4x ms':>9} {'growth':>7}"
+    print(header + (f" {'legacy ms':>10}" if args.legacy else ""))
+
+    superlinear = []
+    for name, build in CASES.items():
+        text = build(args.size)
+        elapsed = measure(CodeExtractor.extract_code, text, args.repeat)
+        elapsed_4x = measure(CodeExtractor.extract_code, build(args.size * 4), args.repeat)
+        growth = elapsed_4x / elapsed if elapsed else 0.0
+        if growth > SUPERLINEAR_GROWTH:
+            superlinear.append(name)
+        row = f"{name:<40} {len(text):>8} {elapsed * 1000:>9.3f} {elapsed_4x * 1000:>9.3f} {growth:>6.1f}x"
+        if args.legacy:
+            row += f" {measure(legacy_extract_code, text, args.repeat) * 1000:>10.3f}"
+        print(row)
+
+    for name, text in corpus_responses().items():
+        row = f"{name:<40} {len(text):>8} {measure(CodeExtractor.extract_code, text, args.repeat) * 1000:>9.3f}"
+        if args.legacy:
+            row += f" {'':>9} {'':>7} {measure(legacy_extract_code, text, args.repeat) * 1000:>10.3f}"
+        print(row)
+
+    if superlinear:
+        print(f"\nSuperlinear growth: {', '.join(superlinear)}")
+    return 1 if superlinear and args.fail_on_superlinear else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
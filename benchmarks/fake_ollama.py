@@ -0,0 +1,259 @@
+"""
+Local stand-in for the Ollama HTTP API.
+
+Replays scripted responses (plain strings, split into word-sized tokens) or
+recorded responses (lists of the exact chunks a real server streamed) with a
+configurable time-to-first-token and token rate. Model residency is
+simulated too: a request for a model that isn't loaded first pays load_time,
+at most max_loaded models stay loaded (least recently used ones are evicted),
+/api/ps lists them, and keep_alive=0 unloads a model. Setting failing makes
+every request answer 503. Used by the benchmark harness and by tests that
+need a real HTTP server.
+
+Run standalone:
+    python -m benchmarks.fake_ollama --port 11434 --script script.json
+where script.json maps model names to lists of responses.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+def tokenize(text):
+    """Split a scripted response into word-sized streaming tokens"""
+    return TOKEN_PATTERN.findall(text)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.owner
+        if server.failing:
+            self.send_error(503)
+            return
+        if self.path == "/api/tags":
+            body = {"models": [{"name": name} for name in sorted(server.script)]}
+        elif self.path == "/api/version":
+            body = {"version": "0.0.0-fake"}
+        elif self.path == "/api/ps":
+            with server.lock:
+                loaded = list(server.loaded)
+            body = {"models": [{"name": name, "model": name} for name in loaded]}
+        else:
+            self.send_error(404)
+            return
+        self._send_json(body)
+
+    def do_POST(self):
+        server = self.server.owner
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if server.failing:
+            self.send_error(503)
+            return
+        if self.path not in ("/api/generate", "/api/chat"):
+            self.send_error(404)
+            return
+
+        model = payload.get("model", "")
+        server.record_request(self.path, payload)
+        if self.path == "/api/generate" and not payload.get("prompt") and not payload.get("context"):
+            # Like Ollama, an empty prompt only loads (or with keep_alive=0, unloads) the model
+            if payload.get("keep_alive") in (0, "0", "0s"):
+                server.unload(model)
+                self._send_json({"model": model, "response": "", "done": True, "done_reason": "unload"})
+            else:
+                server.ensure_loaded(model)
+                self._send_json({"model": model, "response": "", "done": True, "done_reason": "load"})
+            return
+        server.ensure_loaded(model)
+        chunks = server.next_response(model, payload)
+
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            time.sleep(server.latency)
+            for chunk in chunks:
+                if self.path == "/api/chat":
+                    data = {"model": model, "message": {"role": "assistant", "content": chunk}, "done": False}
+                else:
+                    data = {"model": model, "response": chunk, "done": False}
+                self._write_chunk(json.dumps(data).encode() + b"\n")
+                if server.token_rate:
+                    time.sleep(1.0 / server.token_rate)
+            final = {"model": model, "done": True, "eval_count": len(chunks)}
+            if self.path == "/api/generate":
+                final["response"] = ""
+                # Token history: whatever the client sent back plus this turn
+                final["context"] = list(payload.get("context") or []) + list(range(len(tokenize(payload.get("prompt", ""))) + len(chunks)))
+            self._write_chunk(json.dumps(final).encode() + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with server.lock:
+                server.aborted += 1
+            self.close_connection = True
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOllamaServer:
+    """
+    Threaded fake Ollama server.
+
+    script maps a model name to either a list of responses, served in order
+    (the last one repeats), or a callable(payload) -> response. A response is
+    a string (tokenized on whitespace) or a list of recorded chunks.
+    """
+
+    def __init__(self, script=None, token_rate=200.0, latency=0.05, host="127.0.0.1", port=0,
+                 load_time=0.0, max_loaded=None):
+        """
+        Args:
+            script: Responses per model name
+            token_rate: Tokens streamed per second (0 streams as fast as possible)
+            latency: Seconds before the first token (simulated prefill)
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            load_time: Seconds to load a model that isn't in memory
+            max_loaded: Models kept loaded at once (None: unlimited)
+        """
+        self.script = dict(script or {})
+        self.token_rate = token_rate
+        self.latency = latency
+        self.load_time = load_time
+        self.max_loaded = max_loaded
+        # Set to True to answer every request with 503, like a broken server
+        self.failing = False
+        self.lock = threading.Lock()
+        # Loads happen one at a time, like on a single GPU
+        self.load_lock = threading.Lock()
+        self.loaded = OrderedDict()
+        self.loads = 0
+        self.unloads = 0
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self.aborted = 0
+        self._positions = {}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def record_request(self, path, payload):
+        with self.lock:
+            self.requests.append((path, payload))
+
+    def ensure_loaded(self, model):
+        """Load a model (paying load_time) unless it's in memory; evict the least recently used beyond max_loaded"""
+        with self.load_lock:
+            with self.lock:
+                if model in self.loaded:
+                    self.loaded.move_to_end(model)
+                    return
+            time.sleep(self.load_time)
+            with self.lock:
+                self.loaded[model] = None
+                self.loads += 1
+                while self.max_loaded is not None and len(self.loaded) > self.max_loaded:
+                    self.loaded.popitem(last=False)
+                    self.unloads += 1
+
+    def unload(self, model):
+        with self.lock:
+            if model in self.loaded:
+                del self.loaded[model]
+                self.unloads += 1
+
+    def next_response(self, model, payload):
+        """Return the chunk list for the next response of a model"""
+        entry = self.script.get(model)
+        if entry is None:
+            entry = self.script.get("*", [""])
+        if callable(entry):
+            response = entry(payload)
+        else:
+            with self.lock:
+                position = self._positions.get(model, 0)
+                self._positions[model] = position + 1
+            response = entry[min(position, len(entry) - 1)]
+        return list(response) if isinstance(response, list) else tokenize(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server replaying scripted responses")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--script", help="JSON file mapping model names to lists of responses")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Tokens per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--load-time", type=float, default=0.0, help="Seconds to load a model into memory")
+    parser.add_argument("--max-loaded", type=int, default=None, help="Models kept loaded at once")
+    args = parser.parse_args()
+
+    script = {}
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+    server = FakeOllamaServer(script, token_rate=args.token_rate, latency=args.latency, port=args.port,
+                              load_time=args.load_time, max_loaded=args.max_loaded)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+End-to-end benchmark for the repair loop.
+
+Runs a fixed task corpus against a local fake Ollama server (scripted
+responses, configurable latency and token rate) and reports per-stage
+latency, iterations-to-success, runner overhead and throughput. Every run is
+stored under benchmarks/results/ and compared with the previous one so
+regressions show up between commits.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --token-rate 50 --latency 0.2 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.config import Config
+from core.fix_store import FixStore
+from core.llm_interface import LLMInterface
+from core.logger import Logger
+from core.repair_loop import RepairLoop
+from core.runner import CodeRunner
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Metrics compared between runs: name -> True when higher is better
+TRACKED_METRICS = {
+    "success_rate": True,
+    "mean_iterations": False,
+    "task_latency_p50": False,
+    "thinker_p50": False,
+    "coder_p50": False,
+    "patcher_p50": False,
+    "execution_p50": False,
+    "ttft_p50": False,
+    "runner_overhead": False,
+    "throughput": True,
+}
+
+
+class TimedModel:
+    """Wraps a model client and records time-to-first-token and duration per call"""
+
+    def __init__(self, model, role, samples):
+        self.model = model
+        self.model_name = model.model_name
+        self.role = role
+        self.samples = samples
+        self.lock = threading.Lock()
+
+    def generate(self, *args, **kwargs):
+        start = time.monotonic()
+        first_token = None
+        try:
+            for chunk in self.model.generate(*args, **kwargs):
+                if first_token is None:
+                    first_token = time.monotonic() - start
+                yield chunk
+        finally:
+            with self.lock:
+                self.samples.append({
+                    "role": self.role,
+                    "ttft": first_token,
+                    "duration": time.monotonic() - start
+                })
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(corpus_dir, name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry.setdefault("id", os.path.splitext(name)[0])
+            corpus.append(entry)
+    return corpus
+
+
+def run_task(entry, args, log_dir):
+    """Run one corpus task against its own fake server and return its metrics"""
+    logger = Logger(os.path.join(log_dir, f"{entry['id']}.log"))
+    loop = RepairLoop(logger)
+    # Fixes learned in earlier runs would skip the scripted model calls
+    loop.fixes = FixStore(enabled=False)
+    samples = []
+
+    with FakeOllamaServer(entry["responses"], token_rate=args.token_rate, latency=args.latency) as server:
+        for role in list(loop.models):
+            # Roles share real models (thinker and patcher are both the mini
+            # model), so each role talks to the fake server under its own name.
+            # No response cache: every request must hit the (fake) model
+            loop.models[role] = TimedModel(LLMInterface(role, base_url=server.url), role, samples)
+        start = time.monotonic()
+        code = loop.run_task(entry["task"], max_iters=entry.get("max_iters", args.max_iters), candidates=1,
+                             acceptance=entry.get("acceptance"))
+        elapsed = time.monotonic() - start
+
+    loop.runner.close()
+    logger.close()
+    stats = loop.last_run_stats
+    return {
+        "id": entry["id"],
+        "status": "success" if code else "failed",
+        "iterations": stats.get("iterations"),
+        "elapsed": elapsed,
+        "timings": stats.get("timings", {}),
+        "ttft": [s["ttft"] for s in samples if s["ttft"] is not None],
+        "calls": len(samples),
+    }
+
+
+def measure_runner_overhead(backend, runs=10):
+    """Median wall time of CodeRunner for a program that does nothing"""
+    runner = CodeRunner(backend=backend, memoize=False)
+    timings = []
+    try:
+        for _ in range(runs):
+            start = time.monotonic()
+            runner.execute("pass")
+            timings.append(time.monotonic() - start)
+            # Give the warm pool a moment to refill, as it would between iterations
+            time.sleep(0.05)
+    finally:
+        runner.close()
+    return statistics.median(timings)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(results, wall_time, runner_overhead):
+    succeeded = [r for r in results if r["status"] == "success"]
+    ttfts = [t for r in results for t in r["ttft"]]
+    return {
+        "tasks": len(results),
+        "success_rate": len(succeeded) / len(results) if results else 0.0,
+        "mean_iterations": statistics.mean(r["iterations"] for r in succeeded) if succeeded else None,
+        "task_latency_p50": percentile([r["elapsed"] for r in results], 0.5),
+        "task_latency_p95": percentile([r["elapsed"] for r in results], 0.95),
+        "thinker_p50": percentile([r["timings"].get("thinker", 0.0) for r in results], 0.5),
+        "coder_p50": percentile([r["timings"].get("coder", 0.0) for r in results], 0.5),
+        "patcher_p50": percentile([r["timings"].get("patcher", 0.0) for r in results], 0.5),
+        "execution_p50": percentile([r["timings"].get("execution", 0.0) for r in results], 0.5),
+        "ttft_p50": percentile(ttfts, 0.5),
+        "runner_overhead": runner_overhead,
+        "throughput": len(results) / wall_time if wall_time else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def latest_result(results_dir):
+    if not os.path.isdir(results_dir):
+        return None
+    files = sorted(f for f in os.listdir(results_dir) if f.endswith(".json"))
+    return os.path.join(results_dir, files[-1]) if files else None
+
+
+def compare(summary, baseline, threshold):
+    """
+    Compare tracked metrics with a baseline summary.
+
+    Returns:
+        List of (metric, baseline, current, relative change, regressed)
+    """
+    rows = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        old, new = baseline.get(metric), summary.get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        regressed = change < -threshold if higher_is_better else change > threshold
+        rows.append((metric, old, new, change, regressed))
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the L.A.P.H. repair loop against a fake Ollama server")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Directory of benchmark task files")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake model tokens per second")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model time to first token (seconds)")
+    parser.add_argument("--max-iters", type=int, default=5, help="Iteration budget per task")
+    parser.add_argument("--workers", type=int, default=1, help="Tasks run concurrently")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the corpus this many times")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Where results are stored")
+    parser.add_argument("--baseline", help="Result file to compare against (default: latest stored run)")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when a tracked metric regresses")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    corpus = load_corpus(args.corpus) * max(1, args.repeat)
+
+    with tempfile.TemporaryDirectory(prefix="laph-bench-") as log_dir:
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            results = list(pool.map(lambda entry: run_task(entry, args, log_dir), corpus))
+        wall_time = time.monotonic() - start
+
+    runner_backend = Config().get_runner_config().get('backend', 'subprocess')
+    summary = summarize(results, wall_time, measure_runner_overhead(runner_backend))
+    record = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "token_rate": args.token_rate,
+            "latency": args.latency,
+            "workers": args.workers,
+            "repeat": args.repeat,
+            "runner_backend": runner_backend,
+        },
+        "summary": summary,
+        "tasks": results,
+    }
+
+    for r in results:
+        print(f"{r['id']:<24} {r['status']:<8} iters={r['iterations']} elapsed={r['elapsed']:.3f}s")
+    print()
+    for metric, value in summary.items():
+        print(f"{metric:<20} {value if value is None else round(value, 4)}")
+
+    baseline_path = args.baseline or latest_result(args.results_dir)
+    regressed = False
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {os.path.basename(baseline_path)} ({baseline.get('commit')}):")
+        for metric, old, new, change, is_regression in compare(summary, baseline["summary"], args.threshold):
+            flag = "  REGRESSION" if is_regression else ""
+            print(f"  {metric:<20} {old:.4f} -> {new:.4f} ({change:+.1%}){flag}")
+            regressed = regressed or is_regression
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    out_path = os.path.join(args.results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{record['commit']}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
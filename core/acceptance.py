@@ -0,0 +1,304 @@
+import ast
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+
+# Prefix of the result lines the test harness writes to stdout
+MARKER = "@@LAPH-TEST@@ "
+
+# Runs in the sandbox: loads the program as module "solution" (with the
+# first case's input on stdin and its output discarded), then calls the
+# selected test functions with the program's globals in scope
+HARNESS = r'''
+import contextlib
+import io
+import json
+import linecache
+import sys
+import traceback
+import types
+
+_program = {program!r}
+_tests = {tests!r}
+_names = {names!r}
+_fail_fast = {fail_fast!r}
+
+for _file, _source in (("<solution>", _program), ("<tests>", _tests)):
+    linecache.cache[_file] = (len(_source), None, _source.splitlines(True), _file)
+
+def _report(name, error=None):
+    sys.__stdout__.write({marker!r} + json.dumps({{"name": name, "error": error}}) + "\n")
+    sys.__stdout__.flush()
+
+def _describe(error):
+    frames = [f for f in traceback.extract_tb(error.__traceback__) if f.filename in ("<solution>", "<tests>")]
+    message = f"{{type(error).__name__}}: {{error}}" if str(error) else type(error).__name__
+    if frames:
+        frame = frames[-1]
+        message += f" ({{frame.filename[1:-1]}} line {{frame.lineno}}: {{frame.line}})"
+    return message
+
+_solution = types.ModuleType("solution")
+_solution.__file__ = "<solution>"
+sys.modules["solution"] = _solution
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(compile(_program, "<solution>", "exec"), _solution.__dict__)
+    _namespace = dict(_solution.__dict__, __name__="tests")
+    exec(compile(_tests, "<tests>", "exec"), _namespace)
+except BaseException as _error:
+    _report(_names[0], "program failed to load: " + _describe(_error))
+    sys.exit(1)
+
+_failed = False
+for _name in _names:
+    try:
+        _namespace[_name]()
+    except BaseException as _error:
+        _report(_name, _describe(_error))
+        _failed = True
+        if _fail_fast:
+            break
+    else:
+        _report(_name)
+sys.exit(1 if _failed else 0)
+'''
+
+
+class AcceptanceCase(NamedTuple):
+    """A stdin / expected stdout pair"""
+    name: str
+    stdin: str
+    stdout: str
+
+
+class CaseFailure(NamedTuple):
+    name: str
+    detail: str
+
+
+class AcceptanceReport(NamedTuple):
+    passed: bool
+    total: int
+    ran: int
+    failures: list
+
+    def summary(self, max_failures=3):
+        """Compact description of the failing cases, used as the next iteration's error"""
+        lines = [f"Acceptance checks failed ({len(self.failures)} failing, {self.ran} of {self.total} run):"]
+        for failure in self.failures[:max_failures]:
+            lines.append(f"- {failure.name}: {failure.detail}")
+        if len(self.failures) > max_failures:
+            lines.append(f"- ... {len(self.failures) - max_failures} more")
+        return "\n".join(lines)
+
+
+class _StopEvent:
+    """Set locally on the first failure; also reports set once the caller cancels"""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.stopped = False
+
+    def set(self):
+        self.stopped = True
+
+    def is_set(self):
+        return self.stopped or (self.parent is not None and self.parent.is_set())
+
+
+class AcceptanceSuite:
+    """
+    Acceptance checks for a task: stdin/expected stdout pairs and
+    pytest-style test functions (plain asserts, run without pytest).
+
+    Checks run as parallel shards through a CodeRunner. Each stdin case is
+    one run; test functions are spread over the shards, each shard being one
+    harness run. With fail_fast, the first failing shard cancels the rest.
+    """
+
+    def __init__(self, cases=(), tests=None, shards=4, fail_fast=True, max_output_chars=300):
+        """
+        Args:
+            cases: AcceptanceCase list
+            tests: Source defining test_* functions; the program's globals are
+                in scope and it can also be imported as `solution`
+            shards: Checks run concurrently
+            fail_fast: Cancel the remaining checks after the first failure
+            max_output_chars: Longest output quoted in a failure
+        """
+        self.cases = list(cases)
+        self.tests = tests or ""
+        self.test_names = self._find_tests(self.tests)
+        self.shards = max(1, shards)
+        self.fail_fast = fail_fast
+        self.max_output_chars = max_output_chars
+
+    @classmethod
+    def from_task(cls, acceptance, acceptance_config, warn=None):
+        """
+        Build a suite from a task's "acceptance" entry:
+        {"cases": [{"stdin": "...", "stdout": "...", "name": "..."}], "tests": "def test_...(): ..."}
+
+        Malformed cases and tests that don't parse are skipped rather than
+        failing the task.
+
+        Args:
+            acceptance: The task's acceptance entry
+            acceptance_config: The [acceptance] section of execution.toml
+            warn: Optional callable receiving a message for each skipped part
+
+        Returns:
+            AcceptanceSuite, or None when the entry has no (valid) checks
+        """
+        warn = warn or (lambda message: None)
+        if not acceptance:
+            return None
+        if not isinstance(acceptance, dict):
+            warn("Acceptance entry is not an object; running without acceptance checks")
+            return None
+        entries = acceptance.get("cases") or []
+        if not isinstance(entries, list):
+            warn("Acceptance 'cases' is not a list; skipping the cases")
+            entries = []
+        cases = []
+        for index, case in enumerate(entries):
+            fields = (case.get("stdin", ""), case.get("stdout", "")) if isinstance(case, dict) else None
+            if fields is None or not all(isinstance(field, str) for field in fields):
+                warn(f"Acceptance case {index + 1} needs string 'stdin' and 'stdout'; skipping it")
+                continue
+            cases.append(AcceptanceCase(str(case.get("name") or f"case {index + 1}"), *fields))
+        tests = acceptance.get("tests")
+        if tests is not None and not isinstance(tests, str):
+            warn("Acceptance 'tests' is not a string; skipping the tests")
+            tests = None
+        if tests:
+            try:
+                compile(tests, "<tests>", "exec")
+            except (SyntaxError, ValueError) as e:
+                warn(f"Acceptance tests are not valid Python ({e}); skipping the tests")
+                tests = None
+        suite = cls(
+            cases, tests,
+            shards=acceptance_config.get('shards', 4),
+            fail_fast=acceptance_config.get('fail_fast', True),
+            max_output_chars=acceptance_config.get('max_output_chars', 300)
+        )
+        return suite if suite.total else None
+
+    @property
+    def total(self):
+        return len(self.cases) + len(self.test_names)
+
+    @property
+    def primary_stdin(self):
+        """Input for the program's main run: the first case's, so that run doubles as the case"""
+        return self.cases[0].stdin if self.cases else None
+
+    @staticmethod
+    def _find_tests(source):
+        if not source:
+            return []
+        tree = ast.parse(source)
+        return [node.name for node in tree.body
+                if isinstance(node, ast.FunctionDef) and node.name.startswith("test")]
+
+    def describe(self, max_cases=3):
+        """The checks as prompt text, so the program is written against them"""
+        parts = []
+        for case in self.cases[:max_cases]:
+            parts.append(f"Input:\n{case.stdin}\nExpected output:\n{case.stdout}")
+        if len(self.cases) > max_cases:
+            parts.append(f"({len(self.cases) - max_cases} more input/output cases)")
+        if self.tests:
+            parts.append(f"Tests (the program's functions are imported from it):\n{self.tests}")
+        return "\n\n".join(parts)
+
+    def run(self, runner, code, cancel_event=None) -> AcceptanceReport:
+        """
+        Run every check against a program.
+
+        Args:
+            runner: CodeRunner executing the checks
+            code: Program under test
+            cancel_event: Optional threading.Event cancelling all checks
+
+        Returns:
+            AcceptanceReport
+        """
+        jobs = [(self._run_case, case) for case in self.cases]
+        shard_count = min(self.shards, len(self.test_names))
+        for index in range(shard_count):
+            jobs.append((self._run_tests, self.test_names[index::shard_count]))
+
+        stop = _StopEvent(cancel_event)
+        failures = []
+        ran = 0
+        pool = ThreadPoolExecutor(max_workers=min(self.shards, len(jobs)) or 1)
+        try:
+            futures = [pool.submit(job, runner, code, argument, stop) for job, argument in jobs]
+            for future in as_completed(futures):
+                job_ran, job_failures = future.result()
+                ran += job_ran
+                failures.extend(job_failures)
+                if job_failures and self.fail_fast:
+                    stop.set()
+        finally:
+            # Runs in flight notice the stop within one poll interval
+            pool.shutdown(wait=True, cancel_futures=True)
+        return AcceptanceReport(not failures and ran == self.total, self.total, ran, failures)
+
+    def _run_case(self, runner, code, case, stop):
+        if stop.is_set():
+            return 0, []
+        result = runner.execute(code, cancel_event=stop, stdin=case.stdin)
+        if stop.is_set() and not result.cached and result.exitcode == -1:
+            return 0, []
+        if result.exitcode != 0:
+            return 1, [CaseFailure(case.name, f"exited with code {result.exitcode}: {self._last_line(result.stderr)}")]
+        if self.normalize(result.stdout) != self.normalize(case.stdout):
+            return 1, [CaseFailure(
+                case.name,
+                f"input {self._clip(case.stdin)} expected {self._clip(self.normalize(case.stdout))}, "
+                f"got {self._clip(self.normalize(result.stdout))}"
+            )]
+        return 1, []
+
+    def _run_tests(self, runner, code, names, stop):
+        if stop.is_set():
+            return 0, []
+        harness = HARNESS.format(program=code, tests=self.tests, names=names,
+                                 fail_fast=self.fail_fast, marker=MARKER)
+        # Programs that read input at top level need some to load
+        result = runner.execute(harness, cancel_event=stop, stdin=self.primary_stdin or "")
+        records = {}
+        for line in result.stdout.split('\n'):
+            if line.startswith(MARKER):
+                record = json.loads(line[len(MARKER):])
+                records[record["name"]] = record["error"]
+        failures = [CaseFailure(name, self._clip_text(error)) for name, error in records.items() if error]
+        if result.exitcode != 0 and not failures:
+            if stop.is_set() and not result.cached:
+                return len(records), []
+            # Crashed or timed out mid-test: blame the first test without a result
+            name = next((name for name in names if name not in records), names[-1])
+            failures.append(CaseFailure(name, self._last_line(result.stderr)))
+            return len(records) + 1, failures
+        return len(records), failures
+
+    @staticmethod
+    def normalize(output):
+        """Compare outputs ignoring trailing whitespace and blank lines at the end"""
+        return "\n".join(line.rstrip() for line in output.strip("\n").splitlines()).rstrip()
+
+    def _clip(self, text):
+        return repr(self._clip_text(text))
+
+    def _clip_text(self, text):
+        if len(text) <= self.max_output_chars:
+            return text
+        return text[:self.max_output_chars] + "..."
+
+    def _last_line(self, text):
+        lines = [line for line in text.strip().splitlines() if line.strip()]
+        return self._clip_text(lines[-1].strip()) if lines else "no error output"
@@ -0,0 +1,374 @@
+
+import asyncio
+import json
+import queue
+import ssl
+import threading
+from urllib.parse import urlsplit
+from core.errors import LLMConnectionError, LLMError, LLMResponseError, LLMTimeoutError
+from core.llm_interface import merge_options
+
+class AsyncLLMInterface:
+    """
+    asyncio-native client for the Ollama HTTP API.
+
+    Streams /api/generate and /api/chat as async iterators over a bounded pool
+    of keep-alive connections. Cancelling the consuming task, or closing the
+    iterator early, closes the socket so Ollama stops decoding.
+    """
+
+    def __init__(self, model_name="qwen3:14b", base_url="http://localhost:11434", max_connections=4, keep_alive=None, options=None):
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.default_options = dict(options or {})
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported base URL {base_url!r}: expected http:// or https://")
+        self.host = parts.hostname or "localhost"
+        # TLS for https, verified against the system's CA certificates
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.max_connections = max_connections
+        self._loop = None
+        self._slots = None
+        self._idle = []
+
+    async def generate(self, prompt: str, timeout=300, options=None, system=None, history=None, context=None):
+        """
+        Stream a completion from /api/generate.
+
+        Args:
+            prompt: The prompt to send to the model
+            timeout: Per-read timeout in seconds (default: 300)
+            options: Optional Ollama sampling options (merged over the defaults)
+            system: Static system prompt
+            history: Context tokens to continue from
+            context: Optional GenerationContext updated when the response completes
+        """
+        payload = self._payload({"prompt": prompt}, options)
+        if system:
+            payload["system"] = system
+        if history:
+            payload["context"] = history
+        async for data in self._stream("/api/generate", payload, timeout):
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done") and context is not None:
+                context.update(data.get("context"))
+
+    async def chat(self, messages, timeout=300, options=None):
+        """
+        Stream a reply from /api/chat.
+
+        Args:
+            messages: List of {"role": ..., "content": ...} dicts
+            timeout: Per-read timeout in seconds (default: 300)
+            options: Optional Ollama sampling options
+        """
+        payload = self._payload({"messages": messages}, options)
+        async for data in self._stream("/api/chat", payload, timeout):
+            content = data.get("message", {}).get("content", "")
+            if content:
+                yield content
+
+    def _payload(self, fields, options):
+        payload = {"model": self.model_name, **fields, "stream": True}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        options = merge_options(self.default_options, options)
+        if options:
+            payload["options"] = options
+        return payload
+
+    async def aclose(self):
+        """Close all idle pooled connections"""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    def _bind_loop(self):
+        # Pool state belongs to one event loop; rebuild it if the loop changed
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_connections)
+            self._idle = []
+
+    async def _connect(self):
+        """An idle pooled connection if there is one, else a new one; returns (reader, writer, reused)"""
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        return reader, writer, False
+
+    async def _send(self, reader, writer, path, payload):
+        """Write the request and read the response status line and headers"""
+        body = json.dumps(payload).encode()
+        head = (
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+        return await self._read_head(reader)
+
+    async def _stream(self, path, payload, timeout):
+        """
+        POST payload to path and yield each decoded NDJSON object.
+        Transport failures raise the same LLMError subclasses as LLMInterface.
+        """
+        self._bind_loop()
+        async with self._slots:
+            writer = None
+            watchdog = None
+            reusable = False
+            try:
+                reader, writer, reused = await asyncio.wait_for(self._connect(), timeout)
+                watchdog = _IdleWatchdog(writer, timeout)
+                try:
+                    status, headers = await self._send(reader, writer, path, payload)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                    if not reused or watchdog.expired:
+                        raise
+                    # The server closed the idle keep-alive connection as the
+                    # request went out, before answering: retry once on a new one
+                    watchdog.cancel()
+                    writer.close()
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, ssl=self.ssl), timeout)
+                    watchdog = _IdleWatchdog(writer, timeout)
+                    status, headers = await self._send(reader, writer, path, payload)
+                if status != 200:
+                    raise LLMResponseError(f"HTTP {status} from {path}", status)
+
+                buffer = b""
+                async for piece in self._read_body(reader, headers):
+                    watchdog.reset()
+                    buffer += piece
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        data = self._decode(line)
+                        if data is not None:
+                            yield data
+                data = self._decode(buffer)
+                if data is not None:
+                    yield data
+                reusable = headers.get("connection", "").lower() != "close"
+            except asyncio.TimeoutError as e:
+                raise LLMTimeoutError(f"Request timed out after {timeout} seconds") from e
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                if watchdog is not None and watchdog.expired:
+                    raise LLMTimeoutError(f"Request timed out after {timeout} seconds") from e
+                raise LLMConnectionError(f"Cannot connect to Ollama. Is it running on {self.host}:{self.port}?") from e
+            finally:
+                if watchdog is not None:
+                    watchdog.cancel()
+                # Only a fully drained response leaves the connection reusable;
+                # anything else (cancel, early close, error) drops the socket
+                if writer is not None:
+                    if reusable:
+                        self._idle.append((reader, writer))
+                    else:
+                        writer.close()
+
+    @staticmethod
+    def _decode(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            # Ignore lines that are not valid JSON
+            return None
+        if data.get("error"):
+            raise LLMResponseError(data["error"])
+        return data
+
+    @staticmethod
+    async def _read_head(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed before response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    async def _read_body(reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise ConnectionError("Connection closed mid-response")
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Consume optional trailers up to the terminating blank line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                yield await reader.readexactly(size)
+                await reader.readline()
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                piece = await reader.read(min(remaining, 65536))
+                if not piece:
+                    raise ConnectionError("Connection closed mid-response")
+                remaining -= len(piece)
+                yield piece
+        else:
+            while True:
+                piece = await reader.read(65536)
+                if not piece:
+                    return
+                yield piece
+
+
+class _IdleWatchdog:
+    """
+    Aborts the connection when no data arrives for `timeout` seconds.
+
+    Used instead of wrapping every read in asyncio.wait_for, which can swallow
+    a task cancellation that races with a completed read and keep streaming.
+    """
+
+    def __init__(self, writer, timeout):
+        self.writer = writer
+        self.timeout = timeout
+        self.expired = False
+        self.handle = None
+        self.reset()
+
+    def reset(self):
+        if self.handle is not None:
+            self.handle.cancel()
+        self.handle = asyncio.get_running_loop().call_later(self.timeout, self._expire)
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def _expire(self):
+        self.expired = True
+        self.writer.transport.abort()
+
+
+class BackgroundLoop:
+    """
+    A shared asyncio event loop running on a daemon thread, so synchronous
+    code (RepairLoop, the Tk GUI) can drive async clients.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="laph-asyncio", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+class ThreadedLLMInterface:
+    """
+    Drop-in replacement for LLMInterface backed by AsyncLLMInterface.
+
+    generate() is a regular generator, but the request runs on the shared
+    background loop. Closing the generator or setting cancel_event cancels the
+    request and closes its socket immediately.
+    """
+
+    _DONE = object()
+
+    def __init__(self, model_name="qwen3:14b", base_url="http://localhost:11434", max_connections=4, cache=None,
+                 keep_alive=None, options=None):
+        self.model_name = model_name
+        self.client = AsyncLLMInterface(
+            model_name, base_url=base_url, max_connections=max_connections,
+            keep_alive=keep_alive, options=options
+        )
+        self.background = BackgroundLoop.get()
+        # Optional LLMCache; identical requests are replayed from disk
+        self.cache = cache
+
+    def generate(self, prompt: str, timeout=300, options=None, cancel_event=None, use_cache=True, system=None, context=None,
+                 complete_event=None):
+        history = context.take() if context is not None else None
+
+        def live():
+            stream = self.client.generate(
+                prompt, timeout=timeout, options=options,
+                system=system, history=history, context=context
+            )
+            return self._iterate(stream, cancel_event)
+
+        if self.cache is None or not use_cache:
+            return live()
+        # Cache keys use the options actually sent
+        merged = merge_options(self.client.default_options, options)
+        return self.cache.stream(self.model_name, prompt, merged, live, cancel_event, system=system, context=history,
+                                 complete_event=complete_event)
+
+    def chat(self, messages, timeout=300, options=None, cancel_event=None):
+        return self._iterate(self.client.chat(messages, timeout=timeout, options=options), cancel_event)
+
+    def _iterate(self, stream, cancel_event):
+        chunks = queue.Queue()
+        stopped = threading.Event()
+
+        async def pump():
+            try:
+                async for chunk in stream:
+                    if stopped.is_set():
+                        break
+                    chunks.put(chunk)
+            except LLMError as e:
+                chunks.put(e)
+            except Exception as e:
+                chunks.put(LLMError(str(e)))
+            finally:
+                # Close the stream right away so its socket is dropped
+                await stream.aclose()
+                chunks.put(self._DONE)
+
+        future = self.background.submit(pump())
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    chunk = chunks.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if chunk is self._DONE:
+                    break
+                if isinstance(chunk, LLMError):
+                    raise chunk
+                yield chunk
+        finally:
+            stopped.set()
+            future.cancel()
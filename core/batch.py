@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.config import Config
+from core.logger import Logger
+from core.repair_loop import RepairLoop
+
+def load_tasks(source):
+    """
+    Load tasks from a directory of task JSON files (the examples/simple_task.json
+    format), a JSONL file, or "-" for JSONL on stdin.
+
+    Returns:
+        List of task dicts, each with at least "id" and "task"
+    """
+    tasks = []
+    if source != "-" and os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(source, name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            entry.setdefault("id", os.path.splitext(name)[0])
+            tasks.append(entry)
+    else:
+        stream = sys.stdin if source == "-" else open(source, 'r', encoding='utf-8')
+        try:
+            for number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry.setdefault("id", f"task-{number}")
+                tasks.append(entry)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    for entry in tasks:
+        if not str(entry["id"]).strip():
+            raise ValueError("Task ids must not be empty")
+        if not isinstance(entry.get("task"), str) or not entry["task"].strip():
+            raise ValueError(f"Task {entry['id']} has no 'task' description")
+    return tasks
+
+
+def log_filename(task_id):
+    """A task's log file name: the id with anything but word characters, dots and dashes replaced"""
+    return re.sub(r"[^\w.-]", "_", str(task_id)) + ".log"
+
+
+class GatedModel:
+    """
+    Wraps a model client so each generate() holds a slot of a semaphore shared
+    by every worker using the same model.
+    """
+
+    def __init__(self, model, semaphore):
+        self.model = model
+        self.model_name = model.model_name
+        self.semaphore = semaphore
+
+    def generate(self, *args, **kwargs):
+        with self.semaphore:
+            yield from self.model.generate(*args, **kwargs)
+
+
+class ModelGate:
+    """Per-model concurrency limits shared across batch workers"""
+
+    def __init__(self, per_model_limit):
+        self.per_model_limit = per_model_limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def semaphore_for(self, model_name):
+        with self._lock:
+            if model_name not in self._semaphores:
+                self._semaphores[model_name] = threading.BoundedSemaphore(self.per_model_limit)
+            return self._semaphores[model_name]
+
+    def gate(self, model):
+        """Wrap one model client in the semaphore of its model"""
+        return GatedModel(model, self.semaphore_for(model.model_name))
+
+    def wrap(self, models):
+        """
+        Gate the clients of a RepairLoop's ModelRegistry. Each client is
+        wrapped by the registry's factory when it is first created, so roles
+        a worker never uses are never instantiated.
+        """
+        factory = models.factory
+        models.factory = lambda model_cfg: self.gate(factory(model_cfg))
+
+
+class BatchRunner:
+    """
+    Runs many tasks headlessly across a pool of RepairLoop workers and streams
+    one JSON result line per task as soon as it finishes.
+    """
+
+    def __init__(self, workers=4, per_model_limit=2, max_iters=20, candidates=None, log_dir="logs/batch"):
+        """
+        Args:
+            workers: Number of tasks processed concurrently
+            per_model_limit: Maximum concurrent requests to any single model
+            max_iters: Default iteration budget (a task may override with "max_iters")
+            candidates: Best-of-N candidates per iteration (None uses the config)
+            log_dir: Directory receiving one log file per task
+        """
+        self.workers = workers
+        self.max_iters = max_iters
+        self.candidates = candidates
+        self.log_dir = log_dir
+        self.gate = ModelGate(per_model_limit)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def run(self, tasks, out):
+        """
+        Process all tasks and write results to the out stream as JSONL.
+
+        Returns:
+            (succeeded, total)
+        """
+        succeeded = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="laph-batch") as pool:
+            for result in pool.map(lambda entry: self._run_one(entry, out), tasks):
+                if result["status"] == "success":
+                    succeeded += 1
+        return succeeded, len(tasks)
+
+    def _loop(self, logger):
+        # One RepairLoop per worker thread; its model clients are gated
+        loop = getattr(self._local, 'loop', None)
+        if loop is None:
+            loop = RepairLoop(logger)
+            self.gate.wrap(loop.models)
+            self._local.loop = loop
+        loop.logger = logger
+        return loop
+
+    def _run_one(self, entry, out):
+        task_id = str(entry["id"])
+        # Ids come from task files: keep the log inside log_dir whatever they contain
+        logger = Logger.from_config(Config().get_logging_config(), os.path.join(self.log_dir, log_filename(task_id)))
+        start = time.monotonic()
+        record = {"id": task_id, "task": entry["task"]}
+        try:
+            loop = self._loop(logger)
+            code = loop.run_task(
+                entry["task"],
+                max_iters=int(entry.get("max_iters", self.max_iters)),
+                candidates=entry.get("candidates", self.candidates),
+                acceptance=entry.get("acceptance"),
+                deadline=entry.get("deadline"),
+                optimize=entry.get("optimize")
+            )
+            # Failed runs say why: "failed", "timeout" (deadline) or "llm_error"
+            record["status"] = "success" if code else loop.last_run_stats.get("status", "failed")
+            record["code"] = code
+            record["iterations"] = loop.last_run_stats.get("iterations")
+            record["timings"] = {
+                stage: round(seconds, 3)
+                for stage, seconds in loop.last_run_stats.get("timings", {}).items()
+            }
+            # Resource usage summed over the task's program runs
+            record["resources"] = loop.last_run_stats.get("resources")
+            if "optimize" in loop.last_run_stats:
+                record["optimize"] = loop.last_run_stats["optimize"]
+        except Exception as e:
+            record["status"] = "error"
+            record["code"] = None
+            record["error"] = str(e)
+        finally:
+            logger.close()
+        record["elapsed"] = round(time.monotonic() - start, 3)
+
+        with self._write_lock:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+        return record
@@ -0,0 +1,277 @@
+import ast
+import builtins
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+# Calls that run arbitrary code or commands; never allowed for auto-execution
+CODE_EXECUTION_CALLS = {
+    'eval': 'eval() - arbitrary code execution',
+    'exec': 'exec() - arbitrary code execution',
+    '__import__': '__import__() - dynamic imports',
+    'os.system': 'os.system() - arbitrary command execution',
+}
+FILE_DELETE_CALLS = {
+    'os.remove': 'os.remove() - file deletion',
+    'os.unlink': 'os.unlink() - file deletion',
+    'os.rmdir': 'os.rmdir() - directory deletion',
+    'shutil.rmtree': 'shutil.rmtree() - recursive deletion',
+}
+SUBPROCESS_CALLS = ('subprocess.run', 'subprocess.call', 'subprocess.check_call',
+                    'subprocess.check_output', 'subprocess.Popen')
+# Any use of these modules is network access
+NETWORK_MODULES = ('socket', 'urllib.request', 'requests', 'http.client')
+
+# Names every program can use without binding them
+IMPLICIT_NAMES = frozenset(dir(builtins)) | {'__file__', '__name__', '__doc__', '__builtins__', '__spec__'}
+
+CACHE_SIZE = 256
+
+
+class Finding(NamedTuple):
+    """One notable operation in a program"""
+    category: str  # "code_execution", "subprocess", "file_write", "file_delete", "file_open" or "network"
+    name: str      # Fully qualified call, e.g. "os.system" or "requests.get"
+    line: int
+    description: str
+
+
+class CodeAnalysis(NamedTuple):
+    """Everything the pipeline needs to know about a program, from one parse"""
+    code_hash: str
+    tree: Optional[ast.Module]
+    syntax_error: Optional[str]
+    error_line: Optional[int]
+    findings: tuple
+    imports: tuple
+    loop_count: int
+    undefined_names: tuple  # (name, line) of names read but never bound
+
+    @property
+    def valid(self):
+        return self.syntax_error is None
+
+    def by_category(self, *categories):
+        return [finding for finding in self.findings if finding.category in categories]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def analyze_code(code: str) -> CodeAnalysis:
+    """
+    Parse code once and collect structured findings.
+
+    Results are cached by the code's hash, so extraction, validation,
+    sanitizing, fingerprinting and routing of the same program share a
+    single parse.
+
+    Args:
+        code: Python source
+
+    Returns:
+        CodeAnalysis (with syntax_error set and no findings if code doesn't compile)
+    """
+    key = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+    with _cache_lock:
+        analysis = _cache.get(key)
+        if analysis is not None:
+            _cache.move_to_end(key)
+            return analysis
+
+    analysis = _analyze(code, key)
+    with _cache_lock:
+        _cache[key] = analysis
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return analysis
+
+
+def _analyze(code, key):
+    try:
+        tree = ast.parse(code)
+        # Errors such as 'return' outside a function are only raised by the compiler
+        compile(tree, '<string>', 'exec')
+    except SyntaxError as e:
+        return CodeAnalysis(key, None, f"Syntax error: {e}", e.lineno, (), (), 0, ())
+    except Exception as e:
+        return CodeAnalysis(key, None, f"Validation error: {e}", None, (), (), 0, ())
+
+    visitor = _Visitor()
+    visitor.visit(tree)
+    undefined = ()
+    if not visitor.star_import:
+        first_use = {}
+        for name, line in visitor.loads:
+            if name not in visitor.bound and name not in IMPLICIT_NAMES:
+                first_use.setdefault(name, line)
+        undefined = tuple(first_use.items())
+    return CodeAnalysis(key, tree, None, None, tuple(visitor.findings), tuple(visitor.imports),
+                        visitor.loop_count, undefined)
+
+
+class _Visitor(ast.NodeVisitor):
+    """
+    Collects findings in one walk. Names are resolved through the program's
+    imports, so `import os as o; o.system(...)` and `from os import system`
+    are both reported as os.system. Binding is tracked per program rather than
+    per scope: a name bound anywhere is never reported as undefined.
+    """
+
+    def __init__(self):
+        self.aliases = {}
+        self.findings = []
+        self.imports = []
+        self.bound = set()
+        self.loads = []
+        self.loop_count = 0
+        self.star_import = False
+        self._reported = set()
+
+    def qualified_name(self, node):
+        """Dotted name of a Name/Attribute chain with import aliases resolved, or None"""
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return '.'.join(reversed(parts))
+
+    def add(self, category, name, line, description):
+        if (category, name, line) not in self._reported:
+            self._reported.add((category, name, line))
+            self.findings.append(Finding(category, name, line, description))
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append(alias.name)
+            if alias.asname:
+                self.aliases[alias.asname] = alias.name
+                self.bound.add(alias.asname)
+            else:
+                self.bound.add(alias.name.split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        module = node.module or ''
+        self.imports.append(module)
+        for alias in node.names:
+            if alias.name == '*':
+                self.star_import = True
+                continue
+            local = alias.asname or alias.name
+            self.aliases[local] = f"{module}.{alias.name}" if module else alias.name
+            self.bound.add(local)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loads.append((node.id, node.lineno))
+            self._check_network(self.aliases.get(node.id, node.id), node.lineno)
+        else:
+            self.bound.add(node.id)
+
+    def visit_Attribute(self, node):
+        name = self.qualified_name(node)
+        if name is not None:
+            self._check_network(name, node.lineno)
+            # Only the root Name matters for binding; the chain is handled above
+            root = node
+            while isinstance(root, ast.Attribute):
+                root = root.value
+            # obj.attr = value still reads obj
+            self.loads.append((root.id, root.lineno))
+            return
+        self.generic_visit(node)
+
+    def _check_network(self, name, line):
+        for module in NETWORK_MODULES:
+            if name.startswith(module + '.'):
+                self.add('network', name, line, f"{module} - network operations")
+                return
+
+    def visit_Call(self, node):
+        name = self.qualified_name(node.func)
+        if name in CODE_EXECUTION_CALLS:
+            self.add('code_execution', name, node.lineno, CODE_EXECUTION_CALLS[name])
+        elif name in FILE_DELETE_CALLS:
+            self.add('file_delete', name, node.lineno, FILE_DELETE_CALLS[name])
+        elif name in SUBPROCESS_CALLS:
+            self.add('subprocess', name, node.lineno, 'subprocess - command execution')
+        elif name in ('open', 'io.open'):
+            self._check_open(name, node)
+        self.generic_visit(node)
+
+    def _check_open(self, name, node):
+        mode = node.args[1] if len(node.args) > 1 else None
+        for keyword in node.keywords:
+            if keyword.arg == 'mode':
+                mode = keyword.value
+        mode = mode.value if isinstance(mode, ast.Constant) and isinstance(mode.value, str) else 'r'
+        if 'a' in mode:
+            self.add('file_write', name, node.lineno, 'open() with append mode - file writing')
+        elif any(flag in mode for flag in 'wx+'):
+            self.add('file_write', name, node.lineno, 'open() with write mode - file writing')
+        else:
+            self.add('file_open', name, node.lineno, 'open() - file reading')
+
+    def _visit_function(self, node):
+        self.bound.add(node.name)
+        arguments = node.args
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs:
+            self.bound.add(arg.arg)
+        for arg in (arguments.vararg, arguments.kwarg):
+            if arg is not None:
+                self.bound.add(arg.arg)
+        self.generic_visit(node)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_Lambda(self, node):
+        arguments = node.args
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs:
+            self.bound.add(arg.arg)
+        for arg in (arguments.vararg, arguments.kwarg):
+            if arg is not None:
+                self.bound.add(arg.arg)
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node):
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):
+        self.bound.update(node.names)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self.bound.add(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self.bound.add(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self.bound.add(node.rest)
+        self.generic_visit(node)
+
+    def _visit_loop(self, node):
+        self.loop_count += 1
+        self.generic_visit(node)
+
+    visit_For = _visit_loop
+    visit_AsyncFor = _visit_loop
+    visit_While = _visit_loop
+    visit_comprehension = _visit_loop
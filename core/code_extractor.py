@@ -1,4 +1,15 @@
+import ast
 import re
+from core.code_analysis import analyze_code
+
+# Fence languages treated as Python; bare ``` blocks rank below these
+PYTHON_FENCE_LANGUAGES = ("python", "python3", "py")
+# Line heuristic used when a response has no code blocks
+PROSE_PREFIXES = ('Here', 'This', 'The', 'I', 'You', 'Let', 'Now', 'First', 'Note:')
+CODE_PREFIXES = ('import ', 'from ', 'def ', 'class ', 'if ', 'for ', 'while ', '@', '#',
+                 'print(', 'return ', 'yield ', 'raise ', 'try:', 'except')
+# A ``` at the start of a line (after indentation) closes a fence
+CLOSING_FENCE = re.compile(r'^[ \t]*```', re.MULTILINE)
 
 class CodeExtractor:
     """
@@ -11,45 +22,46 @@ class CodeExtractor:
         """
         Extract Python code from text that may contain markdown code blocks or explanations.
         
+        Runs in time linear in the length of text: one pass collects
+        ```python and bare ``` blocks, a second one <code> tags (only when
+        there are no fences), and the line heuristic only runs when there
+        are none.
+        
         Args:
             text: Raw text from LLM that may contain code blocks
             
         Returns:
             Extracted Python code, or original text if no code blocks found
         """
-        # Try to find code between ```python and ``` or ``` and ```
-        patterns = [
-            r'```python\s*\n(.*?)\n```',  # ```python ... ```
-            r'```\s*\n(.*?)\n```',         # ``` ... ```
-            r'<code>(.*?)</code>',         # <code> ... </code>
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.DOTALL)
+        python_blocks, plain_blocks, unclosed = CodeExtractor._scan_fences(text)
+        # Tags only matter when there are no fenced blocks
+        tag_blocks = [] if python_blocks or plain_blocks else CodeExtractor._scan_tags(text)
+        
+        # ```python blocks win over bare ``` blocks, which win over <code> tags
+        for matches in (python_blocks, plain_blocks, tag_blocks):
             if matches:
-                # Return the longest code block found
-                return max(matches, key=len).strip()
+                # Return the longest block that parses, else the longest block found
+                blocks = sorted((match.strip() for match in matches), key=len, reverse=True)
+                return next((block for block in blocks if analyze_code(block).valid), blocks[0])
+        
+        # A response cut off inside its code block (e.g. by num_predict)
+        if unclosed and unclosed.strip():
+            return unclosed.strip()
         
         # If no code blocks found, try to extract lines that look like code
         # by removing common explanatory prefixes
-        lines = text.split('\n')
         code_lines = []
         in_code = False
         
-        for line in lines:
+        for line in text.split('\n'):
             stripped = line.strip()
             
             # Skip obvious non-code lines
-            if stripped.startswith(('Here', 'This', 'The', 'I', 'You', 'Let', 'Now', 'First', 'Note:')):
+            if stripped.startswith(PROSE_PREFIXES):
                 continue
             
             # Keep lines that look like Python code
-            if stripped and (
-                stripped.startswith(('import ', 'from ', 'def ', 'class ', 'if ', 'for ', 'while ', '@', '#'))
-                or '=' in stripped
-                or stripped.startswith(('print(', 'return ', 'yield ', 'raise ', 'try:', 'except'))
-                or in_code
-            ):
+            if stripped and (in_code or '=' in stripped or stripped.startswith(CODE_PREFIXES)):
                 code_lines.append(line)
                 in_code = True
             elif in_code and (stripped == '' or stripped.startswith(' ')):
@@ -64,6 +76,80 @@ class CodeExtractor:
         
         # Last resort: return original text
         return text.strip()
+
+    @staticmethod
+    def _scan_fences(text):
+        """
+        Collect fenced blocks in one left-to-right pass.
+        
+        The scan jumps from fence to fence with str.find, and a precompiled
+        pattern finds each closing fence, so every character is examined a
+        bounded number of times. Fences in other languages (```bash,
+        ```json, ...) are skipped. <code> tags are not looked at here: like
+        the fences, they are matched independently of each other.
+        
+        Returns:
+            (python_blocks, plain_blocks, unclosed) where unclosed is the
+            content of a Python/bare fence still open at the end, or None
+        """
+        python_blocks, plain_blocks = [], []
+        unclosed = None
+        length = len(text)
+        position = 0
+        
+        while position < length:
+            start = text.find('```', position)
+            if start < 0:
+                break
+            line_end = text.find('\n', start)
+            if line_end < 0:
+                line_end = length
+            info = text[start + 3:line_end]
+            if '```' in info:
+                # ```inline``` on one line, not a block
+                position = line_end + 1
+                continue
+            language = info.strip().lower()
+            closing = CLOSING_FENCE.search(text, line_end + 1)
+            if closing is None:
+                body = text[line_end + 1:]
+                # A fence closed at the end of a code line is malformed, not cut off
+                if (language in PYTHON_FENCE_LANGUAGES or not language) and '```' not in body:
+                    unclosed = body
+                break
+            body = text[line_end + 1:max(line_end + 1, closing.start() - 1)]
+            if language in PYTHON_FENCE_LANGUAGES:
+                python_blocks.append(body)
+            elif not language:
+                plain_blocks.append(body)
+            # Anything after the closing ``` on its line is ignored
+            position = text.find('\n', closing.end())
+            if position < 0:
+                break
+        
+        return python_blocks, plain_blocks, unclosed
+    
+    @staticmethod
+    def _scan_tags(text):
+        """
+        Collect <code>...</code> contents, left to right without overlaps.
+        
+        A tag that is never closed is plain text. Once no closing tag is
+        left, no later tag can close either, so the scan stops instead of
+        searching to the end again for every remaining tag.
+        """
+        blocks = []
+        position = 0
+        while True:
+            start = text.find('<code>', position)
+            if start < 0:
+                break
+            close = text.find('</code>', start + 6)
+            if close < 0:
+                break
+            blocks.append(text[start + 6:close])
+            position = close + 7
+        return blocks
     
     @staticmethod
     def validate_code(code: str) -> tuple[bool, str]:
@@ -79,18 +165,129 @@ class CodeExtractor:
         if not code or not code.strip():
             return False, "Empty code"
         
-        # Check for minimum code characteristics
-        has_import_or_def = any(keyword in code for keyword in ['import ', 'from ', 'def ', 'class '])
-        has_basic_syntax = any(char in code for char in ['(', ')', '='])
+        # One cached parse serves validation, sanitizing and fingerprinting
+        analysis = analyze_code(code)
+        if not analysis.valid:
+            return False, analysis.syntax_error
         
-        if not (has_import_or_def or has_basic_syntax):
+        # Prose like "Done" parses as a bare name; real programs do something
+        if all(CodeExtractor._is_inert(statement) for statement in analysis.tree.body):
             return False, "Does not appear to be valid Python code"
-        
-        # Try to compile to check for syntax errors
-        try:
-            compile(code, '<string>', 'exec')
-            return True, ""
-        except SyntaxError as e:
-            return False, f"Syntax error: {e}"
-        except Exception as e:
-            return False, f"Validation error: {e}"
+        return True, ""
+
+    @staticmethod
+    def _is_inert(statement):
+        return isinstance(statement, ast.Pass) or (
+            isinstance(statement, ast.Expr) and isinstance(statement.value, (ast.Name, ast.Constant))
+        )
+
+
+class StreamingCodeExtractor:
+    """
+    Incremental counterpart of CodeExtractor.extract_code for streamed LLM
+    output.
+
+    Chunks are fed as they arrive while markdown fence / <code> state is
+    tracked line by line. As soon as a ```python block closes and compiles,
+    feed() returns True so the caller can stop the stream instead of paying
+    for the explanation that usually follows. Bare ``` blocks and <code>
+    tags never stop it: extract_code prefers a ```python block that may
+    still follow them.
+    """
+
+    def __init__(self, early_stop=True):
+        """
+        Args:
+            early_stop: Report a stop as soon as a valid Python block closes
+        """
+        self.early_stop = early_stop
+        self.blocks = []
+        self.early_code = None
+        self._chunks = []
+        self._pending = ""
+        self._state = None
+        self._language = ""
+        self._current = []
+
+    @property
+    def text(self):
+        """Everything streamed so far"""
+        return ''.join(self._chunks)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume one streamed chunk.
+
+        Returns:
+            True once a complete, valid Python block is available and the
+            rest of the stream can be dropped
+        """
+        self._chunks.append(chunk)
+        self._pending += chunk
+        *lines, self._pending = self._pending.split('\n')
+        for line in lines:
+            if self._consume(line):
+                return True
+        # Don't wait for the newline after a closing fence or tag
+        if self._state == 'fence' and self._pending.strip().startswith('```'):
+            self._pending = ""
+            return self._close()
+        if '</code>' in self._pending and (self._state == 'tag' or '<code>' in self._pending):
+            line, _, self._pending = self._pending.partition('</code>')
+            return self._consume(line + '</code>')
+        return False
+
+    def finish(self):
+        """Process a trailing line without a newline once the stream has ended"""
+        if self._pending:
+            line, self._pending = self._pending, ""
+            self._consume(line)
+
+    def code(self) -> str:
+        """The extracted code: the early-stop block, or extract_code on the full text"""
+        if self.early_code is not None:
+            return self.early_code
+        return CodeExtractor.extract_code(self.text)
+
+    def _consume(self, line):
+        stripped = line.strip()
+        if self._state is None:
+            if stripped.startswith('```'):
+                self._state = 'fence'
+                self._language = stripped[3:].strip().lower()
+                self._current = []
+            elif '<code>' in line:
+                after = line.split('<code>', 1)[1]
+                self._state = 'tag'
+                self._language = ""
+                self._current = []
+                return self._consume_tag(after)
+            return False
+        if self._state == 'fence':
+            if stripped.startswith('```'):
+                return self._close()
+            self._current.append(line)
+            return False
+        return self._consume_tag(line)
+
+    def _consume_tag(self, line):
+        if '</code>' in line:
+            self._current.append(line.split('</code>', 1)[0])
+            return self._close()
+        self._current.append(line)
+        return False
+
+    def _close(self):
+        block = '\n'.join(self._current).strip()
+        language = self._language
+        self._state = None
+        self._current = []
+        if not block:
+            return False
+        self.blocks.append(block)
+        if not self.early_stop or language not in PYTHON_FENCE_LANGUAGES:
+            return False
+        is_valid, _ = CodeExtractor.validate_code(block)
+        if is_valid:
+            self.early_code = block
+        return is_valid
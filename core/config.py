@@ -1,5 +1,6 @@
 import toml
 import os
+import threading
 
 class Config:
     """
@@ -8,20 +9,20 @@ class Config:
     """
     
     _instance = None
+    _lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Config, cls).__new__(cls)
-            cls._instance._initialized = False
+        # Batch workers construct Config concurrently; build the singleton once
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(Config, cls).__new__(cls)
+                instance.execution_config = instance._load_execution_config()
+                instance.models_config = instance._load_models_config()
+                cls._instance = instance
         return cls._instance
     
     def __init__(self):
-        if self._initialized:
-            return
-        
-        self._initialized = True
-        self.execution_config = self._load_execution_config()
-        self.models_config = self._load_models_config()
+        pass
     
     def _load_execution_config(self):
         """Load execution configuration with defaults"""
@@ -34,11 +35,110 @@ class Config:
             'retry': {
                 'initial_delay': 1,
                 'max_delay': 10,
-                'exponential_backoff': True
+                'exponential_backoff': True,
+                'max_attempts': 3
             },
             'llm': {
                 'request_timeout': 300,
-                'connection_pooling': True
+                'task_deadline': 0,
+                'connection_pooling': True,
+                'client': 'requests',
+                'max_connections': 4,
+                'early_stop': True,
+                'warm_up': ['thinker', 'coder']
+            },
+            'best_of_n': {
+                'candidates': 1,
+                'temperatures': [0.2, 0.5, 0.8, 1.0]
+            },
+            'runner': {
+                'memoize': True,
+                'memo_size': 256,
+                'backend': 'subprocess',
+                'pool_size': 2,
+                'max_output_bytes': 16 * 1024 * 1024,
+                'keep_output_bytes': 1024 * 1024
+            },
+            'cache': {
+                'enabled': True,
+                'path': '.laph_cache/llm_cache.sqlite',
+                'max_size_mb': 256,
+                'deterministic_only': True
+            },
+            'logging': {
+                'max_size_mb': 10,
+                'backup_count': 5,
+                'rotate_interval': 0,
+                'max_message_chars': 16384,
+                'flush_interval': 0.2
+            },
+            'context': {
+                'enabled': True,
+                'chars_per_token': 4,
+                'default_budget': 6000,
+                'max_frames': 6,
+                'min_error_tokens': 256,
+                'min_code_tokens': 1024
+            },
+            'acceptance': {
+                'enabled': True,
+                'shards': 4,
+                'fail_fast': True,
+                'max_reported_failures': 3,
+                'max_output_chars': 300,
+                'generate_tests': False
+            },
+            'optimize': {
+                'enabled': False,
+                'max_iters': 3,
+                'time_budget': 120,
+                'repeats': 3,
+                'min_improvement': 0.1,
+                'min_time_gain': 0.05,
+                'min_memory_gain_mb': 2.0,
+                'top_n': 8
+            },
+            'fixes': {
+                'enabled': True,
+                'path': '.laph_cache/fixes.sqlite',
+                'max_entries': 5000,
+                'top_k': 3,
+                'max_diff_chars': 2000,
+                'replay': True
+            },
+            'scheduler': {
+                'enabled': False,
+                'max_resident': 2,
+                'max_streak': 8,
+                'max_wait': 30.0,
+                'base_url': 'http://localhost:11434',
+                'refresh_interval': 5.0,
+                'unload': False
+            },
+            'endpoints': {
+                'urls': ['http://localhost:11434'],
+                'sticky': True,
+                'max_failures': 2,
+                'probe_interval': 10.0,
+                'probe_timeout': 2.0
+            },
+            'routing': {
+                'enabled': True,
+                'simple_errors': [
+                    'SyntaxError', 'IndentationError', 'TabError',
+                    'NameError', 'UnboundLocalError',
+                    'ImportError', 'ModuleNotFoundError'
+                ],
+                'max_fast_attempts': 2
+            },
+            'gui': {
+                'frame_rate': 30,
+                'max_log_lines': 2000
+            },
+            'tracing': {
+                'enabled': False,
+                'output_dir': 'logs/traces',
+                'formats': ['chrome', 'jsonl']
             }
         }
         
@@ -86,6 +186,58 @@ class Config:
         """Get LLM configuration"""
         return self.execution_config['llm']
     
+    def get_best_of_n_config(self):
+        """Get best-of-N candidate generation configuration"""
+        return self.execution_config['best_of_n']
+    
+    def get_runner_config(self):
+        """Get code runner configuration"""
+        return self.execution_config['runner']
+    
+    def get_cache_config(self):
+        """Get LLM response cache configuration"""
+        return self.execution_config['cache']
+    
+    def get_logging_config(self):
+        """Get log file writer configuration"""
+        return self.execution_config['logging']
+    
+    def get_context_config(self):
+        """Get prompt context compaction configuration"""
+        return self.execution_config['context']
+    
+    def get_acceptance_config(self):
+        """Get acceptance check configuration"""
+        return self.execution_config['acceptance']
+    
+    def get_optimize_config(self):
+        """Get post-success optimization configuration"""
+        return self.execution_config['optimize']
+    
+    def get_fixes_config(self):
+        """Get known-fix store configuration"""
+        return self.execution_config['fixes']
+    
+    def get_scheduler_config(self):
+        """Get model residency scheduler configuration"""
+        return self.execution_config['scheduler']
+    
+    def get_endpoints_config(self):
+        """Get model server endpoint pool configuration"""
+        return self.execution_config['endpoints']
+    
+    def get_routing_config(self):
+        """Get error-driven repair routing configuration"""
+        return self.execution_config['routing']
+    
+    def get_gui_config(self):
+        """Get GUI streaming configuration"""
+        return self.execution_config['gui']
+    
+    def get_tracing_config(self):
+        """Get stage tracing configuration"""
+        return self.execution_config['tracing']
+    
     def get_model_config(self, model_type):
         """Get configuration for a specific model type"""
         return self.models_config.get(model_type, self.models_config['default'])
@@ -0,0 +1,194 @@
+import re
+from typing import NamedTuple
+
+FRAME_PATTERN = re.compile(r'^  File "(?P<file>[^"]*)", line \d+')
+# Frames from these locations are interpreter/library internals, not the program
+LIBRARY_MARKERS = ("site-packages", "dist-packages", "/lib/python", "<frozen ", "\\lib\\")
+
+class CompactedContext(NamedTuple):
+    code: str
+    error: str
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+
+
+class ContextBuilder:
+    """
+    Keeps the variable part of thinker/coder prompts (previous code and its
+    error output) inside a per-model token budget.
+
+    Errors are always cleaned up: tracebacks keep the program's own frames
+    plus the raising frame and the final exception, and runs of identical
+    lines collapse into one. If the prompt is still over budget, the error
+    and then the previous code are cut down to their head and tail.
+    """
+
+    def __init__(self, enabled=True, chars_per_token=4, default_budget=6000, max_frames=6,
+                 min_error_tokens=256, min_code_tokens=1024):
+        """
+        Args:
+            enabled: Set to False to pass code and errors through untouched
+            chars_per_token: Characters per token used for estimates
+            default_budget: Prompt budget in tokens for models without one
+            max_frames: Traceback frames kept per exception
+            min_error_tokens: Never shrink the error below this
+            min_code_tokens: Never shrink the previous code below this
+        """
+        self.enabled = enabled
+        self.chars_per_token = chars_per_token
+        self.default_budget = default_budget
+        # First program frame + latest ones + the raising frame
+        self.max_frames = max(3, max_frames)
+        self.min_error_tokens = min_error_tokens
+        self.min_code_tokens = min_code_tokens
+
+    @classmethod
+    def from_config(cls, context_config):
+        """Build a context builder from the [context] section of execution.toml"""
+        return cls(
+            enabled=context_config.get('enabled', True),
+            chars_per_token=context_config.get('chars_per_token', 4),
+            default_budget=context_config.get('default_budget', 6000),
+            max_frames=context_config.get('max_frames', 6),
+            min_error_tokens=context_config.get('min_error_tokens', 256),
+            min_code_tokens=context_config.get('min_code_tokens', 1024)
+        )
+
+    def estimate_tokens(self, text):
+        if not text:
+            return 0
+        return -(-len(text) // self.chars_per_token)
+
+    def compact(self, fixed, code=None, error=None, budget=None, trim_code=True):
+        """
+        Fit previous code and error into a prompt budget.
+
+        Args:
+            fixed: Prompt text that is never trimmed (system prompt, task/spec)
+            code: Previous program, or None
+            error: Its error output, or None
+            budget: Prompt budget in tokens (default_budget when None)
+            trim_code: Set to False when the model must return the whole
+                program, so only the error is cut down
+
+        Returns:
+            CompactedContext with the code and error to put in the prompt
+        """
+        before = self.estimate_tokens(code) + self.estimate_tokens(error)
+        if not self.enabled:
+            return CompactedContext(code, error, before, before)
+
+        if error:
+            error = self.dedupe_lines(self.trim_traceback(error))
+
+        available = (budget or self.default_budget) - self.estimate_tokens(fixed)
+        code_tokens = self.estimate_tokens(code)
+        if error and code_tokens + self.estimate_tokens(error) > available:
+            target = max(self.min_error_tokens, available - code_tokens)
+            error = self.truncate(error, target * self.chars_per_token, head_share=0.25)
+        error_tokens = self.estimate_tokens(error)
+        if trim_code and code and code_tokens + error_tokens > available:
+            target = max(self.min_code_tokens, available - error_tokens)
+            code = self.truncate(code, target * self.chars_per_token, head_share=0.5, marker="# ... {} lines omitted ...")
+
+        after = self.estimate_tokens(code) + self.estimate_tokens(error)
+        return CompactedContext(code, error, before, after)
+
+    def trim_traceback(self, text):
+        """Keep the program's frames, the raising frame and the exception line of each traceback"""
+        lines = text.splitlines()
+        output = []
+        frames = None
+        for line in lines:
+            if frames is None:
+                output.append(line)
+                if line.startswith("Traceback (most recent call last):"):
+                    frames = []
+            elif FRAME_PATTERN.match(line):
+                frames.append([line])
+            elif (line.startswith("    ") or line.startswith("  [")) and frames:
+                frames[-1].append(line)
+            else:
+                # First unindented line after the frames: the exception itself
+                output.extend(self._select_frames(frames))
+                output.append(line)
+                frames = None
+        if frames is not None:
+            output.extend(self._select_frames(frames))
+        return "\n".join(output)
+
+    def _select_frames(self, frames):
+        if len(frames) <= self.max_frames:
+            return [line for frame in frames for line in frame]
+        last = len(frames) - 1
+        keep = [i for i, frame in enumerate(frames) if not self._is_library_frame(frame[0])]
+        keep = keep[:1] + keep[1:][-(self.max_frames - 2):] if len(keep) > self.max_frames - 1 else keep
+        keep = sorted(set(keep) | {last})
+        lines = []
+        previous = -1
+        for index in keep:
+            if index - previous > 1:
+                lines.append(f"  ... {index - previous - 1} frames omitted ...")
+            lines.extend(frames[index])
+            previous = index
+        return lines
+
+    @staticmethod
+    def _is_library_frame(line):
+        filename = FRAME_PATTERN.match(line).group("file")
+        return any(marker in filename for marker in LIBRARY_MARKERS)
+
+    @staticmethod
+    def dedupe_lines(text):
+        """Collapse runs of identical lines into one line plus a repeat count"""
+        output = []
+        previous = None
+        repeats = 0
+        for line in text.splitlines():
+            if line == previous:
+                repeats += 1
+                continue
+            if repeats:
+                output.append(f"  [Previous line repeated {repeats} more times]")
+            output.append(line)
+            previous = line
+            repeats = 0
+        if repeats:
+            output.append(f"  [Previous line repeated {repeats} more times]")
+        return "\n".join(output)
+
+    @staticmethod
+    def truncate(text, max_chars, head_share=0.5, marker="... {} lines omitted ..."):
+        """Cut whole lines out of the middle so text fits in max_chars"""
+        if len(text) <= max_chars:
+            return text
+        lines = text.splitlines()
+        # Leave room for the marker line (with up to a 10-digit count)
+        max_chars = max(0, max_chars - len(marker) - 10)
+        head_budget = int(max_chars * head_share)
+        tail_budget = max_chars - head_budget
+
+        head, used = [], 0
+        for line in lines:
+            if used + len(line) + 1 > head_budget:
+                break
+            head.append(line)
+            used += len(line) + 1
+        tail, used = [], 0
+        for line in reversed(lines[len(head):]):
+            if used + len(line) + 1 > tail_budget:
+                break
+            tail.append(line)
+            used += len(line) + 1
+        tail.reverse()
+
+        omitted = len(lines) - len(head) - len(tail)
+        if not tail and omitted:
+            # A single huge line: keep its end, that's where errors usually are
+            tail = [lines[-1][-tail_budget:]]
+            omitted -= 1
+        return "\n".join(head + [marker.format(omitted)] + tail)
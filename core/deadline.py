@@ -0,0 +1,71 @@
+import threading
+import time
+from core.errors import DeadlineExceeded
+
+
+class Deadline:
+    """
+    Total time budget of a task.
+
+    The event is set once the budget runs out, so it can be passed wherever a
+    cancel_event is accepted: model streams close, scheduler waits give up and
+    running programs are killed. child() hands out events that are set by the
+    deadline as well as by their own caller (e.g. best-of-N losers).
+    """
+
+    def __init__(self, seconds=None):
+        """
+        Args:
+            seconds: Budget in seconds (None or 0: no deadline)
+        """
+        self.seconds = seconds or None
+        self.expires_at = time.monotonic() + self.seconds if self.seconds else None
+        self.event = threading.Event()
+        self._children = []
+        self._lock = threading.Lock()
+        self._timer = None
+        if self.seconds:
+            self._timer = threading.Timer(self.seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def remaining(self):
+        """Seconds left (None without a deadline)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, limit):
+        """limit capped to the time left, for per-request timeouts"""
+        remaining = self.remaining()
+        return limit if remaining is None else max(0.001, min(limit, remaining))
+
+    def check(self):
+        """Raise DeadlineExceeded once the budget is used up"""
+        if self.expired():
+            raise DeadlineExceeded(f"Task deadline of {self.seconds:g}s exceeded")
+
+    def child(self):
+        """A new event that is also set when the deadline expires"""
+        event = threading.Event()
+        with self._lock:
+            if self.event.is_set():
+                event.set()
+            else:
+                self._children.append(event)
+        return event
+
+    def cancel(self):
+        """Stop the timer (the task finished)"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _expire(self):
+        with self._lock:
+            self.event.set()
+            children, self._children = self._children, []
+        for event in children:
+            event.set()
@@ -0,0 +1,236 @@
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from core.errors import LLMError
+
+
+class Endpoint:
+    """One server of a pool and its routing state"""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.healthy = True
+        self.next_probe = 0.0
+        self.probing = False
+
+    def __repr__(self):
+        state = "up" if self.healthy else "ejected"
+        return f"Endpoint({self.url}, {state}, outstanding={self.outstanding})"
+
+
+class EndpointPool:
+    """
+    Spreads the requests for a model over several Ollama servers.
+
+    Each call goes to the healthy endpoint with the fewest outstanding
+    requests. Calls made under the same route key (the repair loop uses one
+    per task) stay on the endpoint they started on while it is healthy, so
+    that server's prompt cache keeps the task's shared prefix warm.
+
+    max_failures consecutive failed calls eject an endpoint. Ejected
+    endpoints are probed with GET /api/version at most every probe_interval
+    seconds, by the next call that finds the probe due, and re-admitted once
+    they answer.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, urls, sticky=True, max_failures=2, probe_interval=10.0, probe_timeout=2.0, max_routes=1024):
+        """
+        Args:
+            urls: Base URLs of the servers
+            sticky: Keep calls with the same route key on one endpoint
+            max_failures: Consecutive failed calls before an endpoint is ejected
+            probe_interval: Seconds between health probes of an ejected endpoint
+            probe_timeout: Seconds a health probe may take
+            max_routes: Route keys remembered for sticky routing (LRU)
+        """
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one URL")
+        self.endpoints = [Endpoint(url.rstrip('/')) for url in urls]
+        self.sticky = sticky
+        self.max_failures = max(1, max_failures)
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_routes = max_routes
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, urls, endpoints_config):
+        """Build a pool for urls with the settings of the [endpoints] section of execution.toml"""
+        return cls(
+            urls,
+            sticky=endpoints_config.get('sticky', True),
+            max_failures=endpoints_config.get('max_failures', 2),
+            probe_interval=endpoints_config.get('probe_interval', 10.0),
+            probe_timeout=endpoints_config.get('probe_timeout', 2.0)
+        )
+
+    @classmethod
+    def shared(cls, urls, endpoints_config):
+        """The process-wide pool for a list of servers, so health and load are tracked once"""
+        key = tuple(url.rstrip('/') for url in urls)
+        with cls._shared_lock:
+            pool = cls._shared.get(key)
+            if pool is None:
+                pool = cls._shared[key] = cls.from_config(urls, endpoints_config)
+            return pool
+
+    def acquire(self, route_key=None, exclude=()):
+        """
+        Pick the endpoint for a call and count it as outstanding.
+
+        Args:
+            route_key: Calls with the same key prefer the same endpoint
+            exclude: Endpoints not to use (already failed for this call)
+
+        Returns:
+            The Endpoint (call release() when the call ends), or None if every
+            endpoint is excluded
+        """
+        self._probe_due()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            if not candidates:
+                return None
+            # With every endpoint ejected, keep trying rather than refuse calls
+            healthy = [endpoint for endpoint in candidates if endpoint.healthy] or candidates
+            endpoint = None
+            if self.sticky and route_key is not None:
+                endpoint = self._routes.get(route_key)
+                if endpoint not in healthy:
+                    endpoint = None
+            if endpoint is None:
+                endpoint = min(healthy, key=lambda candidate: (candidate.outstanding, candidate.served))
+            if self.sticky and route_key is not None:
+                self._routes[route_key] = endpoint
+                self._routes.move_to_end(route_key)
+                while len(self._routes) > self.max_routes:
+                    self._routes.popitem(last=False)
+            endpoint.outstanding += 1
+            endpoint.served += 1
+            return endpoint
+
+    def release(self, endpoint, ok=True):
+        """End a call; a failed call counts towards ejecting the endpoint"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.healthy = True
+            else:
+                endpoint.failures += 1
+                if endpoint.healthy and endpoint.failures >= self.max_failures:
+                    endpoint.healthy = False
+                    endpoint.next_probe = time.monotonic() + self.probe_interval
+
+    def check(self):
+        """
+        Probe every endpoint now, ejecting the ones that don't answer.
+
+        Returns:
+            URLs of the healthy endpoints
+        """
+        for endpoint in self.endpoints:
+            self._set_health(endpoint, self.probe(endpoint.url))
+        return self.healthy()
+
+    def healthy(self):
+        with self._lock:
+            return [endpoint.url for endpoint in self.endpoints if endpoint.healthy]
+
+    def probe(self, url):
+        """True if the server at url answers GET /api/version"""
+        try:
+            with urllib.request.urlopen(f"{url}/api/version", timeout=self.probe_timeout) as response:
+                return response.status == 200
+        except Exception:
+            return False
+
+    def _probe_due(self):
+        """Probe ejected endpoints whose probe interval has passed"""
+        now = time.monotonic()
+        with self._lock:
+            due = [endpoint for endpoint in self.endpoints
+                   if not endpoint.healthy and not endpoint.probing and now >= endpoint.next_probe]
+            for endpoint in due:
+                endpoint.probing = True
+        for endpoint in due:
+            alive = self.probe(endpoint.url)
+            self._set_health(endpoint, alive)
+
+    def _set_health(self, endpoint, alive):
+        with self._lock:
+            endpoint.probing = False
+            if alive:
+                endpoint.healthy = True
+                endpoint.failures = 0
+            else:
+                endpoint.healthy = False
+                endpoint.next_probe = time.monotonic() + self.probe_interval
+
+
+class PooledModel:
+    """
+    Model client that sends each generate() to an endpoint chosen by an
+    EndpointPool. A call that fails before producing any output (server
+    down, HTTP error) is retried on the next endpoint.
+    """
+
+    def __init__(self, model_name, pool, factory, route_key=None):
+        """
+        Args:
+            model_name: Ollama model tag
+            pool: EndpointPool of the servers serving the model
+            factory: Called with an endpoint URL to create its client
+            route_key: Optional callable returning the sticky routing key of
+                the current call (e.g. the running task)
+        """
+        self.model_name = model_name
+        self.pool = pool
+        self.factory = factory
+        self.route_key = route_key
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, url):
+        """The client for one endpoint, created on first use"""
+        with self._lock:
+            client = self._clients.get(url)
+            if client is None:
+                client = self._clients[url] = self.factory(url)
+            return client
+
+    def generate(self, *args, **kwargs):
+        key = self.route_key() if self.route_key is not None else None
+        # Each attempt takes the conversation history out of the context
+        context = kwargs.get('context')
+        history = context.tokens if context is not None else None
+        tried = []
+        while True:
+            endpoint = self.pool.acquire(key, exclude=tried)
+            produced = False
+            try:
+                for chunk in self.client(endpoint.url).generate(*args, **kwargs):
+                    produced = True
+                    yield chunk
+            except LLMError:
+                self.pool.release(endpoint, ok=False)
+                tried.append(endpoint)
+                # Output already streamed can't be taken back; otherwise try the next server
+                if produced or len(tried) == len(self.pool.endpoints):
+                    raise
+                if context is not None:
+                    context.update(history)
+                continue
+            except BaseException:
+                self.pool.release(endpoint)
+                raise
+            self.pool.release(endpoint)
+            return
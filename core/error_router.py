@@ -0,0 +1,94 @@
+import re
+
+# Last "SomeError: message" (or bare "SomeError") line of a traceback
+EXCEPTION_PATTERN = re.compile(r'^(?:[A-Za-z_][\w]*\.)*(?P<name>[A-Za-z_]\w*(?:Error|Exception|Interrupt|Exit))\b', re.MULTILINE)
+
+DEFAULT_SIMPLE_ERRORS = (
+    "SyntaxError", "IndentationError", "TabError",
+    "NameError", "UnboundLocalError",
+    "ImportError", "ModuleNotFoundError"
+)
+
+class ErrorRouter:
+    """
+    Decides how a failed iteration is repaired.
+
+    Mechanical failures (syntax errors, undefined names, missing imports) are
+    sent straight to a fast model with a small patch prompt, keeping the
+    current spec. Everything else (logic errors, wrong output, timeouts,
+    crashes) and fixes the fast path couldn't land go through the full
+    thinker -> coder path.
+    """
+
+    PATCH = "patch"
+    FULL = "full"
+
+    def __init__(self, enabled=True, simple_errors=DEFAULT_SIMPLE_ERRORS, max_fast_attempts=2):
+        """
+        Args:
+            enabled: Set to False to always take the full path
+            simple_errors: Exception names repaired by the fast patch path
+            max_fast_attempts: Consecutive patch attempts before falling back
+                to the thinker
+        """
+        self.enabled = enabled
+        self.simple_errors = frozenset(simple_errors)
+        self.max_fast_attempts = max_fast_attempts
+
+    @classmethod
+    def from_config(cls, routing_config):
+        """Build a router from the [routing] section of execution.toml"""
+        return cls(
+            enabled=routing_config.get('enabled', True),
+            simple_errors=routing_config.get('simple_errors', DEFAULT_SIMPLE_ERRORS),
+            max_fast_attempts=routing_config.get('max_fast_attempts', 2)
+        )
+
+    @staticmethod
+    def exception_name(error):
+        """Name of the final exception in an error output, or None"""
+        if not error:
+            return None
+        matches = EXCEPTION_PATTERN.findall(error)
+        return matches[-1] if matches else None
+
+    def classify(self, error, analysis=None):
+        """
+        Args:
+            error: Error output of the failed run
+            analysis: CodeAnalysis of the failed program, if available
+
+        Returns:
+            (kind, exception name) where kind is "simple" or "logic"
+        """
+        name = self.exception_name(error)
+        if name in self.simple_errors:
+            return "simple", name
+        if name is None and analysis is not None:
+            # Error output was cut off or swallowed; the program itself may
+            # still show a mechanical problem
+            if not analysis.valid and "SyntaxError" in self.simple_errors:
+                return "simple", "SyntaxError"
+            if analysis.undefined_names and "NameError" in self.simple_errors:
+                return "simple", "NameError"
+        return "logic", name
+
+    def route(self, error, fast_attempts, repeated=False, analysis=None):
+        """
+        Pick the repair path for the next iteration.
+
+        Args:
+            error: Error output of the failed run
+            fast_attempts: Patch attempts made in a row so far
+            repeated: The failed program was a repeat of an earlier attempt
+            analysis: CodeAnalysis of the failed program, if available
+
+        Returns:
+            ErrorRouter.PATCH or ErrorRouter.FULL
+        """
+        if not self.enabled or repeated or fast_attempts >= self.max_fast_attempts:
+            return self.FULL
+        if not error and analysis is None:
+            return self.FULL
+        kind, _ = self.classify(error, analysis)
+        return self.PATCH if kind == "simple" else self.FULL
@@ -0,0 +1,22 @@
+class LLMError(Exception):
+    """A model call failed before finishing its response"""
+
+
+class LLMConnectionError(LLMError):
+    """The model server could not be reached"""
+
+
+class LLMTimeoutError(LLMError):
+    """The model server sent nothing for longer than the request timeout"""
+
+
+class LLMResponseError(LLMError):
+    """The model server answered with an error status"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class DeadlineExceeded(Exception):
+    """A task ran out of its total time budget"""
@@ -0,0 +1,290 @@
+import difflib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from core.context_builder import FRAME_PATTERN, LIBRARY_MARKERS
+from core.error_router import EXCEPTION_PATTERN
+
+# Parts of an exception message that change from run to run
+VOLATILE_PATTERNS = (
+    (re.compile(r'\. Did you mean: .*\?$'), ''),
+    (re.compile(r'0x[0-9a-fA-F]+'), '0x?'),
+    (re.compile(r'(?:[A-Za-z]:)?(?:[\\/][\w.\-<>]+)+'), '<path>'),
+    (re.compile(r'(?<![\w.])\d+(?:\.\d+)?(?![\w.])'), '<n>'),
+)
+
+
+class ErrorSignature(NamedTuple):
+    """A traceback reduced to what identifies the failure"""
+    exception: str
+    message: str      # Exception line with paths, addresses and numbers masked
+    source_line: str  # Program line that raised, stripped ("" if not shown)
+
+    @property
+    def key(self):
+        """Hash of the exception line alone: the same kind of failure anywhere"""
+        return hashlib.sha256(self.message.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def fingerprint(self):
+        """Hash of the exception line and the raising line: the same failure"""
+        material = self.message + "\n" + self.source_line
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+class KnownFix(NamedTuple):
+    id: int
+    signature: str
+    diff: str
+    hits: int
+    exact: bool  # Recorded for the same raising line, so it can be replayed
+
+
+def error_signature(error) -> Optional[ErrorSignature]:
+    """
+    Reduce CodeRunner stderr to an ErrorSignature.
+
+    Args:
+        error: Error output of a failed run
+
+    Returns:
+        ErrorSignature of the last exception, or None if the output holds no
+        exception line (timeouts, acceptance failures, empty output)
+    """
+    if not error:
+        return None
+    lines = error.splitlines()
+    exception_index = None
+    for index in range(len(lines) - 1, -1, -1):
+        match = EXCEPTION_PATTERN.match(lines[index])
+        if match and (lines[index][match.end():match.end() + 1] in ("", ":")):
+            exception_index = index
+            break
+    if exception_index is None:
+        return None
+
+    message = lines[exception_index].strip()
+    for pattern, replacement in VOLATILE_PATTERNS:
+        message = pattern.sub(replacement, message)
+
+    # Source line of the innermost frame in the program itself
+    source_line = ""
+    for index in range(exception_index - 1, -1, -1):
+        frame = FRAME_PATTERN.match(lines[index])
+        if frame is None:
+            continue
+        if not any(marker in frame.group("file") for marker in LIBRARY_MARKERS):
+            if index + 1 < exception_index and lines[index + 1].startswith("    "):
+                source_line = lines[index + 1].strip()
+            break
+    name = EXCEPTION_PATTERN.match(lines[exception_index]).group("name")
+    return ErrorSignature(name, message, source_line)
+
+
+def make_diff(failed_code, fixed_code, context_lines=2):
+    """Unified diff turning the failed program into the fixed one"""
+    return "\n".join(difflib.unified_diff(
+        failed_code.splitlines(), fixed_code.splitlines(), "failed", "fixed", n=context_lines, lineterm=""
+    ))
+
+
+def apply_diff(code, diff):
+    """
+    Apply a diff from make_diff to a different program.
+
+    Each hunk's original lines (context and removed lines) must occur exactly
+    once in the program, in order; otherwise nothing is applied.
+
+    Returns:
+        The patched program, or None if the diff doesn't apply cleanly
+    """
+    hunks = []
+    for line in diff.splitlines():
+        if line.startswith("@@"):
+            hunks.append(([], []))
+        elif not hunks:
+            continue  # ---/+++ header
+        elif line.startswith("-"):
+            hunks[-1][0].append(line[1:])
+        elif line.startswith("+"):
+            hunks[-1][1].append(line[1:])
+        elif line.startswith(" ") or line == "":
+            hunks[-1][0].append(line[1:])
+            hunks[-1][1].append(line[1:])
+    if not hunks:
+        return None
+
+    lines = code.splitlines()
+    output = []
+    cursor = 0
+    for before, after in hunks:
+        if not before:
+            return None
+        starts = [start for start in range(len(lines) - len(before) + 1)
+                  if lines[start:start + len(before)] == before]
+        if len(starts) != 1 or starts[0] < cursor:
+            return None
+        output.extend(lines[cursor:starts[0]])
+        output.extend(after)
+        cursor = starts[0] + len(before)
+    output.extend(lines[cursor:])
+    return "\n".join(output)
+
+
+class FixStore:
+    """
+    Persistent knowledge of fixes, backed by sqlite.
+
+    Failures are fingerprinted from their traceback (exception line with
+    run-specific parts masked, plus the program line that raised) and mapped
+    to the diffs that made them go away. Lookups by exception line are served
+    from an index, so the same kind of failure in another task finds earlier
+    fixes as prompt hints, and the same failure on the same line can have its
+    fix replayed without calling a model. Least recently used fixes are
+    evicted beyond max_entries.
+    """
+
+    def __init__(self, path=".laph_cache/fixes.sqlite", max_entries=5000, top_k=3, max_diff_chars=2000,
+                 replay=True, enabled=True):
+        """
+        Args:
+            path: sqlite database file
+            max_entries: Stored fixes before LRU eviction kicks in
+            top_k: Fixes returned by lookup
+            max_diff_chars: Longer diffs are rewrites, not fixes, and aren't recorded
+            replay: Apply a fix recorded for the exact same failure before calling a model
+            enabled: Set to False to neither record nor look up fixes
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.top_k = top_k
+        self.max_diff_chars = max_diff_chars
+        self.replay = replay
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_config(cls, fixes_config):
+        """Build a fix store from the [fixes] section of execution.toml"""
+        return cls(
+            path=fixes_config.get('path', ".laph_cache/fixes.sqlite"),
+            max_entries=fixes_config.get('max_entries', 5000),
+            top_k=fixes_config.get('top_k', 3),
+            max_diff_chars=fixes_config.get('max_diff_chars', 2000),
+            replay=fixes_config.get('replay', True),
+            enabled=fixes_config.get('enabled', True)
+        )
+
+    def record(self, error, failed_code, fixed_code):
+        """
+        Remember that a change to a program made its error go away.
+
+        Args:
+            error: Error output of the failed program
+            failed_code: The failed program
+            fixed_code: The next program, which no longer fails this way
+
+        Returns:
+            True if a fix was stored (or an identical one reinforced)
+        """
+        if not self.enabled or not failed_code or not fixed_code or failed_code == fixed_code:
+            return False
+        signature = error_signature(error)
+        if signature is None:
+            return False
+        diff = make_diff(failed_code, fixed_code)
+        if not diff or len(diff) > self.max_diff_chars:
+            return False
+        diff_hash = hashlib.sha256(diff.encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO fixes (fingerprint, signature_key, signature, diff, diff_hash, hits, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (fingerprint, diff_hash) DO UPDATE SET hits = hits + 1, last_used = excluded.last_used",
+                (signature.fingerprint, signature.key, signature.message, diff, diff_hash, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+        return True
+
+    def lookup(self, error, limit=None):
+        """
+        Fixes recorded for the same exception line, best first: fixes for the
+        same raising line, then by how often they worked.
+
+        Returns:
+            List of KnownFix (empty when the error has no traceback)
+        """
+        if not self.enabled:
+            return []
+        signature = error_signature(error)
+        if signature is None:
+            return []
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, signature, diff, hits, fingerprint = ? AS exact FROM fixes WHERE signature_key = ? "
+                "ORDER BY exact DESC, hits DESC, last_used DESC LIMIT ?",
+                (signature.fingerprint, signature.key, limit or self.top_k)
+            ).fetchall()
+        return [KnownFix(row[0], row[1], row[2], row[3], bool(row[4])) for row in rows]
+
+    def touch(self, fix, worked=False):
+        """Mark a fix as used so eviction keeps it; count it again if it worked"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE fixes SET last_used = ?, hits = hits + ? WHERE id = ?",
+                         (time.time(), int(worked), fix.id))
+            conn.commit()
+
+    @staticmethod
+    def describe(fixes):
+        """Known fixes as prompt text"""
+        parts = []
+        for fix in fixes:
+            times = "once" if fix.hits == 1 else f"{fix.hits} times"
+            parts.append(f"{fix.signature} (fixed {times} by):\n{fix.diff}")
+        return "\n\n".join(parts)
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fixes ("
+                "id INTEGER PRIMARY KEY, fingerprint TEXT, signature_key TEXT, signature TEXT, diff TEXT, "
+                "diff_hash TEXT, hits INTEGER, created REAL, last_used REAL, UNIQUE (fingerprint, diff_hash))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS fixes_signature ON fixes (signature_key, hits)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS fixes_lru ON fixes (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM fixes WHERE id IN (SELECT id FROM fixes ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM fixes")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
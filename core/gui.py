@@ -2,19 +2,31 @@ import ttkbootstrap as tb
 from ttkbootstrap.constants import PRIMARY, SUCCESS, DANGER, WARNING, INFO
 import threading
 from core.repair_loop import RepairLoop
+from core.runner import format_usage
 import tkinter as tk
 from tkinter import scrolledtext
 from core.logger import Logger
+from core.config import Config
+from core.stream_buffer import StreamBuffer
 
 class LAPH_GUI:
     def __init__(self, root):
         self.root = root
         self.root.title("L.A.P.H. — Local Autonomous Programming Helper")
         self.root.geometry("1400x900")
-        self.logger = Logger()
+        gui_cfg = Config().get_gui_config()
+        self.frame_interval_ms = max(1, int(1000 / max(1, gui_cfg.get('frame_rate', 30))))
+        self.max_log_lines = gui_cfg.get('max_log_lines', 2000)
+        # Worker threads never touch widgets; they fill this buffer and the
+        # Tk thread drains it once per frame
+        self.buffer = StreamBuffer()
+        self.logger = Logger.from_config(Config().get_logging_config())
         self.logger.register_callback(self.log_message)
         self.agent = RepairLoop(self.logger)
         self.setup_widgets()
+        self.root.after(self.frame_interval_ms, self.flush_buffer)
+        # Load the thinker and coder models while the user types the task
+        self.agent.warm_up()
 
     def setup_widgets(self):
         style = tb.Style("superhero")
@@ -47,6 +59,11 @@ class LAPH_GUI:
         unlimited_button = tb.Button(options_frame, text="♾️ Unlimited", bootstyle="info", command=lambda: self.max_iters_entry.delete(0, "end") or self.max_iters_entry.insert(0, "60"))
         unlimited_button.pack(side="left", padx=(0, 20))
 
+        tb.Label(options_frame, text="Candidates:", font=("Segoe UI", 12), bootstyle="inverse-dark").pack(side="left", padx=(5,5))
+        self.candidates_entry = tb.Entry(options_frame, width=5, font=("Fira Sans", 12))
+        self.candidates_entry.insert(0, str(self.agent.best_of_n.get('candidates', 1)))
+        self.candidates_entry.pack(side="left", padx=(0, 10))
+
         self.run_button = tb.Button(options_frame, text="🚀 Run Task", bootstyle=SUCCESS, command=self.run_task_thread)
         self.run_button.pack(side="right", padx=5)
         
@@ -95,19 +112,45 @@ class LAPH_GUI:
         self.root.clipboard_append(self.output_box.get(1.0, tk.END))
 
     def log_message(self, message):
-        self.log_box.insert(tk.END, message)
-        self.log_box.see(tk.END)
+        self.buffer.put("log", message)
 
     def stream_callback(self, chunk, source):
-        if source == "coder":
-            self.output_box.insert(tk.END, chunk)
-            self.output_box.see(tk.END)
-        elif source == "thinker":
-            self.thinker_box.insert(tk.END, chunk)
-            self.thinker_box.see(tk.END)
-        
-        self.log_box.insert(tk.END, chunk)
-        self.log_box.see(tk.END)
+        if source in ("coder", "thinker"):
+            self.buffer.put(source, chunk)
+        self.buffer.put("log", chunk)
+
+    def set_status(self, text, bootstyle):
+        self.buffer.call(self.status_label.config, text=text, bootstyle=bootstyle)
+
+    def set_running(self, running):
+        state = "disabled" if running else "normal"
+        self.buffer.call(self.run_button.config, state=state)
+        self.buffer.call(self.example_button.config, state=state)
+
+    def flush_buffer(self):
+        """Apply everything streamed since the last frame, one insert per widget"""
+        try:
+            texts, calls = self.buffer.drain()
+            boxes = {"coder": self.output_box, "thinker": self.thinker_box, "log": self.log_box}
+            for target, text in texts.items():
+                box = boxes[target]
+                box.insert(tk.END, text)
+                if box is self.log_box:
+                    self.trim_log()
+                box.see(tk.END)
+            for function, args, kwargs in calls:
+                function(*args, **kwargs)
+        finally:
+            self.root.after(self.frame_interval_ms, self.flush_buffer)
+
+    def trim_log(self):
+        # The full log stays on disk; the pane only keeps the newest lines
+        if not self.max_log_lines:
+            return
+        lines = int(self.log_box.index("end-1c").split(".")[0])
+        excess = lines - self.max_log_lines
+        if excess > 0:
+            self.log_box.delete("1.0", f"{excess + 1}.0")
 
     def fill_dice_prompt(self):
         example = (
@@ -121,6 +164,7 @@ class LAPH_GUI:
     def run_task_thread(self):
         self.run_button.config(state="disabled")
         self.example_button.config(state="disabled")
+        self.buffer.clear()
         self.log_box.delete(1.0, tk.END)
         self.output_box.delete(1.0, tk.END)
         self.thinker_box.delete(1.0, tk.END)
@@ -132,9 +176,8 @@ class LAPH_GUI:
         # Validate task input
         if not task or not task.strip():
             self.logger.log("ERROR: Task description cannot be empty.")
-            self.status_label.config(text="Error: Empty task", bootstyle=DANGER)
-            self.run_button.config(state="normal")
-            self.example_button.config(state="normal")
+            self.set_status("Error: Empty task", DANGER)
+            self.set_running(False)
             return
         
         # Validate max iterations
@@ -149,17 +192,33 @@ class LAPH_GUI:
             max_iters = 10
             self.logger.log("Invalid max iterations value, defaulting to 10.")
         
-        self.status_label.config(text="Running...", bootstyle=WARNING)
+        # Validate best-of-N candidate count
+        try:
+            candidates = int(self.candidates_entry.get())
+            if candidates < 1:
+                raise ValueError("Must be positive")
+            if candidates > 8:
+                self.logger.log("WARNING: Candidate count is very high (>8), capping at 8.")
+                candidates = 8
+        except ValueError:
+            candidates = 1
+            self.logger.log("Invalid candidate count, defaulting to 1.")
+        
+        self.set_status("Running...", WARNING)
         self.logger.log(f"Starting task with max {max_iters} iterations.")
 
-        final_code = self.agent.run_task(task, max_iters=max_iters, stream_callback=self.stream_callback)
+        final_code = self.agent.run_task(task, max_iters=max_iters, stream_callback=self.stream_callback, candidates=candidates)
 
+        usage = self.agent.last_run_stats.get('usage')
         if final_code:
-            self.status_label.config(text="Success! ✨", bootstyle=SUCCESS)
+            self.set_status("Success! ✨" + (f"  ({format_usage(usage)})" if usage else ""), SUCCESS)
             self.logger.log("Task finished successfully.")
         else:
-            self.status_label.config(text="Failed to generate a working script. Try a different prompt or more iterations.", bootstyle=DANGER)
+            message = "Failed to generate a working script. Try a different prompt or more iterations."
+            if usage and usage.get('kill_reason'):
+                # Say when the last program hit a limit rather than crashing
+                message += f" Last run: {format_usage(usage)}."
+            self.set_status(message, DANGER)
             self.logger.log("Task failed. Maximum iterations reached.")
         
-        self.run_button.config(state="normal")
-        self.example_button.config(state="normal")
\ No newline at end of file
+        self.set_running(False)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache of LLM responses backed by sqlite.
+
+    Entries are keyed on model name + generation options + a hash of the full
+    prompt and store the response as the original list of streamed chunks, so
+    a cache hit replays through stream callbacks exactly like a live model.
+    The database is bounded in size with least-recently-used eviction.
+    """
+
+    def __init__(self, path=".laph_cache/llm_cache.sqlite", max_size_mb=256, deterministic_only=True, enabled=True):
+        """
+        Args:
+            path: sqlite database file
+            max_size_mb: Total stored response size before LRU eviction kicks in
+            deterministic_only: Only cache requests sampled with temperature 0.
+                Sampled requests are retried on purpose (a failed program is
+                asked for again), so replaying them would repeat the failure
+            enabled: Set to False to bypass the cache entirely
+        """
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.deterministic_only = deterministic_only
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_config(cls, cache_config):
+        """Build a cache from the [cache] section of execution.toml"""
+        return cls(
+            path=cache_config.get('path', ".laph_cache/llm_cache.sqlite"),
+            max_size_mb=cache_config.get('max_size_mb', 256),
+            deterministic_only=cache_config.get('deterministic_only', True),
+            enabled=cache_config.get('enabled', True)
+        )
+
+    @staticmethod
+    def make_key(model_name, prompt, options=None, system=None, context=None):
+        """Content address for a request: model + options + prompt hash (+ system prompt and context)"""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        fields = {"model": model_name, "options": options or {}, "prompt": prompt_hash}
+        if system:
+            fields["system"] = hashlib.sha256(system.encode('utf-8')).hexdigest()
+        if context:
+            fields["context"] = hashlib.sha256(json.dumps(context).encode('utf-8')).hexdigest()
+        material = json.dumps(fields, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def is_cacheable(self, options=None):
+        if not self.enabled:
+            return False
+        if self.deterministic_only:
+            return bool(options) and options.get('temperature') == 0
+        return True
+
+    def get(self, key):
+        """Return the cached chunk list for key, or None on a miss"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT chunks FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, model_name, chunks):
+        """Store a complete response and evict old entries if over budget"""
+        payload = json.dumps(chunks)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, chunks, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, payload, len(payload), time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def stream(self, model_name, prompt, options, generate, cancel_event=None, system=None, context=None,
+               complete_event=None):
+        """
+        Yield the response for a request, from the cache when possible.
+
+        Args:
+            model_name: Model the request targets
+            prompt: Full prompt text
+            options: Generation options (part of the cache key)
+            generate: Zero-argument callable returning the live chunk stream
+            cancel_event: Streams cut short by cancellation are not stored
+            system: System prompt sent with the request (part of the key)
+            context: Conversation tokens the request continues from (part of the key)
+            complete_event: Set by the consumer before it closes the stream
+                early when what it read is the whole answer (e.g. the code
+                block the streaming extractor stops at). Only then is an
+                early-closed stream stored; any other early close (consumer
+                error, abandoned generator) leaves nothing behind.
+        """
+        if not self.is_cacheable(options):
+            yield from generate()
+            return
+
+        key = self.make_key(model_name, prompt, options, system, context)
+        cached = self.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+        chunks = []
+        live = generate()
+        try:
+            for chunk in live:
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            live.close()
+            # Only a consumer that says it has the whole answer makes the
+            # prefix worth replaying. Cancelled streams are still skipped by _store.
+            if complete_event is not None and complete_event.is_set():
+                self._store(key, model_name, chunks, cancel_event)
+            raise
+        self._store(key, model_name, chunks, cancel_event)
+
+    def _store(self, key, model_name, chunks, cancel_event):
+        # Only complete responses are worth replaying; a failed request
+        # raises out of stream() before getting here
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        if chunks and not cancelled:
+            self.put(key, model_name, chunks)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, chunks TEXT, size INTEGER, last_access REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_size_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
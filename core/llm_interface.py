@@ -1,52 +1,165 @@
 
-import requests
 import json
+from core.errors import LLMConnectionError, LLMError, LLMResponseError, LLMTimeoutError
+
+class GenerationContext:
+    """
+    Conversation state for reusing Ollama's KV cache across /api/generate
+    calls. The final message of a response carries a `context` (the token
+    history); sending it back with the next prompt makes the server continue
+    from there instead of prefilling the shared prefix again.
+    
+    The context is consumed by each request and only replaced when a response
+    completes, so a cancelled, failed or cache-replayed call starts the next
+    request from scratch.
+    """
+
+    def __init__(self, max_tokens=None):
+        """
+        Args:
+            max_tokens: Drop the history once it grows past this many tokens
+                (keep it below the model's num_ctx)
+        """
+        self.max_tokens = max_tokens
+        self.tokens = None
+
+    def usable(self):
+        """True when the next request can continue the conversation"""
+        if not self.tokens:
+            return False
+        return self.max_tokens is None or len(self.tokens) <= self.max_tokens
+
+    def take(self):
+        """Return the history for a request (None to start fresh) and clear it"""
+        tokens = self.tokens if self.usable() else None
+        self.tokens = None
+        return tokens
+
+    def update(self, tokens):
+        self.tokens = list(tokens) if tokens else None
+
+    def reset(self):
+        self.tokens = None
+
+
+def merge_options(defaults, options):
+    """Per-call sampling options on top of the model's configured defaults"""
+    merged = dict(defaults or {})
+    merged.update(options or {})
+    return merged or None
+
 
 class LLMInterface:
-    def __init__(self, model_name="qwen3:14b"):
+    def __init__(self, model_name="qwen3:14b", cache=None, base_url="http://localhost:11434", keep_alive=None, options=None):
+        """
+        Args:
+            model_name: Ollama model tag
+            cache: Optional LLMCache; identical requests are replayed from disk
+            base_url: Ollama server
+            keep_alive: How long Ollama keeps the model loaded after a request
+                (e.g. "30m"); None uses the server default
+            options: Default Ollama options for every request (num_ctx,
+                num_predict, temperature, stop, ...)
+        """
         self.model_name = model_name
+        self.base_url = base_url.rstrip('/')
+        self.keep_alive = keep_alive
+        self.default_options = dict(options or {})
+        self.cache = cache
+        # requests takes ~100ms to import; only pay for it once a client exists
+        import requests
         # Reuse session for connection pooling and better performance
         self.session = requests.Session()
         self.session.headers.update({'Content-Type': 'application/json'})
 
-    def generate(self, prompt: str, timeout=300):
+    def generate(self, prompt: str, timeout=300, options=None, cancel_event=None, use_cache=True, system=None, context=None,
+                 complete_event=None):
         """
         Send a prompt to a local Ollama model via HTTP API and stream the output.
         
         Args:
             prompt: The prompt to send to the model
             timeout: Request timeout in seconds (default: 300)
+            options: Optional Ollama sampling options (e.g. seed, temperature),
+                merged over the model's default options
+            cancel_event: Optional threading.Event; when set, the stream is
+                closed so the server stops generating
+            use_cache: Set to False to bypass the response cache for this call
+            system: Static system prompt, sent separately so it always forms
+                the start of the rendered prompt
+            context: Optional GenerationContext to continue from and update
+            complete_event: Optional threading.Event the caller sets before
+                closing the stream early once it has the whole answer, so
+                the response cache keeps what was read
+
+        Raises:
+            LLMError: (a subclass of) when the request fails; the response
+                cache never stores failed responses
         """
+        options = merge_options(self.default_options, options)
+        history = context.take() if context is not None else None
+
+        def live():
+            return self._stream(prompt, timeout, options, cancel_event, system, history, context)
+
+        if self.cache is None or not use_cache:
+            return live()
+        return self.cache.stream(self.model_name, prompt, options, live, cancel_event, system=system, context=history,
+                                 complete_event=complete_event)
+
+    def _stream(self, prompt, timeout, options, cancel_event, system=None, history=None, context=None):
+        import requests
+        response = None
         try:
-            url = "http://localhost:11434/api/generate"
+            url = f"{self.base_url}/api/generate"
             payload = {
                 "model": self.model_name,
                 "prompt": prompt,
                 "stream": True
             }
+            if system:
+                payload["system"] = system
+            if history:
+                payload["context"] = history
+            if self.keep_alive is not None:
+                payload["keep_alive"] = self.keep_alive
+            if options:
+                payload["options"] = options
             # Use session for connection pooling
             response = self.session.post(url, json=payload, stream=True, timeout=timeout)
-            response.raise_for_status()
+            if response.status_code >= 400:
+                raise LLMResponseError(f"HTTP {response.status_code} from {url}", response.status_code)
             
             # Use list accumulation for better performance than string concatenation
             chunks = []
             for line in response.iter_lines():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
                 if line:
                     try:
                         data = json.loads(line)
+                        if data.get("error"):
+                            raise LLMResponseError(data["error"])
                         chunk = data.get("response", "")
                         if chunk:
                             chunks.append(chunk)
                             yield chunk
+                        if data.get("done") and context is not None:
+                            context.update(data.get("context"))
                     except json.JSONDecodeError:
                         # Ignore lines that are not valid JSON
                         pass
-        except requests.exceptions.Timeout:
-            yield f"[LLM ERROR] Request timed out after {timeout} seconds"
-        except requests.exceptions.ConnectionError:
-            yield "[LLM ERROR] Cannot connect to Ollama. Is it running on localhost:11434?"
-        except Exception as e:
-            yield f"[LLM ERROR] {e}"
+        except requests.exceptions.Timeout as e:
+            raise LLMTimeoutError(f"Request timed out after {timeout} seconds") from e
+        except requests.exceptions.ConnectionError as e:
+            raise LLMConnectionError(f"Cannot connect to Ollama. Is it running on {self.base_url}?") from e
+        except requests.exceptions.RequestException as e:
+            raise LLMError(str(e)) from e
+        finally:
+            # Closing the response drops the connection, which makes Ollama
+            # stop decoding when the stream is cancelled or abandoned early
+            if response is not None:
+                response.close()
     
     def __del__(self):
         """Clean up session on deletion"""
@@ -1,23 +1,216 @@
+import atexit
 import os
 import datetime
+import queue
+import threading
+import time
+
+# Queue markers understood by the writer and callback threads
+_FLUSH = object()
+_CLEAR = object()
+_STOP = object()
 
 class Logger:
-    def __init__(self, path="logs/laph.log"):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    """
+    Queue-backed log file writer.
+
+    log() only formats the line and enqueues it; a background thread appends
+    queued lines in batches to a file it keeps open, rotating it by size
+    and/or age. Callbacks (e.g. the GUI log pane) run on their own thread so a
+    slow consumer never blocks the caller. Pending lines are flushed by
+    flush(), close() and at interpreter exit.
+    """
+
+    def __init__(self, path="logs/laph.log", max_bytes=10 * 1024 * 1024, backup_count=5,
+                 rotate_interval=0, max_message_chars=16384, flush_interval=0.2):
+        """
+        Args:
+            path: Log file
+            max_bytes: Rotate once the file reaches this size (0 disables)
+            backup_count: Rotated files kept as path.1 ... path.N
+            rotate_interval: Rotate after this many seconds (0 disables)
+            max_message_chars: Longer messages keep their head and tail only
+                (0 disables)
+            flush_interval: Longest time a line waits in the queue before it
+                is written
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval = rotate_interval
+        self.max_message_chars = max_message_chars
+        self.flush_interval = flush_interval
         self.callbacks = []
+        self._queue = queue.SimpleQueue()
+        self._callback_queue = None
+        self._callback_thread = None
+        self._callback_lock = threading.Lock()
+        self._file = None
+        self._opened_at = None
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="laph-logger", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, logging_config, path="logs/laph.log"):
+        """Build a logger from the [logging] section of execution.toml"""
+        return cls(
+            path=path,
+            max_bytes=int(logging_config.get('max_size_mb', 10) * 1024 * 1024),
+            backup_count=logging_config.get('backup_count', 5),
+            rotate_interval=logging_config.get('rotate_interval', 0),
+            max_message_chars=logging_config.get('max_message_chars', 16384),
+            flush_interval=logging_config.get('flush_interval', 0.2)
+        )
 
     def register_callback(self, callback):
-        self.callbacks.append(callback)
+        with self._callback_lock:
+            if self._callback_thread is None:
+                self._callback_queue = queue.SimpleQueue()
+                self._callback_thread = threading.Thread(target=self._callback_loop, name="laph-logger-callbacks", daemon=True)
+                self._callback_thread.start()
+            self.callbacks.append(callback)
 
     def log(self, message: str):
+        if self._closed:
+            return
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[{timestamp}] {message}\n"
-        with open(self.path, "a") as f:
-            f.write(log_message)
-        for callback in self.callbacks:
-            callback(log_message)
+        log_message = f"[{timestamp}] {self._truncate(message)}\n"
+        self._queue.put(log_message)
+        if self.callbacks:
+            self._callback_queue.put(log_message)
 
     def clear(self):
-        with open(self.path, "w") as f:
-            f.write("")
+        """Truncate the log file (after everything logged so far)"""
+        self._queue.put(_CLEAR)
+        self.flush()
+
+    def flush(self, timeout=5.0):
+        """
+        Block until every line logged so far is written and delivered to
+        callbacks.
+
+        Returns:
+            True if everything was flushed within timeout
+        """
+        if self._closed or not self._writer.is_alive():
+            return False
+        markers = [threading.Event()]
+        self._queue.put((_FLUSH, markers[0]))
+        if self._callback_thread is not None:
+            markers.append(threading.Event())
+            self._callback_queue.put((_FLUSH, markers[1]))
+        deadline = time.monotonic() + timeout
+        return all(marker.wait(max(0, deadline - time.monotonic())) for marker in markers)
+
+    def close(self):
+        """Flush pending lines, stop the background threads and close the file"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(_STOP)
+        if self._callback_thread is not None:
+            self._callback_queue.put(_STOP)
+        self._writer.join(timeout=5.0)
+        atexit.unregister(self.close)
+
+    def _truncate(self, message):
+        limit = self.max_message_chars
+        if not limit or len(message) <= limit:
+            return message
+        keep = limit // 2
+        return f"{message[:keep]}\n... [{len(message) - 2 * keep} chars truncated] ...\n{message[-keep:]}"
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Coalesce whatever arrives within flush_interval into one write
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _STOP and not isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if not self._write_batch(batch):
+                return
+
+    def _write_batch(self, batch):
+        """Write a batch; returns False once the stop marker is seen"""
+        lines = []
+        for item in batch:
+            if isinstance(item, str):
+                lines.append(item)
+                continue
+            self._write_lines(lines)
+            lines = []
+            if item is _STOP:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return False
+            if item is _CLEAR:
+                self._reopen('w')
+            elif isinstance(item, tuple) and item[0] is _FLUSH:
+                item[1].set()
+        self._write_lines(lines)
+        return True
+
+    def _write_lines(self, lines):
+        if not lines:
+            return
+        try:
+            if self._file is None:
+                self._reopen('a')
+            elif self._should_rotate():
+                self._rotate()
+            self._file.write("".join(lines))
+            self._file.flush()
+        except OSError:
+            # Logging must never take the repair loop down
+            self._file = None
+
+    def _reopen(self, mode):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, mode, encoding='utf-8')
+        self._opened_at = time.monotonic()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.monotonic() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self._reopen('a')
+        else:
+            self._reopen('w')
+
+    def _callback_loop(self):
+        while True:
+            item = self._callback_queue.get()
+            if item is _STOP:
+                return
+            if isinstance(item, tuple):
+                item[1].set()
+                continue
+            for callback in list(self.callbacks):
+                try:
+                    callback(item)
+                except Exception:
+                    pass
@@ -0,0 +1,55 @@
+import threading
+from collections.abc import MutableMapping
+
+
+class ModelRegistry(MutableMapping):
+    """
+    Role -> model client mapping that creates clients on first use.
+
+    Roles configured from the same models.toml section (thinker, summariser
+    and patcher all use [mini]) share one client, so a run opens one
+    connection pool per model rather than one per role. Assigning a role
+    replaces its client (tests and benchmarks plug in scripted or timed
+    models this way) without creating the configured one.
+    """
+
+    def __init__(self, role_sections, role_configs, factory):
+        """
+        Args:
+            role_sections: Role -> models.toml section
+            role_configs: Role -> model config, read when the client is created
+            factory: Called with a role's model config to create its client
+        """
+        self.role_sections = dict(role_sections)
+        self.role_configs = role_configs
+        self.factory = factory
+        self._overrides = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, role):
+        if role in self._overrides:
+            return self._overrides[role]
+        section = self.role_sections[role]
+        with self._lock:
+            client = self._clients.get(section)
+            if client is None:
+                client = self._clients[section] = self.factory(self.role_configs[role])
+        return client
+
+    def __setitem__(self, role, client):
+        self.role_sections.setdefault(role, role)
+        self._overrides[role] = client
+
+    def __delitem__(self, role):
+        del self._overrides[role]
+
+    def __iter__(self):
+        return iter(self.role_sections)
+
+    def __len__(self):
+        return len(self.role_sections)
+
+    def loaded(self, role):
+        """True if the role's client exists already (assigned or created)"""
+        return role in self._overrides or self.role_sections.get(role) in self._clients
@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+
+
+class _Ticket:
+    """One pending request; compared by identity"""
+
+    __slots__ = ("since",)
+
+    def __init__(self):
+        self.since = time.monotonic()
+
+
+class ModelScheduler:
+    """
+    Admission control for model requests based on which models the server
+    holds in memory.
+
+    Loading a model costs far more than a request, so pending requests are
+    grouped by model: requests for a resident model start right away, and a
+    model that isn't resident only loads once a slot is free or an idle
+    resident model can be evicted. When several models wait for a slot, the
+    one with the most pending requests loads first.
+
+    Two fairness limits keep a busy resident model from starving the rest:
+    after max_streak requests admitted while another model waits for a slot,
+    or once a waiting request is older than max_wait seconds, the resident
+    model stops admitting new requests so it can drain and be swapped out.
+
+    The resident set is synced with the server's /api/ps when a request
+    finds its model not resident (at most every refresh_interval). Only models
+    this process requested are counted as resident and ever evicted; models
+    loaded by other clients of the server take up slots but are left alone.
+    Evicted models can optionally be unloaded with a keep_alive=0 request.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_resident=2, max_streak=8, max_wait=30.0, base_url="http://localhost:11434",
+                 refresh_interval=5.0, unload=False, poll_interval=0.05):
+        """
+        Args:
+            max_resident: Models kept in server memory at once
+            max_streak: Requests a resident model may start while another
+                model waits for a slot, before it has to make way
+            max_wait: Seconds a request may wait before its model is loaded
+                next, regardless of how many requests other models have
+            base_url: Ollama server queried for /api/ps and sent unloads
+                (None keeps the resident set locally only)
+            refresh_interval: Minimum seconds between /api/ps queries
+            unload: Unload evicted models instead of leaving it to the server
+                (only ever models this process requested)
+            poll_interval: How often waiting requests check for cancellation
+        """
+        self.max_resident = max(1, max_resident)
+        self.max_streak = max(1, max_streak)
+        self.max_wait = max_wait
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.refresh_interval = refresh_interval
+        self.unload = unload
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        # Resident models this process requested, least recently used first
+        self.resident = OrderedDict()
+        # Every model this process has requested, and the loaded models it hasn't
+        self.requested = set()
+        self.foreign = set()
+        self.active = {}
+        self.waiting = {}
+        self.streak = {}
+        self.loads = 0
+        self.evictions = 0
+        self._next_refresh = 0.0
+
+    @classmethod
+    def from_config(cls, scheduler_config):
+        """Build a scheduler from the [scheduler] section of execution.toml"""
+        return cls(
+            max_resident=scheduler_config.get('max_resident', 2),
+            max_streak=scheduler_config.get('max_streak', 8),
+            max_wait=scheduler_config.get('max_wait', 30.0),
+            base_url=scheduler_config.get('base_url', "http://localhost:11434"),
+            refresh_interval=scheduler_config.get('refresh_interval', 5.0),
+            unload=scheduler_config.get('unload', False)
+        )
+
+    @classmethod
+    def shared(cls, scheduler_config):
+        """The process-wide scheduler: every RepairLoop talks to the same server"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls.from_config(scheduler_config)
+            return cls._shared
+
+    def acquire(self, model, cancel_event=None):
+        """
+        Block until a request for model may start.
+
+        Returns:
+            True once admitted (call release() when the request ends), False
+            if cancel_event was set while waiting
+        """
+        # Only a model that has to be loaded is worth a round trip to /api/ps
+        with self._cond:
+            resident = model in self.resident
+        if not resident:
+            self.refresh()
+        evicted = []
+        ticket = _Ticket()
+        with self._cond:
+            queue = self.waiting.setdefault(model, deque())
+            queue.append(ticket)
+            try:
+                while not self._admit(model, evicted):
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False
+                    self._cond.wait(self.poll_interval)
+            finally:
+                queue.remove(ticket)
+                if not queue:
+                    del self.waiting[model]
+                self._cond.notify_all()
+        for name in evicted:
+            self._unload(name)
+        return True
+
+    def release(self, model):
+        with self._cond:
+            self.active[model] -= 1
+            if model in self.resident:
+                self.resident.move_to_end(model)
+            self._cond.notify_all()
+
+    def _admit(self, model, evicted):
+        blocked = self._blocked_models(model)
+        if model in self.resident:
+            if blocked and self._must_yield(model, blocked):
+                return False
+        else:
+            if model != self._next_to_load():
+                return False
+            if len(self.resident) >= self._capacity():
+                victim = self._victim()
+                if victim is None:
+                    return False
+                del self.resident[victim]
+                self.evictions += 1
+                evicted.append(victim)
+            self.resident[model] = None
+            self.requested.add(model)
+            self.foreign.discard(model)
+            self.loads += 1
+            self.streak[model] = 0
+        self.active[model] = self.active.get(model, 0) + 1
+        if blocked:
+            self.streak[model] = self.streak.get(model, 0) + 1
+        self.resident.move_to_end(model)
+        return True
+
+    def _blocked_models(self, model):
+        """Other models with pending requests that need a slot to free up"""
+        if len(self.resident) < self._capacity():
+            return []
+        return [name for name in self.waiting if name != model and name not in self.resident]
+
+    def _capacity(self):
+        """Slots left for this process's models once other clients' models are counted"""
+        # Always keep one: the server evicts foreign models itself if it must
+        return max(1, self.max_resident - len(self.foreign))
+
+    def _must_yield(self, model, blocked):
+        if self.streak.get(model, 0) >= self.max_streak:
+            return True
+        now = time.monotonic()
+        return any(now - self.waiting[name][0].since >= self.max_wait for name in blocked)
+
+    def _next_to_load(self):
+        """The waiting model that gets the next free slot"""
+        candidates = [name for name in self.waiting if name not in self.resident]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        overdue = [name for name in candidates if now - self.waiting[name][0].since >= self.max_wait]
+        if overdue:
+            return min(overdue, key=lambda name: self.waiting[name][0].since)
+        return max(candidates, key=lambda name: (len(self.waiting[name]), -self.waiting[name][0].since))
+
+    def _victim(self):
+        """Least recently used idle resident model, preferring ones nobody is waiting for"""
+        idle = [name for name in self.resident if not self.active.get(name)]
+        for name in idle:
+            if name not in self.waiting:
+                return name
+        return idle[0] if idle else None
+
+    def refresh(self, force=False):
+        """Sync the resident set with the server's /api/ps (at most every refresh_interval)"""
+        if self.base_url is None:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        self._next_refresh = now + self.refresh_interval
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/api/ps", timeout=2) as response:
+                loaded = [entry.get("name") or entry.get("model") for entry in json.load(response).get("models", [])]
+        except Exception:
+            # Server down or too old for /api/ps: keep the local view
+            return
+        with self._cond:
+            # Models loading right now may not be listed yet
+            keep = [name for name in self.resident if name in loaded or self.active.get(name)]
+            self.resident = OrderedDict((name, None) for name in keep)
+            for name in loaded:
+                if name in self.requested:
+                    self.resident.setdefault(name, None)
+            self.foreign = {name for name in loaded if name not in self.requested}
+            self._cond.notify_all()
+
+    def _unload(self, model):
+        if not self.unload or self.base_url is None:
+            return
+        request = urllib.request.Request(
+            f"{self.base_url}/api/generate",
+            data=json.dumps({"model": model, "keep_alive": 0}).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+        except Exception:
+            # The server evicts on its own when it needs the memory
+            pass
+
+
+class ScheduledModel:
+    """Wraps a model client so each generate() waits for the scheduler to admit it"""
+
+    def __init__(self, model, scheduler):
+        self.model = model
+        self.model_name = model.model_name
+        self.scheduler = scheduler
+
+    def generate(self, *args, cancel_event=None, **kwargs):
+        if not self.scheduler.acquire(self.model_name, cancel_event):
+            return
+        try:
+            yield from self.model.generate(*args, cancel_event=cancel_event, **kwargs)
+        finally:
+            self.scheduler.release(self.model_name)
@@ -0,0 +1,225 @@
+import json
+from typing import NamedTuple
+from core.acceptance import AcceptanceSuite
+
+# Prefix of the report line the profiling harness writes to stdout
+MARKER = "@@LAPH-PROFILE@@ "
+
+# Runs in the sandbox: executes the program as __main__ under cProfile with
+# tracemalloc tracing, then reports its hottest functions and the lines
+# holding the most memory. The program's own output is left as it is.
+HARNESS = r'''
+import cProfile
+import json
+import linecache
+import pstats
+import sys
+import tracemalloc
+
+_program = {program!r}
+_top_n = {top_n!r}
+linecache.cache["<solution>"] = (len(_program), None, _program.splitlines(True), "<solution>")
+
+def _report(profiler, peak, snapshot):
+    functions = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        if filename == "<solution>" and cumulative > 0:
+            functions.append({{"function": name, "line": line, "calls": calls,
+                               "own_time": own, "cumulative_time": cumulative}})
+    functions.sort(key=lambda row: row["own_time"], reverse=True)
+    allocations = []
+    for stat in snapshot.statistics("lineno"):
+        frame = stat.traceback[0]
+        if frame.filename == "<solution>" and frame.lineno and stat.size >= 1024:
+            allocations.append({{"line": frame.lineno, "size_kb": stat.size / 1024,
+                                 "source": linecache.getline("<solution>", frame.lineno).strip()}})
+        if len(allocations) >= _top_n:
+            break
+    sys.__stdout__.write({marker!r} + json.dumps({{
+        "hotspots": functions[:_top_n], "allocations": allocations, "peak_traced_mb": peak / (1024 * 1024)
+    }}) + "\n")
+    sys.__stdout__.flush()
+
+_profiler = cProfile.Profile()
+_namespace = {{"__name__": "__main__", "__file__": "<solution>"}}
+_code = compile(_program, "<solution>", "exec")
+tracemalloc.start()
+_profiler.enable()
+try:
+    exec(_code, _namespace)
+finally:
+    _profiler.disable()
+    _peak = tracemalloc.get_traced_memory()[1]
+    _snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    sys.stdout.flush()
+    _report(_profiler, _peak, _snapshot)
+'''
+
+
+class Measurement(NamedTuple):
+    """Best-of-repeats cost of a program on a fixed input"""
+    wall_time: float
+    peak_rss_mb: float
+    stdout: str
+    # Spread (max - min) over the repeats: differences below it are noise
+    wall_spread: float = 0.0
+    rss_spread: float = 0.0
+
+
+class Hotspot(NamedTuple):
+    function: str
+    line: int
+    calls: int
+    own_time: float
+    cumulative_time: float
+
+
+class Allocation(NamedTuple):
+    """Memory still held at exit by objects allocated on one line"""
+    line: int
+    size_kb: float
+    source: str
+
+
+class ProfileReport(NamedTuple):
+    hotspots: list
+    allocations: list
+    peak_traced_mb: float
+
+
+class Profiler:
+    """
+    Measures and profiles a working program on a fixed input, for the repair
+    loop's optimize phase.
+
+    measure() times plain runs (no profiler attached) and keeps the best of
+    several repeats, so comparisons between versions aren't skewed by
+    instrumentation or a single noisy run. profile() runs the program once
+    under cProfile and tracemalloc to find where the time and memory go.
+    """
+
+    def __init__(self, repeats=3, min_improvement=0.1, min_time_gain=0.05, min_memory_gain_mb=2.0, top_n=8):
+        """
+        Args:
+            repeats: Runs per measurement; the fastest and leanest are kept
+            min_improvement: Fraction by which runtime or peak memory must
+                drop for a new version to count as faster or leaner
+            min_time_gain: Seconds the runtime must drop by, at least
+            min_memory_gain_mb: MB the peak memory must drop by, at least
+            top_n: Hotspots and allocation sites reported by profile()
+        """
+        self.repeats = max(1, repeats)
+        self.min_improvement = min_improvement
+        self.min_time_gain = min_time_gain
+        self.min_memory_gain_mb = min_memory_gain_mb
+        self.top_n = top_n
+
+    @classmethod
+    def from_config(cls, optimize_config):
+        """Build a profiler from the [optimize] section of execution.toml"""
+        return cls(
+            repeats=optimize_config.get('repeats', 3),
+            min_improvement=optimize_config.get('min_improvement', 0.1),
+            min_time_gain=optimize_config.get('min_time_gain', 0.05),
+            min_memory_gain_mb=optimize_config.get('min_memory_gain_mb', 2.0),
+            top_n=optimize_config.get('top_n', 8)
+        )
+
+    def measure(self, runner, code, stdin="", cancel_event=None):
+        """
+        Run a program repeatedly without the memo.
+
+        Returns:
+            Measurement with the lowest wall time and peak RSS seen and their
+            spread, or None if any run failed or its output changed between runs
+        """
+        wall_times, peaks, stdout = [], [], None
+        for _ in range(self.repeats):
+            result = runner.execute(code, cancel_event=cancel_event, use_memo=False, stdin=stdin)
+            if result.exitcode != 0 or (stdout is not None and result.stdout != stdout):
+                return None
+            stdout = result.stdout
+            wall_times.append(result.usage.get('wall_time', 0.0))
+            peaks.append(result.usage.get('peak_rss_mb') or 0.0)
+        return Measurement(min(wall_times), min(peaks), stdout,
+                           max(wall_times) - min(wall_times), max(peaks) - min(peaks))
+
+    def profile(self, runner, code, stdin="", cancel_event=None):
+        """
+        Run a program once under cProfile and tracemalloc.
+
+        Returns:
+            ProfileReport, or None if the program didn't finish (profiling
+            overhead can push a slow program over the runner's limits)
+        """
+        harness = HARNESS.format(program=code, top_n=self.top_n, marker=MARKER)
+        result = runner.execute(harness, cancel_event=cancel_event, use_memo=False, stdin=stdin)
+        for line in result.stdout.split('\n'):
+            if line.startswith(MARKER):
+                record = json.loads(line[len(MARKER):])
+                return ProfileReport(
+                    [Hotspot(**row) for row in record["hotspots"]],
+                    [Allocation(**row) for row in record["allocations"]],
+                    record["peak_traced_mb"]
+                )
+        return None
+
+    def compare(self, baseline, candidate):
+        """
+        Decide whether a candidate version beats the baseline.
+
+        The candidate must print the same output, and be faster or leaner by
+        at least min_improvement without the other metric getting worse by
+        more than that. A change only counts when it is also larger than the
+        absolute floor (min_time_gain, min_memory_gain_mb) and than the
+        spread seen between repeats of either version, so timing noise on
+        short programs is not taken for an improvement.
+
+        Returns:
+            (improved, reason)
+        """
+        if candidate is None:
+            return False, "it failed or its output was not stable across runs"
+        if AcceptanceSuite.normalize(candidate.stdout) != AcceptanceSuite.normalize(baseline.stdout):
+            return False, "its output differs from the working program's"
+        time_gain = self._gain(baseline.wall_time, candidate.wall_time,
+                               max(self.min_time_gain, baseline.wall_spread, candidate.wall_spread))
+        memory_gain = self._gain(baseline.peak_rss_mb, candidate.peak_rss_mb,
+                                 max(self.min_memory_gain_mb, baseline.rss_spread, candidate.rss_spread))
+        summary = f"runtime {self._percent(time_gain)}, peak memory {self._percent(memory_gain)}"
+        if time_gain < -self.min_improvement or memory_gain < -self.min_improvement:
+            return False, f"it is worse ({summary})"
+        if time_gain < self.min_improvement and memory_gain < self.min_improvement:
+            return False, f"no measurable improvement ({summary})"
+        return True, summary
+
+    @staticmethod
+    def _gain(before, after, noise):
+        """Fraction by which a cost dropped (negative when it grew); 0 for changes within the noise"""
+        if before <= 0 or abs(before - after) <= noise:
+            return 0.0
+        return (before - after) / before
+
+    @staticmethod
+    def _percent(gain):
+        return f"{-gain:+.0%}"
+
+    @staticmethod
+    def describe(measurement, report):
+        """The measurement and profile as prompt text"""
+        lines = [f"Runtime: {measurement.wall_time:.3f}s, peak memory: {measurement.peak_rss_mb:.1f} MB"]
+        if report is None:
+            lines.append("(No profile: the program did not finish under the profiler.)")
+            return "\n".join(lines)
+        if report.hotspots:
+            lines.append("Hottest functions (own time, cumulative time, calls):")
+            for spot in report.hotspots:
+                lines.append(f"- {spot.function} (line {spot.line}): {spot.own_time:.3f}s, "
+                             f"{spot.cumulative_time:.3f}s, {spot.calls} calls")
+        lines.append(f"Peak traced Python memory: {report.peak_traced_mb:.1f} MB")
+        if report.allocations:
+            lines.append("Memory held at exit by line:")
+            for allocation in report.allocations:
+                lines.append(f"- line {allocation.line} ({allocation.size_kb:.0f} KB): {allocation.source}")
+        return "\n".join(lines)
@@ -6,6 +6,9 @@ class PromptManager:
         self.prompts['summariser'] = self._load_prompt('prompts/summariser_prompt.txt')
         self.prompts['vision'] = self._load_prompt('prompts/vision_prompt.txt')
         self.prompts['coder'] = self._load_prompt('prompts/coder_prompt.txt')
+        self.prompts['patcher'] = self._load_prompt('prompts/patch_prompt.txt')
+        self.prompts['tester'] = self._load_prompt('prompts/tester_prompt.txt')
+        self.prompts['optimizer'] = self._load_prompt('prompts/optimizer_prompt.txt')
 
     def _load_prompt(self, path):
         try:
@@ -16,11 +19,68 @@ class PromptManager:
         except Exception as e:
             raise RuntimeError(f"Error loading prompt from {path}: {e}")
 
+    # Prompts are laid out most-stable first (system text, task, then the
+    # per-iteration code and error) so the server can reuse the cached prefix
+
     def build_thinker(self, task, code=None, error=None):
-        return self.prompts['thinker'] + f"\n\nTask: {task}\n" + (f"Previous code: {code}\n" if code else "") + (f"Error: {error}\n" if error else "")
+        system, prompt = self.split_thinker(task, code, error)
+        return system + "\n\n" + prompt
+
+    def split_thinker(self, task, code=None, error=None, followup=False):
+        """
+        Return (system, prompt) for the thinker. A followup continues an
+        earlier conversation about the same task, so the task is not repeated.
+        """
+        prompt = ("" if followup else f"Task: {task}\n") + (f"Previous code: {code}\n" if code else "") + (f"Error: {error}\n" if error else "")
+        return self.prompts['thinker'], prompt
+
+    def build_coder(self, spec, code=None, error=None, fixes=None):
+        system, prompt = self.split_coder(spec, code, error, fixes=fixes)
+        return system + "\n\n" + prompt
+
+    def split_coder(self, spec, code=None, error=None, followup=False, fixes=None):
+        """
+        Return (system, prompt) for the coder. A followup continues the
+        coder's previous turn, whose answer already holds the previous code.
+        fixes is FixStore.describe() text of fixes known to work for the error.
+        """
+        prompt = f"Specification: {spec}\n" + (f"Previous code: {code}\n" if code and not followup else "") + (f"Error: {error}\n" if error else "")
+        return self.prompts['coder'], prompt + self._known_fixes(fixes)
+
+    def build_patch(self, code, error, fixes=None):
+        system, prompt = self.split_patch(code, error, fixes)
+        return system + "\n\n" + prompt
+
+    def split_patch(self, code, error, fixes=None):
+        """Return (system, prompt) for the fast patch path: just the program and its error"""
+        return self.prompts['patcher'], f"Program:\n{code}\n\nError: {error}\n" + self._known_fixes(fixes)
+
+    @staticmethod
+    def _known_fixes(fixes):
+        return f"\nFixes that resolved this error in earlier programs:\n{fixes}\n" if fixes else ""
+
+    def build_tester(self, task):
+        system, prompt = self.split_tester(task)
+        return system + "\n\n" + prompt
+
+    def split_tester(self, task):
+        """Return (system, prompt) asking for acceptance tests of a task"""
+        return self.prompts['tester'], f"Task: {task}\n"
+
+    def build_optimizer(self, code, profile, stdin=None, rejected=None):
+        system, prompt = self.split_optimizer(code, profile, stdin, rejected)
+        return system + "\n\n" + prompt
 
-    def build_coder(self, spec, code=None, error=None):
-        return self.prompts['coder'] + f"\n\nSpecification: {spec}\n" + (f"Previous code: {code}\n" if code else "") + (f"Error: {error}\n" if error else "")
+    def split_optimizer(self, code, profile, stdin=None, rejected=None):
+        """
+        Return (system, prompt) asking for a faster or leaner version of a
+        working program. profile is Profiler.describe() text; rejected says
+        why the previous attempt was not kept.
+        """
+        prompt = f"Program:\n{code}\n\n" + (f"Input:\n{stdin}\n\n" if stdin else "") + f"Profile:\n{profile}\n"
+        if rejected:
+            prompt += f"\nThe previous attempt was not kept: {rejected}\n"
+        return self.prompts['optimizer'], prompt
 
     def build_summariser(self, logs):
         return self.prompts['summariser'] + f"\n\nLogs: {logs}\n"
@@ -1,152 +1,886 @@
 
 import os
 import time
-from core.llm_interface import LLMInterface
-from core.runner import CodeRunner
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.config import Config
+from core.deadline import Deadline
+from core.errors import DeadlineExceeded, LLMError
+from core.endpoint_pool import EndpointPool, PooledModel
+from core.llm_interface import GenerationContext
+from core.llm_cache import LLMCache
+from core.model_registry import ModelRegistry
+from core.model_scheduler import ModelScheduler, ScheduledModel
+from core.runner import CodeRunner, format_usage
 from core.prompt_manager import PromptManager
 from core.logger import Logger
-from core.code_extractor import CodeExtractor
+from core.code_extractor import CodeExtractor, StreamingCodeExtractor
 from core.code_sanitizer import CodeSanitizer
+from core.code_analysis import analyze_code
+from core.acceptance import AcceptanceSuite
+from core.profiler import Profiler
+from core.context_builder import ContextBuilder
+from core.error_router import ErrorRouter
+from core.fix_store import FixStore, apply_diff, error_signature
+from core.tracing import Tracer
+
+# models.toml section configuring each role
+ROLE_SECTIONS = {'thinker': 'mini', 'summariser': 'mini', 'vision': 'vision', 'coder': 'coder', 'patcher': 'mini',
+                 'tester': 'coder'}
+
+# Model servers the clients can talk to (models.toml `provider`)
+PROVIDERS = ('ollama',)
+
+# Iteration route taken when a recorded fix is replayed instead of calling a model
+KNOWN_FIX = "known_fix"
+
+# Sampling for requests made once per task (the first spec, generated tests):
+# reproducible, so the response cache can replay them when a task runs again
+DETERMINISTIC_OPTIONS = {'temperature': 0}
+
+# Roles that answer with the complete corrected program, so their previous
+# code is never trimmed (a trimmed file can only come back truncated)
+WHOLE_PROGRAM_ROLES = ('patcher',)
 
 class RepairLoop:
     def __init__(self, logger: Logger, model_name="qwen3:14b"):
-        # Load all models
-        import toml
         self.logger = logger
+        config = Config()
+        self.cache = LLMCache.from_config(config.get_cache_config())
+        self.tracer = Tracer.from_config(config.get_tracing_config())
+        self.llm_config = config.get_llm_config()
+        self.retry_config = config.get_retry_config()
+        # Time budget of the running task (none outside run_task)
+        self.deadline = Deadline()
+        scheduler_config = config.get_scheduler_config()
+        # Shared by every loop in the process (batch workers, GUI)
+        self.scheduler = ModelScheduler.shared(scheduler_config) if scheduler_config.get('enabled', False) else None
+        self.endpoints_config = config.get_endpoints_config()
+        # Sticky routing key for endpoint pools, new for every task
+        self.route_key = None
+
+        # Clients are created on first use (models.toml defaults come from Config)
+        self.role_configs = {role: config.get_model_config(section) for role, section in ROLE_SECTIONS.items()}
+        self.models = ModelRegistry(ROLE_SECTIONS, self.role_configs, self._make_model)
+        # Per-run conversation state for roles with reuse_context enabled
+        self.contexts = {}
         
-        try:
-            models_cfg = toml.load("configs/models.toml")
-            self.models = {
-                'thinker': LLMInterface(models_cfg['mini']['name']),
-                'summariser': LLMInterface(models_cfg['mini']['name']),
-                'vision': LLMInterface(models_cfg['vision']['name']),
-                'coder': LLMInterface(models_cfg['coder']['name'])
-            }
-        except FileNotFoundError:
-            self.logger.log("ERROR: configs/models.toml not found. Using default models.")
-            self.models = {
-                'thinker': LLMInterface("qwen3:4b"),
-                'summariser': LLMInterface("qwen3:4b"),
-                'vision': LLMInterface("qwen3-vl:8b"),
-                'coder': LLMInterface("qwen2.5-coder:7b-instruct")
-            }
-        except Exception as e:
-            self.logger.log(f"ERROR loading models config: {e}. Using defaults.")
-            self.models = {
-                'thinker': LLMInterface("qwen3:4b"),
-                'summariser': LLMInterface("qwen3:4b"),
-                'vision': LLMInterface("qwen3-vl:8b"),
-                'coder': LLMInterface("qwen2.5-coder:7b-instruct")
-            }
-        
-        self.runner = CodeRunner()
+        self.runner = CodeRunner.from_config(config.get_runner_config(), config.get_resource_limits(), tracer=self.tracer)
+        self.best_of_n = config.get_best_of_n_config()
+        self.early_stop = self.llm_config.get('early_stop', True)
+        self.context = ContextBuilder.from_config(config.get_context_config())
+        self.router = ErrorRouter.from_config(config.get_routing_config())
+        self.fixes = FixStore.from_config(config.get_fixes_config())
+        self.acceptance_config = config.get_acceptance_config()
+        self.acceptance = None
+        self.optimize_config = config.get_optimize_config()
+        self.profiler = Profiler.from_config(self.optimize_config)
+        self.last_run_stats = {}
         try:
             self.prompts = PromptManager()
         except Exception as e:
             self.logger.log(f"ERROR loading prompts: {e}")
             raise
 
+    def _make_model(self, model_cfg):
+        """
+        Create a model client for a models.toml section. A model served by
+        several endpoints gets a client per server behind a shared pool.
+        """
+        provider = model_cfg.get('provider', 'ollama')
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unsupported provider '{provider}' for model {model_cfg['name']} "
+                             f"(supported: {', '.join(PROVIDERS)})")
+        urls = model_cfg.get('endpoints') or self.endpoints_config.get('urls') or ["http://localhost:11434"]
+        if len(urls) == 1:
+            client = self._make_client(model_cfg, urls[0])
+        else:
+            client = PooledModel(
+                model_cfg['name'], EndpointPool.shared(urls, self.endpoints_config),
+                lambda url: self._make_client(model_cfg, url), route_key=lambda: self.route_key
+            )
+        return ScheduledModel(client, self.scheduler) if self.scheduler is not None else client
+
+    def _make_client(self, model_cfg, base_url):
+        """Create the HTTP client selected in execution.toml for one server"""
+        # HTTP clients are imported on first use to keep startup fast
+        if self.llm_config.get('client') == 'asyncio':
+            from core.async_llm_interface import ThreadedLLMInterface
+            return ThreadedLLMInterface(
+                model_cfg['name'], base_url=base_url, max_connections=self.llm_config.get('max_connections', 4),
+                cache=self.cache, keep_alive=model_cfg.get('keep_alive'), options=model_cfg.get('options')
+            )
+        from core.llm_interface import LLMInterface
+        return LLMInterface(
+            model_cfg['name'], cache=self.cache, base_url=base_url,
+            keep_alive=model_cfg.get('keep_alive'), options=model_cfg.get('options')
+        )
+
+    def warm_up(self, roles=None):
+        """
+        Load models into server memory in the background, so the first task
+        doesn't wait for them. Each distinct model gets an empty generate
+        request carrying its keep_alive and options (a different num_ctx
+        would make the server reload the model on the first real request).
+
+        Args:
+            roles: Roles whose models are loaded (default: [llm] warm_up)
+
+        Returns:
+            The started daemon threads, one per model
+        """
+        if roles is None:
+            roles = self.llm_config.get('warm_up', ['thinker', 'coder'])
+        threads = []
+        seen = set()
+        for role in roles:
+            model = self.models[role]
+            if model.model_name in seen:
+                continue
+            seen.add(model.model_name)
+            thread = threading.Thread(target=self._warm_up_model, args=(role, model),
+                                      name=f"laph-warm-up-{role}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _warm_up_model(self, role, model):
+        start = time.monotonic()
+        with self.tracer.span("warm_up", role=role, model=model.model_name) as span:
+            try:
+                ''.join(model.generate("", use_cache=False))
+                error = None
+            except LLMError as e:
+                error = e
+            span.set(failed=error is not None)
+        if error is not None:
+            self.logger.log(f"Warm-up of {model.model_name} failed: {error}")
+        else:
+            self.logger.log(f"--- {model.model_name} loaded for {role} in {time.monotonic() - start:.2f}s ---")
+
+    def _record_ttft(self, role, request_start):
+        """Keep the time to first token of a role's first request in this run"""
+        ttft = self.last_run_stats.setdefault('ttft', {})
+        if role not in ttft:
+            ttft[role] = time.monotonic() - request_start
+
+    def _new_contexts(self):
+        """Fresh conversation state for every role that reuses the server-side context"""
+        contexts = {}
+        for role in ('thinker', 'coder'):
+            cfg = self.role_configs[role]
+            if cfg.get('reuse_context'):
+                # Start over before the history crowds out the new prompt
+                num_ctx = cfg.get('options', {}).get('num_ctx', 2048)
+                contexts[role] = GenerationContext(max_tokens=int(num_ctx * 0.75))
+        return contexts
+
+    def _forget_coder_turn(self):
+        """
+        Drop the coder's conversation when the current program didn't come
+        from its last contextual answer (patcher, known fix, best-of-N), so
+        its next prompt carries the program instead of a stale history.
+        """
+        context = self.contexts.get('coder')
+        if context is not None:
+            context.reset()
+
+    def _compact_context(self, role, fixed, code, last_error):
+        """
+        Trim previous code and error output to the role's prompt budget
+        (only the error for roles in WHOLE_PROGRAM_ROLES).
+        
+        Returns:
+            (code, error) to put in the prompt
+        """
+        budget = self.role_configs[role].get('prompt_budget')
+        with self.tracer.span("compaction", role=role) as span:
+            context = self.context.compact(self.prompts.prompts[role] + fixed, code, last_error, budget,
+                                           trim_code=role not in WHOLE_PROGRAM_ROLES)
+            span.set(tokens_before=context.tokens_before, tokens_after=context.tokens_after)
+        if context.tokens_saved > 0:
+            self.logger.log(f"--- {role.capitalize()} context compacted: ~{context.tokens_saved} tokens saved ---")
+            self.last_run_stats['tokens_saved'] = self.last_run_stats.get('tokens_saved', 0) + context.tokens_saved
+        return context.code, context.error
+
     def _generate_spec(self, task, code, last_error, stream_callback):
-        thinker_prompt = self.prompts.build_thinker(task, code, last_error)
-        self.logger.log("--- Thinker Prompt ---\n" + thinker_prompt)
+        context = self.contexts.get('thinker')
+        followup = context is not None and context.usable()
+        system, thinker_prompt = self.prompts.split_thinker(task, code, last_error, followup=followup)
+        if followup:
+            # The system prompt and task are already in the server-side context
+            system = None
+            self.logger.log("--- Thinker Prompt (continuing conversation) ---\n" + thinker_prompt)
+        else:
+            self.logger.log("--- Thinker Prompt ---\n" + system + "\n\n" + thinker_prompt)
         
         # Use list accumulation for better performance
         spec_chunks = []
         self.logger.log("--- Thinker Output ---")
-        for chunk in self.models['thinker'].generate(thinker_prompt):
-            spec_chunks.append(chunk)
-            if stream_callback:
-                stream_callback(chunk, "thinker")
-        return ''.join(spec_chunks)
-
-    def _generate_code(self, spec, code, last_error, stream_callback):
-        coder_prompt = self.prompts.build_coder(spec, code, last_error)
-        self.logger.log("--- Coder Prompt ---\n" + coder_prompt)
-        
-        # Use list accumulation for better performance
-        output_chunks = []
-        self.logger.log("--- Coder Output ---")
-        for chunk in self.models['coder'].generate(coder_prompt):
-            output_chunks.append(chunk)
-            if stream_callback:
-                stream_callback(chunk, "coder")
-        
-        raw_output = ''.join(output_chunks)
+        model = self.models['thinker']
+        request_start = time.monotonic()
+        # Later specs answer a failure and are asked again if it repeats, so they keep sampling
+        options = DETERMINISTIC_OPTIONS if code is None and not followup else None
+        with self.tracer.span("thinker", model=model.model_name, prompt_chars=len(thinker_prompt), followup=followup) as span:
+            for chunk in model.generate(thinker_prompt, system=system, context=context, options=options,
+                                        timeout=self._request_timeout(), cancel_event=self.deadline.event):
+                if not spec_chunks:
+                    span.first_token()
+                    self._record_ttft('thinker', request_start)
+                spec_chunks.append(chunk)
+                if stream_callback:
+                    stream_callback(chunk, "thinker")
+            spec = ''.join(spec_chunks)
+            span.set(chunks=len(spec_chunks), output_chars=len(spec))
+        return spec
+
+    def _generate_code(self, spec, code, last_error, stream_callback, options=None, cancel_event=None, label="Coder",
+                       log_prompt=True, context=None, fixes=None):
+        followup = context is not None and context.usable()
+        system, coder_prompt = self.prompts.split_coder(spec, code, last_error, followup=followup, fixes=fixes)
+        if followup:
+            # The previous code is the coder's own last answer in the context
+            system = None
+        if log_prompt:
+            header = "--- Coder Prompt (continuing conversation) ---\n" if followup else "--- Coder Prompt ---\n" + system + "\n\n"
+            self.logger.log(header + coder_prompt)
+        return self._complete_code('coder', system, coder_prompt, stream_callback, options=options,
+                                   cancel_event=cancel_event, label=label, context=context)
+
+    def _patch_code(self, code, last_error, stream_callback, fixes=None):
+        """Ask the fast patch model for a minimal fix, without a spec"""
+        system, patch_prompt = self.prompts.split_patch(code, last_error, fixes)
+        self.logger.log("--- Patch Prompt ---\n" + system + "\n\n" + patch_prompt)
+        return self._complete_code('patcher', system, patch_prompt, stream_callback, label="Patcher")
+
+    def _complete_code(self, role, system, prompt, stream_callback, options=None, cancel_event=None, label="Coder",
+                       context=None):
+        """
+        Stream a code-writing model's response and extract, validate and
+        sanitize the program in it.
+
+        Returns:
+            Extracted code, or the raw response if no valid code was found
+        """
+        followup = context is not None and context.usable()
+        # Code blocks are tracked while streaming; once a valid one closes the
+        # rest of the response (usually an explanation) is not worth waiting for.
+        # Not when reusing the context: only the final message carries it
+        extractor = StreamingCodeExtractor(early_stop=self.early_stop and context is None)
+        chunk_count = 0
+        self.logger.log(f"--- {label} Output ---")
+        model = self.models[role]
+        if cancel_event is None:
+            cancel_event = self.deadline.event
+        # Set when the stream is closed because the code block is complete,
+        # so the response cache keeps what was read
+        complete = threading.Event()
+        request_start = time.monotonic()
+        with self.tracer.span(role, model=model.model_name, label=label, options=options,
+                              prompt_chars=len(prompt), followup=followup) as span:
+            stream = model.generate(prompt, options=options, cancel_event=cancel_event, system=system,
+                                    context=context, timeout=self._request_timeout(), complete_event=complete)
+            try:
+                for chunk in stream:
+                    if not chunk_count:
+                        span.first_token()
+                        self._record_ttft(role, request_start)
+                    chunk_count += 1
+                    if stream_callback:
+                        stream_callback(chunk, "coder")
+                    if extractor.feed(chunk):
+                        complete.set()
+                        break
+            finally:
+                # Closing the generator drops the connection so the server stops decoding
+                stream.close()
+            extractor.finish()
+            raw_output = extractor.text
+            stopped_early = extractor.early_code is not None
+            cancelled = cancel_event.is_set()
+            span.set(chunks=chunk_count, output_chars=len(raw_output), cancelled=cancelled, stopped_early=stopped_early)
+
+        if cancelled:
+            # A competing candidate already won (or the deadline passed); skip extraction entirely
+            return raw_output
+        if stopped_early:
+            self.logger.log("--- Code block complete, stopped generation early ---")
         
         # Extract actual code from LLM response
-        extracted_code = CodeExtractor.extract_code(raw_output)
+        with self.tracer.span("extraction", input_chars=len(raw_output)) as span:
+            extracted_code = extractor.code()
+            span.set(output_chars=len(extracted_code))
         
-        # Validate the extracted code
-        is_valid, error_msg = CodeExtractor.validate_code(extracted_code)
+        # Validate the extracted code (an early-stop block was validated while streaming)
+        if stopped_early:
+            is_valid, error_msg = True, ""
+        else:
+            with self.tracer.span("validation", code_chars=len(extracted_code)) as span:
+                is_valid, error_msg = CodeExtractor.validate_code(extracted_code)
+                span.set(valid=is_valid)
         if not is_valid:
             self.logger.log(f"WARNING: Code extraction/validation issue: {error_msg}")
             self.logger.log("Using raw output as fallback.")
             return raw_output
         
         # Analyze code for security issues
-        warnings, errors = CodeSanitizer.analyze(extracted_code)
+        with self.tracer.span("sanitize", code_chars=len(extracted_code)) as span:
+            warnings, errors = CodeSanitizer.analyze(extracted_code)
+            undefined = analyze_code(extracted_code).undefined_names
+            span.set(warnings=len(warnings), errors=len(errors), undefined_names=len(undefined))
         if warnings:
             self.logger.log("--- Security Analysis Warnings ---")
             for warning in warnings:
                 self.logger.log(f"⚠️  {warning}")
+        if undefined:
+            self.logger.log("Possibly undefined names: " + ", ".join(f"{name} (line {line})" for name, line in undefined))
         
         self.logger.log("--- Code extracted and validated successfully ---")
         return extracted_code
 
-    def run_task(self, task: str, max_iters=20, stream_callback=None):
+    def _candidate_options(self, iteration, index):
+        """Sampling options that make each best-of-N candidate distinct."""
+        temperatures = self.best_of_n.get('temperatures') or [0.8]
+        return {
+            "seed": iteration * 1000 + index,
+            "temperature": temperatures[index % len(temperatures)]
+        }
+
+    def _run_candidates(self, spec, code, last_error, stream_callback, candidates, iteration, fixes=None):
+        """
+        Generate several coder candidates concurrently and run each one as soon
+        as its generation finishes. The first candidate that exits 0 (and
+        passes the task's acceptance checks, if any) wins and every other
+        generation and run is cancelled.
+        
+        Returns:
+            (code, stdout, stderr, exitcode, acceptance_error, usage) of the winner, or
+            of the first failure if nothing succeeded; None if nothing ran
+
+        Raises:
+            LLMError: every candidate's model call failed
+        """
+        self.logger.log(f"--- Coder Prompt (best of {candidates}) ---\n" + self.prompts.build_coder(spec, code, last_error, fixes))
+        # Set by the winner to stop the rest, and by the task deadline
+        cancel_event = self.deadline.child()
+
+        def attempt(index):
+            # Only the first candidate streams to the UI so the output stays readable
+            callback = stream_callback if index == 0 else None
+            candidate = self._generate_code(
+                spec, code, last_error, callback,
+                options=self._candidate_options(iteration, index),
+                cancel_event=cancel_event,
+                label=f"Candidate {index + 1} Coder",
+                log_prompt=False,
+                fixes=fixes
+            )
+            if cancel_event.is_set():
+                return None
+            result = self.runner.execute(candidate, cancel_event=cancel_event, stdin=self._main_stdin())
+            acceptance_error = None
+            if result.exitcode == 0:
+                acceptance_error = self._check_acceptance(candidate, cancel_event=cancel_event)
+                if cancel_event.is_set():
+                    return None
+            return candidate, result.stdout, result.stderr, result.exitcode, acceptance_error, result.usage
+
+        failures = []
+        errors = []
+        with self.tracer.span("candidates", candidates=candidates) as span:
+            pool = ThreadPoolExecutor(max_workers=candidates)
+            try:
+                futures = {pool.submit(attempt, index): index for index in range(candidates)}
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except LLMError as e:
+                        self.logger.log(f"Candidate {futures[future] + 1} failed: {e}")
+                        errors.append(e)
+                        continue
+                    except Exception as e:
+                        self.logger.log(f"Candidate {futures[future] + 1} failed: {e}")
+                        continue
+                    if result is None:
+                        continue
+                    if result[3] == 0 and result[4] is None:
+                        self.logger.log(f"Candidate {futures[future] + 1} succeeded, cancelling the others.")
+                        span.set(winner=futures[future] + 1)
+                        return result
+                    if result[3] == 0:
+                        self.logger.log(f"Candidate {futures[future] + 1} failed its acceptance checks.")
+                    else:
+                        self.logger.log(f"Candidate {futures[future] + 1} exited with code {result[3]}.")
+                    failures.append(result)
+            finally:
+                # Losers notice the event within one streamed line or poll interval;
+                # don't make the winner wait for them to wind down
+                cancel_event.set()
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        if failures:
+            return failures[0]
+        if errors:
+            raise errors[0]
+        return None
+
+    @staticmethod
+    def _escalated_options(repeats, iteration):
+        """Hotter, reseeded sampling used after the coder repeats a failed program"""
+        return {
+            "seed": 7919 * repeats + iteration,
+            "temperature": min(0.8 + 0.2 * repeats, 1.4)
+        }
+
+    def _request_timeout(self):
+        """Per-request timeout for model calls, capped by the task deadline"""
+        return self.deadline.timeout(self.llm_config.get('request_timeout', 300))
+
+    def _backoff(self, failures):
+        """Seconds to wait after `failures` model calls in a row failed ([retry] in execution.toml)"""
+        delay = self.retry_config.get('initial_delay', 1)
+        if self.retry_config.get('exponential_backoff', True):
+            delay *= 2 ** (failures - 1)
+        return min(delay, self.retry_config.get('max_delay', 10))
+
+    def _sleep(self, seconds, reason):
+        """Wait inside a span so waiting shows up in traces; the task deadline cuts it short"""
+        with self.tracer.span("sleep", reason=reason, seconds=seconds):
+            self.deadline.event.wait(seconds)
+
+    def run_task(self, task: str, max_iters=20, stream_callback=None, candidates=None, acceptance=None, deadline=None,
+                 optimize=None):
+        """
+        Repair loop for one task.
+        
+        Args:
+            task: Task description
+            max_iters: Iteration budget
+            stream_callback: Called with (chunk, source) while models stream
+                and, with source "runner", as the program writes output
+            candidates: Best-of-N candidates per iteration (None uses the config)
+            acceptance: The task's acceptance checks, as an AcceptanceSuite or a
+                task file's "acceptance" entry. A program only succeeds once it
+                exits 0 and passes them.
+            deadline: Total seconds for the task, covering every model call
+                and run (None uses [llm] task_deadline; 0 means no limit)
+            optimize: Keep iterating after success to make the program faster
+                or leaner (None uses [optimize] enabled)
+        
+        Returns:
+            The working program (the best optimized version), or None
+        """
+        if deadline is None:
+            deadline = self.llm_config.get('task_deadline', 0)
+        if optimize is None:
+            optimize = self.optimize_config.get('enabled', False)
+        if candidates is None:
+            candidates = self.best_of_n.get('candidates', 1)
+        candidates = max(1, int(candidates))
+        # Per-run summary for headless callers (batch CLI, benchmarks)
+        timings = {'thinker': 0.0, 'coder': 0.0, 'patcher': 0.0, 'execution': 0.0, 'acceptance': 0.0, 'candidates': 0.0,
+                   'optimize': 0.0}
+        self.last_run_stats = {'iterations': 0, 'status': 'running', 'timings': timings}
+
+        self.contexts = self._new_contexts()
+        self.route_key = os.urandom(8).hex()
+        self.deadline = Deadline(deadline)
+        self.tracer.clear()
+        try:
+            with self.tracer.span("task", task_chars=len(task), max_iters=max_iters, candidates=candidates) as span:
+                self.acceptance = self._acceptance_suite(task, acceptance, stream_callback)
+                if self.acceptance is not None:
+                    # Show the checks up front so the program is written against them
+                    task = f"{task}\n\nAcceptance checks:\n{self.acceptance.describe()}"
+                    span.set(acceptance_checks=self.acceptance.total)
+                code = self._iterate(task, max_iters, stream_callback, candidates, timings)
+                if code is not None and optimize:
+                    stage_start = time.monotonic()
+                    code = self._optimize(code, stream_callback)
+                    timings['optimize'] += time.monotonic() - stage_start
+                span.set(status=self.last_run_stats['status'], iterations=self.last_run_stats['iterations'])
+            return code
+        finally:
+            self.deadline.cancel()
+            ttft = self.last_run_stats.get('ttft')
+            if ttft:
+                self.logger.log("Time to first token: " + ", ".join(f"{role} {seconds:.2f}s" for role, seconds in ttft.items()))
+            trace_files = self.tracer.export(f"{time.strftime('%Y%m%d-%H%M%S')}-{self.runner.fingerprint(task)[:8]}")
+            if trace_files:
+                self.last_run_stats['trace'] = trace_files
+                self.logger.log(f"Trace written to {', '.join(trace_files)}")
+
+    def _optimize(self, code, stream_callback):
+        """
+        Try to make a working program faster or leaner ([optimize] in execution.toml).
+
+        Each attempt profiles the best version so far on the fixed input and
+        asks the coder for a faster one with the hotspots in the prompt. A new
+        version is kept only if Profiler.compare() finds the same output and
+        a measurable improvement, and the acceptance checks still pass. The
+        phase ends after max_iters attempts, time_budget seconds or the task
+        deadline, whichever comes first.
+
+        Returns:
+            The best version (the program itself if no attempt beat it)
+        """
+        stdin = self._main_stdin() or ""
+        stats = {'attempts': 0, 'accepted': 0}
+        self.last_run_stats['optimize'] = stats
+        task_deadline = self.deadline
+        if task_deadline.expired():
+            return code
+        limits = [seconds for seconds in (self.optimize_config.get('time_budget', 120), task_deadline.remaining())
+                  if seconds]
+        # Model calls and runs of this phase are cut short by its own budget
+        self.deadline = Deadline(min(limits) if limits else None)
+        self.logger.log("\n--- Optimizing the working program ---")
+        try:
+            with self.tracer.span("optimize") as span:
+                baseline = self.profiler.measure(self.runner, code, stdin, self.deadline.event)
+                if baseline is None:
+                    self.logger.log("--- Program does not run cleanly and repeatably on the fixed input, skipping optimization ---")
+                    span.set(skipped=True)
+                    return code
+                stats['baseline'] = {'wall_time': baseline.wall_time, 'peak_rss_mb': baseline.peak_rss_mb}
+                best, best_cost = code, baseline
+                report = None
+                rejected = None
+                for attempt in range(self.optimize_config.get('max_iters', 3)):
+                    if self.deadline.event.is_set():
+                        break
+                    stats['attempts'] = attempt + 1
+                    if report is None:
+                        report = self.profiler.profile(self.runner, best, stdin, self.deadline.event)
+                    system, prompt = self.prompts.split_optimizer(
+                        best, Profiler.describe(best_cost, report), stdin, rejected)
+                    self.logger.log(f"--- Optimizer Prompt (attempt {attempt + 1}) ---\n" + system + "\n\n" + prompt)
+                    try:
+                        candidate = self._complete_code('coder', system, prompt, stream_callback, label="Optimizer")
+                    except LLMError as e:
+                        self.logger.log(f"LLM error while optimizing: {e}. Keeping the best version so far.")
+                        break
+                    if self.deadline.event.is_set():
+                        break
+                    if self.runner.fingerprint(candidate) == self.runner.fingerprint(best):
+                        improved, reason = False, "it was the same program"
+                    else:
+                        cost = self.profiler.measure(self.runner, candidate, stdin, self.deadline.event)
+                        improved, reason = self.profiler.compare(best_cost, cost)
+                        if improved:
+                            acceptance_error = self._check_acceptance(candidate, cancel_event=self.deadline.event)
+                            if acceptance_error is not None:
+                                improved, reason = False, acceptance_error
+                    if self.deadline.event.is_set():
+                        break
+                    if improved:
+                        self.logger.log(f"--- Optimized version kept: {reason} ---")
+                        best, best_cost, report, rejected = candidate, cost, None, None
+                        stats['accepted'] += 1
+                    else:
+                        self.logger.log(f"--- Optimized version rejected: {reason} ---")
+                        rejected = reason
+                stats['best'] = {'wall_time': best_cost.wall_time, 'peak_rss_mb': best_cost.peak_rss_mb}
+                span.set(attempts=stats['attempts'], accepted=stats['accepted'],
+                         wall_time=best_cost.wall_time, peak_rss_mb=best_cost.peak_rss_mb)
+            self.logger.log(
+                f"--- Optimization done: runtime {baseline.wall_time:.3f}s -> {best_cost.wall_time:.3f}s, "
+                f"peak memory {baseline.peak_rss_mb:.1f} MB -> {best_cost.peak_rss_mb:.1f} MB ---"
+            )
+            return best
+        finally:
+            self.deadline.cancel()
+            self.deadline = task_deadline
+
+    def _acceptance_suite(self, task, acceptance, stream_callback):
+        """The task's acceptance suite, generating tests once if configured to"""
+        if not self.acceptance_config.get('enabled', True):
+            return None
+        if isinstance(acceptance, AcceptanceSuite):
+            return acceptance
+        suite = AcceptanceSuite.from_task(acceptance, self.acceptance_config,
+                                          warn=lambda message: self.logger.log(f"WARNING: {message}."))
+        if suite is None and self.acceptance_config.get('generate_tests', False):
+            suite = self._generate_tests(task, stream_callback)
+        return suite
+
+    def _generate_tests(self, task, stream_callback):
+        """Ask the tester model for pytest-style tests of the task; None if it gives nothing usable"""
+        system, tester_prompt = self.prompts.split_tester(task)
+        self.logger.log("--- Tester Prompt ---\n" + system + "\n\n" + tester_prompt)
+        self.logger.log("--- Tester Output ---")
+        chunks = []
+        model = self.models['tester']
+        with self.tracer.span("tester", model=model.model_name, prompt_chars=len(tester_prompt)) as span:
+            try:
+                for chunk in model.generate(tester_prompt, system=system, options=DETERMINISTIC_OPTIONS,
+                                            timeout=self._request_timeout(), cancel_event=self.deadline.event):
+                    if not chunks:
+                        span.first_token()
+                    chunks.append(chunk)
+                    if stream_callback:
+                        stream_callback(chunk, "thinker")
+            except LLMError as e:
+                span.set(error=str(e))
+                self.logger.log(f"WARNING: Test generation failed ({e}); running without acceptance checks.")
+                return None
+            tests = CodeExtractor.extract_code(''.join(chunks))
+            span.set(chunks=len(chunks), output_chars=len(tests))
+        if not analyze_code(tests).valid:
+            self.logger.log("WARNING: Generated tests are not valid Python; running without acceptance checks.")
+            return None
+        suite = AcceptanceSuite(
+            tests=tests,
+            shards=self.acceptance_config.get('shards', 4),
+            fail_fast=self.acceptance_config.get('fail_fast', True),
+            max_output_chars=self.acceptance_config.get('max_output_chars', 300)
+        )
+        if not suite.total:
+            self.logger.log("WARNING: Generated tests define no test functions; running without acceptance checks.")
+            return None
+        self.logger.log(f"--- Generated {suite.total} acceptance tests ---")
+        return suite
+
+    def _main_stdin(self):
+        return self.acceptance.primary_stdin if self.acceptance is not None else None
+
+    def _check_acceptance(self, code, cancel_event=None):
+        """
+        Run the task's acceptance checks against a program that exited 0.
+        
+        Returns:
+            None if it passed (or there are no checks), else a compact report
+            of the failing cases for the next prompt
+        """
+        if self.acceptance is None:
+            return None
+        with self.tracer.span("acceptance", checks=self.acceptance.total) as span:
+            report = self.acceptance.run(self.runner, code, cancel_event=cancel_event)
+            span.set(passed=report.passed, ran=report.ran, failures=len(report.failures))
+        if report.passed:
+            self.logger.log(f"--- Acceptance checks passed ({report.total}) ---")
+            return None
+        if cancel_event is not None and cancel_event.is_set():
+            return "Acceptance checks were cancelled"
+        summary = report.summary(self.acceptance_config.get('max_reported_failures', 3))
+        self.logger.log("--- " + summary)
+        return summary
+
+    def _replay_fix(self, code, known_fixes, replayed_fixes):
+        """
+        Apply the first fix recorded for exactly this failure that hasn't been
+        tried yet in this run.
+
+        Returns:
+            (patched program, KnownFix), or None if no known fix applies
+        """
+        if not self.fixes.replay:
+            return None
+        for fix in known_fixes:
+            if not fix.exact or fix.id in replayed_fixes:
+                continue
+            replayed_fixes.add(fix.id)
+            patched = apply_diff(code, fix.diff)
+            if patched is not None and patched != code and analyze_code(patched).valid:
+                self.last_run_stats['fixes_replayed'] = self.last_run_stats.get('fixes_replayed', 0) + 1
+                self.logger.log(f"--- Known fix for {fix.signature} (worked {fix.hits}x), running it without a model call ---")
+                return patched, fix
+        return None
+
+    def _record_usage(self, usage):
+        """Add a run's resource usage to the per-run summary"""
+        self.last_run_stats['usage'] = usage
+        resources = self.last_run_stats.setdefault('resources', {'runs': 0, 'cpu_time': 0.0, 'peak_rss_mb': 0.0, 'kills': {}})
+        resources['runs'] += 1
+        resources['cpu_time'] += usage.get('user_time', 0.0) + usage.get('sys_time', 0.0)
+        resources['peak_rss_mb'] = max(resources['peak_rss_mb'], usage.get('peak_rss_mb') or 0.0)
+        reason = usage.get('kill_reason')
+        if reason:
+            resources['kills'][reason] = resources['kills'].get(reason, 0) + 1
+
+    def _record_fix(self, failed_code, failed_error, code, fixed, replayed=None):
+        """
+        Store the change from the failed program if the new one ran cleanly;
+        one that merely fails differently is no fix. A replayed known fix that
+        worked is counted again instead.
+        """
+        signature = error_signature(failed_error)
+        if signature is None:
+            return
+        if not fixed:
+            if replayed is not None:
+                self.logger.log("--- Known fix did not help this time ---")
+            return
+        with self.tracer.span("fix_store", exception=signature.exception) as span:
+            if replayed is not None:
+                self.fixes.touch(replayed, worked=True)
+                span.set(reinforced=replayed.id)
+            else:
+                span.set(recorded=self.fixes.record(failed_error, failed_code, code))
+
+    def _iterate(self, task, max_iters, stream_callback, candidates, timings):
         code = None
         last_error = None
-        retry_delay = 1  # Start with 1 second delay
+        llm_failures = 0  # Model calls failed in a row
+        max_attempts = self.retry_config.get('max_attempts', 3)
+        failed_attempts = {}  # fingerprint -> iteration that first produced it
+        repeats = 0
+        coder_options = None
+        spec = None
+        fast_attempts = 0  # Patch attempts since the thinker last ran
+        repeated = False
+        replayed_fixes = set()  # Known fixes already tried in this run
 
         for i in range(max_iters):
             self.logger.log(f"\n{'='*50}")
             self.logger.log(f"Iteration {i+1}/{max_iters}")
             self.logger.log(f"{'='*50}\n")
+            self.last_run_stats['iterations'] = i + 1
 
-            try:
-                spec = self._generate_spec(task, code, last_error, stream_callback)
-                
-                # Check if LLM returned an error
-                if "[LLM ERROR]" in spec:
-                    self.logger.log(f"LLM error detected. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay = min(retry_delay * 2, 10)  # Exponential backoff, max 10s
-                    continue
-                
-                code = self._generate_code(spec, code, last_error, stream_callback)
-                
-                # Check if LLM returned an error
-                if "[LLM ERROR]" in code:
-                    self.logger.log(f"LLM error detected. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay = min(retry_delay * 2, 10)  # Exponential backoff, max 10s
-                    continue
-                
-                # Reset retry delay on success
-                retry_delay = 1
-
-                self.logger.log("--- Running Code ---")
-                stdout, stderr, exitcode = self.runner.run_code(code)
-
-                self.logger.log("--- Execution Result ---")
-                if stdout:
-                    self.logger.log(f"STDOUT:\n{stdout}")
-                if stderr:
-                    self.logger.log(f"STDERR:\n{stderr}")
-                self.logger.log(f"Exit Code: {exitcode}")
-
-                if exitcode == 0:
-                    self.logger.log("\n🎉 Success! Program runs without errors.")
-                    return code
+            with self.tracer.span("iteration", index=i + 1) as iteration_span:
+                route = None
+                try:
+                    self.deadline.check()
+                    failed_code, failed_error = code, last_error
+                    known_fixes = self.fixes.lookup(last_error) if code else []
+                    replayed = self._replay_fix(code, known_fixes, replayed_fixes) if known_fixes else None
+                    replayed_fix = replayed[1] if replayed is not None else None
+                    analysis = analyze_code(code) if code else None
+                    if replayed is not None:
+                        route = KNOWN_FIX
+                    elif spec is None:
+                        route = ErrorRouter.FULL
+                    else:
+                        route = self.router.route(last_error, fast_attempts, repeated, analysis)
+                    iteration_span.set(route=route, known_fixes=len(known_fixes))
+                    fixes = self.fixes.describe(known_fixes)
+                    if route == ErrorRouter.PATCH:
+                        # Mechanical failure: the spec still holds, only the code needs fixing
+                        fast_attempts += 1
+                        self.logger.log(f"--- {self.router.classify(last_error, analysis)[1]}: fast repair, skipping the thinker ---")
+                    elif route == ErrorRouter.FULL:
+                        fast_attempts = 0
+                        stage_start = time.monotonic()
+                        prompt_code, prompt_error = self._compact_context('thinker', task, code, last_error)
+                        spec = self._generate_spec(task, prompt_code, prompt_error, stream_callback)
+                        timings['thinker'] += time.monotonic() - stage_start
+                        self.deadline.check()
+                    
+                    if route == ErrorRouter.FULL and candidates > 1:
+                        prompt_code, prompt_error = self._compact_context('coder', spec + fixes, code, last_error)
+                        stage_start = time.monotonic()
+                        outcome = self._run_candidates(spec, prompt_code, prompt_error, stream_callback, candidates, i, fixes)
+                        timings['candidates'] += time.monotonic() - stage_start
+                        self.deadline.check()
+                        if outcome is None:
+                            raise LLMError("No candidate produced a program")
+                        llm_failures = 0
+                        self._forget_coder_turn()
+                        code, stdout, stderr, exitcode, acceptance_error, usage = outcome
+                    else:
+                        stage_start = time.monotonic()
+                        if route == KNOWN_FIX:
+                            self._forget_coder_turn()
+                            code = replayed[0]
+                        elif route == ErrorRouter.PATCH:
+                            self._forget_coder_turn()
+                            prompt_code, prompt_error = self._compact_context('patcher', fixes, code, last_error)
+                            code = self._patch_code(prompt_code, prompt_error, stream_callback, fixes)
+                            timings['patcher'] += time.monotonic() - stage_start
+                        else:
+                            prompt_code, prompt_error = self._compact_context('coder', spec + fixes, code, last_error)
+                            code = self._generate_code(
+                                spec, prompt_code, prompt_error, stream_callback,
+                                options=coder_options, context=self.contexts.get('coder'), fixes=fixes
+                            )
+                            timings['coder'] += time.monotonic() - stage_start
+                        self.deadline.check()
+                        llm_failures = 0
+
+                        stage_start = time.monotonic()
+                        on_output = (lambda text, name: stream_callback(text, "runner")) if stream_callback else None
+                        result = self.runner.execute(code, cancel_event=self.deadline.event, stdin=self._main_stdin(),
+                                                     on_output=on_output)
+                        timings['execution'] += time.monotonic() - stage_start
+                        if result.cached:
+                            self.logger.log("--- Identical program already ran, reusing its result ---")
+                        else:
+                            self.logger.log("--- Running Code ---")
+                        stdout, stderr, exitcode, usage = result.stdout, result.stderr, result.exitcode, result.usage
+                        acceptance_error = None
+                        if exitcode == 0:
+                            stage_start = time.monotonic()
+                            acceptance_error = self._check_acceptance(code, cancel_event=self.deadline.event)
+                            timings['acceptance'] += time.monotonic() - stage_start
+
+                    # A run cut short by the deadline says nothing about the program
+                    self.deadline.check()
+                    iteration_span.set(exitcode=exitcode)
+                    self.logger.log("--- Execution Result ---")
+                    if stdout:
+                        self.logger.log(f"STDOUT:\n{stdout}")
+                    if stderr:
+                        self.logger.log(f"STDERR:\n{stderr}")
+                    self.logger.log(f"Exit Code: {exitcode}")
+                    self.logger.log(f"Resources: {format_usage(usage)}")
+                    self._record_usage(usage)
+                    iteration_span.set(kill_reason=usage.get('kill_reason'))
+
+                    if failed_error:
+                        self._record_fix(failed_code, failed_error, code, exitcode == 0, replayed_fix)
+                    if exitcode == 0 and acceptance_error is None:
+                        self.logger.log("\n🎉 Success! Program runs without errors.")
+                        self.last_run_stats['status'] = 'success'
+                        return code
+                    if exitcode == 0:
+                        # Ran cleanly but produced the wrong result: the failing checks are the error
+                        iteration_span.set(acceptance_failed=True)
+                        stderr = acceptance_error
+
+                    fingerprint = self.runner.fingerprint(code)
+                    if fingerprint in failed_attempts:
+                        # The coder gave back a program that already failed: change
+                        # sampling and say so in the prompt instead of repeating it
+                        repeated = True
+                        repeats += 1
+                        first_seen = failed_attempts[fingerprint]
+                        coder_options = self._escalated_options(repeats, i)
+                        iteration_span.set(repeat_of=first_seen)
+                        self.logger.log(f"--- Repeated attempt: same program as iteration {first_seen}, raising temperature to {coder_options['temperature']} ---")
+                        last_error = (
+                            f"{stderr}\n\nNote: this exact program already failed in iteration {first_seen}. "
+                            "Do not repeat it; take a different approach to fix the error."
+                        )
+                    else:
+                        # A new program: back to the coder's own sampling
+                        repeated = False
+                        coder_options = None
+                        failed_attempts[fingerprint] = i + 1
+                        last_error = stderr
+                    self.logger.log("\n--- Code failed, trying again... ---")
 
-                last_error = stderr
-                self.logger.log("\n--- Code failed, trying again... ---")
-                time.sleep(2)
-                
-            except Exception as e:
-                self.logger.log(f"ERROR during iteration: {e}")
-                time.sleep(retry_delay)
-                retry_delay = min(retry_delay * 2, 10)
+                except DeadlineExceeded as e:
+                    self.logger.log(f"\n⏱️ {e}, stopping.")
+                    iteration_span.set(error=str(e))
+                    self.last_run_stats['status'] = 'timeout'
+                    return None
+                except LLMError as e:
+                    iteration_span.set(error=str(e))
+                    if route == ErrorRouter.FULL:
+                        # Without a fresh spec the next iteration starts over
+                        spec = None
+                    llm_failures += 1
+                    if llm_failures >= max_attempts:
+                        self.logger.log(f"LLM error: {e}. Giving up after {llm_failures} failed calls in a row.")
+                        self.last_run_stats['status'] = 'llm_error'
+                        return None
+                    delay = self._backoff(llm_failures)
+                    self.logger.log(f"LLM error: {e}. Retrying in {delay} seconds...")
+                    self._sleep(delay, "llm_error_backoff")
+                except Exception as e:
+                    self.logger.log(f"ERROR during iteration: {e}")
+                    iteration_span.set(error=str(e))
 
         self.logger.log("\n❌ Failed to generate a working script after max iterations.")
+        self.last_run_stats['status'] = 'failed'
         return None
@@ -1,11 +1,89 @@
 
+import ast
+import codecs
+import hashlib
+import signal
 import subprocess
+import sys
 import tempfile
 import os
 import resource
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+from core.code_analysis import analyze_code
+from core.tracing import Tracer
+from core.warm_pool import WarmInterpreterPool, DEFAULT_PRELOAD
+
+class ExecutionResult(NamedTuple):
+    stdout: str
+    stderr: str
+    exitcode: int
+    # Resource usage of the run: wall_time, user_time, sys_time (seconds),
+    # peak_rss_mb, kill_reason and signal (see CodeRunner.execute)
+    usage: dict
+    # True when the result was served from the memo without running anything
+    cached: bool = False
+
+
+def format_usage(usage):
+    """One-line summary of ExecutionResult.usage for logs"""
+    parts = [f"wall {usage.get('wall_time', 0.0):.2f}s"]
+    if 'user_time' in usage:
+        parts.append(f"CPU {usage['user_time']:.2f}s user + {usage['sys_time']:.2f}s sys")
+    if usage.get('peak_rss_mb') is not None:
+        parts.append(f"peak RSS {usage['peak_rss_mb']:.1f} MB")
+    if usage.get('kill_reason'):
+        reason = usage['kill_reason']
+        parts.append(f"killed: {reason} ({usage['signal']})" if usage.get('signal') else f"killed: {reason}")
+    return ", ".join(parts)
+
+class OutputCapture:
+    """
+    Bounded capture of one output stream: the first head_bytes are kept as
+    they arrive, the rest goes through a ring of chunks holding only the
+    last tail_bytes. getvalue() marks how much was dropped in between.
+    """
+
+    def __init__(self, keep_bytes):
+        self.head_bytes = keep_bytes // 2
+        self.tail_bytes = keep_bytes - self.head_bytes
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def feed(self, data):
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail.append(data)
+            self.tail_size += len(data)
+            # Drop whole chunks that fell out of the tail window
+            while self.tail and self.tail_size - len(self.tail[0]) >= self.tail_bytes:
+                self.tail_size -= len(self.tail.popleft())
+
+    def getvalue(self):
+        tail = b"".join(self.tail)[-self.tail_bytes:] if self.tail_bytes else b""
+        omitted = self.total - len(self.head) - len(tail)
+        if omitted <= 0:
+            return bytes(self.head) + tail
+        return bytes(self.head) + f"\n... [{omitted} bytes of output omitted] ...\n".encode() + tail
+
 
 class CodeRunner:
-    def __init__(self, cpu_limit=5, memory_limit_mb=256, timeout=8):
+    # How often a running program checks for cancellation (seconds)
+    CANCEL_POLL_INTERVAL = 0.05
+    # Largest read from a program's output pipe
+    READ_CHUNK = 64 * 1024
+
+    def __init__(self, cpu_limit=5, memory_limit_mb=256, timeout=8, memoize=True, memo_size=256,
+                 backend="subprocess", pool_size=2, preload=DEFAULT_PRELOAD, tracer=None,
+                 max_output_bytes=16 * 1024 * 1024, keep_output_bytes=1024 * 1024):
         """
         Initialize CodeRunner with configurable resource limits.
         
@@ -13,45 +91,391 @@ class CodeRunner:
             cpu_limit: CPU time limit in seconds (default: 5)
             memory_limit_mb: Memory limit in MB (default: 256)
             timeout: Process timeout in seconds (default: 8)
+            memoize: Reuse results for programs already run under the same limits
+            memo_size: Maximum number of memoized results (LRU)
+            backend: "subprocess" cold-starts python3 on a temp file per run;
+                "pool" feeds code over a pipe to pre-started warm workers
+            pool_size: Idle workers kept ready by the "pool" backend
+            preload: Modules each warm worker imports before receiving code
+            tracer: Tracer receiving an "execution" span per run (default: off)
+            max_output_bytes: Output (stdout and stderr together) a program
+                may write before it is killed
+            keep_output_bytes: Output kept per stream; beyond it only the
+                head and tail are returned
         """
         self.cpu_limit = cpu_limit
         self.memory_limit_mb = memory_limit_mb
         self.timeout = timeout
-    def run_code(self, code: str):
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        if backend not in ("subprocess", "pool"):
+            raise ValueError(f"Unknown runner backend: {backend}")
+        self.backend = backend
+        self.pool_size = pool_size
+        self.preload = preload
+        self._pool = None
+        self._pool_limits = None
+        self._pool_lock = threading.Lock()
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.max_output_bytes = max_output_bytes
+        # At least one byte each for the head and the tail
+        self.keep_output_bytes = max(2, keep_output_bytes)
+
+    @classmethod
+    def from_config(cls, runner_config, resource_limits, tracer=None):
+        """Build a runner from the [runner] and [resource_limits] sections of execution.toml"""
+        return cls(
+            cpu_limit=resource_limits.get('cpu_limit', 5),
+            memory_limit_mb=resource_limits.get('memory_limit_mb', 256),
+            timeout=resource_limits.get('timeout', 8),
+            memoize=runner_config.get('memoize', True),
+            memo_size=runner_config.get('memo_size', 256),
+            backend=runner_config.get('backend', 'subprocess'),
+            pool_size=runner_config.get('pool_size', 2),
+            tracer=tracer,
+            max_output_bytes=runner_config.get('max_output_bytes', 16 * 1024 * 1024),
+            keep_output_bytes=runner_config.get('keep_output_bytes', 1024 * 1024)
+        )
+
+    @staticmethod
+    def fingerprint(code: str) -> str:
+        """
+        Hash of the program with formatting normalised away.
+        
+        Parseable code is hashed by its AST, so whitespace, blank lines and
+        comments don't matter. Unparseable code falls back to stripping
+        trailing whitespace and blank lines.
+        """
+        analysis = analyze_code(code)
+        if analysis.valid:
+            normalized = ast.dump(analysis.tree)
+        else:
+            lines = code.replace('\r\n', '\n').split('\n')
+            normalized = '\n'.join(line.rstrip() for line in lines if line.strip())
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _memo_key(self, code, stdin=None):
+        # Keyed on the source, not the fingerprint: tracebacks quote line
+        # numbers and lines, so only trailing whitespace may differ. Results
+        # only transfer between runs with the same input and resource-limit profile
+        lines = code.replace('\r\n', '\n').rstrip().split('\n')
+        source = '\n'.join(line.rstrip() for line in lines)
+        return hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest(), stdin, \
+            (self.cpu_limit, self.memory_limit_mb, self.timeout)
+
+    def lookup(self, code: str, stdin=None):
+        """Return the memoized ExecutionResult for code run on stdin, or None"""
+        key = self._memo_key(code, stdin)
+        with self._memo_lock:
+            result = self._memo.get(key)
+            if result is not None:
+                self._memo.move_to_end(key)
+        return result
+
+    def run_code(self, code: str, cancel_event=None, stdin=None, on_output=None):
         """
         Execute Python code in a temporary file with resource limits.
+        
+        Returns:
+            (stdout, stderr, exitcode)
+        """
+        return tuple(self.execute(code, cancel_event=cancel_event, stdin=stdin, on_output=on_output)[:3])
+
+    def execute(self, code: str, cancel_event=None, use_memo=True, stdin=None, on_output=None) -> ExecutionResult:
+        """
+        Execute Python code with resource limits, reusing the memoized result
+        when an equivalent program already ran under the same limits.
+        
+        Args:
+            code: Python source to execute
+            cancel_event: Optional threading.Event; when set, the process is
+                killed and the run reports a cancellation
+            use_memo: Set to False to always start a fresh interpreter
+            stdin: Text fed to the program's standard input (None inherits ours)
+            on_output: Called with (text, "stdout" or "stderr") as the program
+                writes output; a memoized result is replayed through it
+
+        Returns:
+            ExecutionResult. Its usage holds the run's wall_time, user_time
+            and sys_time in seconds, peak_rss_mb, and kill_reason: None for a
+            program that ended on its own, else "timeout", "cancelled",
+            "cpu_limit" (RLIMIT_CPU), "memory_limit" (RLIMIT_AS), "output_limit"
+            (wrote more than max_output_bytes) or "signal" (with its name in
+            usage["signal"]). Resource-limit kills are
+            explained at the end of stderr. For the pool backend, CPU time
+            and peak RSS include the worker's preloaded imports.
+        """
+        use_memo = use_memo and self.memoize
+        with self.tracer.span("execution", backend=self.backend, code_chars=len(code)) as span:
+            if use_memo:
+                cached = self.lookup(code, stdin)
+                if cached is not None:
+                    span.set(cached=True, exitcode=cached.exitcode)
+                    if on_output is not None:
+                        for name in ("stdout", "stderr"):
+                            if getattr(cached, name):
+                                on_output(getattr(cached, name), name)
+                    return cached._replace(cached=True)
+
+            stdout, stderr, exitcode, complete, usage = self._run(code, cancel_event, stdin, on_output)
+            result = ExecutionResult(stdout, stderr, exitcode, usage)
+            span.set(cached=False, exitcode=exitcode, complete=complete,
+                     stdout_chars=len(stdout), stderr_chars=len(stderr), **usage)
+
+        # Cancelled runs and runner failures say nothing about the program, and
+        # a timeout may only mean the machine was busy
+        if use_memo and complete and usage.get('kill_reason') != "timeout":
+            with self._memo_lock:
+                self._memo[self._memo_key(code, stdin)] = result
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return result
+
+    def _run(self, code, cancel_event, stdin=None, on_output=None):
+        """
+        Run code in a fresh interpreter.
+        
+        Returns:
+            (stdout, stderr, exitcode, complete, usage) where complete is False
+            when the run was cancelled or the runner itself failed
         """
         temp_path = None
+        process = None
+        start = time.monotonic()
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".py", mode='w') as f:
-                f.write(code)
-                temp_path = f.name
-
-            def set_limits():
-                # Use configurable limits
-                resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_limit, self.cpu_limit))
-                memory_bytes = self.memory_limit_mb * 1024 * 1024
-                resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
-
-            result = subprocess.run(
-                ["python3", temp_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=self.timeout,
-                preexec_fn=set_limits
-            )
-            stdout = result.stdout.decode(errors='replace')
-            stderr = result.stderr.decode(errors='replace')
-            return stdout, stderr, result.returncode
-
-        except subprocess.TimeoutExpired:
-            return "", f"[Execution Error] Code execution timed out after {self.timeout} seconds", -1
+            if self.backend == "pool":
+                # Warm worker: code goes over the pipe, no temp file; the
+                # program's own input follows the framed source
+                process = self._get_pool().acquire()
+                program_input = WarmInterpreterPool.frame(code) + (stdin or "").encode('utf-8')
+            else:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".py", mode='w') as f:
+                    f.write(code)
+                    temp_path = f.name
+
+                process = subprocess.Popen(
+                    ["python3", temp_path],
+                    stdin=subprocess.PIPE if stdin is not None else None,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    preexec_fn=self._limits_for(self.cpu_limit, self.memory_limit_mb)
+                )
+                program_input = stdin.encode('utf-8') if stdin is not None else None
+            stdout_bytes, stderr_bytes, status, rusage, stopped = self._communicate(
+                process, cancel_event, program_input, on_output)
+            stdout = stdout_bytes.decode(errors='replace')
+            stderr = stderr_bytes.decode(errors='replace')
+            usage = self._usage(time.monotonic() - start, rusage)
+            if stopped == "cancelled":
+                usage["kill_reason"] = stopped
+                return "", "[Execution Error] Code execution was cancelled", -1, False, usage
+            if stopped == "timeout":
+                usage["kill_reason"] = stopped
+                # Keep what the program printed before it was stopped
+                stderr = self._append(stderr, f"[Execution Error] Code execution timed out after {self.timeout} seconds")
+                return stdout, stderr, -1, True, usage
+            if stopped == "output_limit":
+                usage["kill_reason"] = stopped
+                stderr = self._append(stderr, self._kill_note(usage))
+                return stdout, stderr, -1, True, usage
+            usage["kill_reason"], usage["signal"] = self._kill_reason(status, usage, stderr)
+            note = self._kill_note(usage)
+            if note:
+                stderr = self._append(stderr, note)
+            return stdout, stderr, process.returncode, True, usage
+
         except Exception as e:
-            return "", f"[Execution Error] {e}", -1
+            return "", f"[Execution Error] {e}", -1, False, {"wall_time": time.monotonic() - start}
         finally:
+            # Never leave a child behind (cancellation, errors)
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
             # Always cleanup temp file
             if temp_path and os.path.exists(temp_path):
                 try:
                     os.remove(temp_path)
                 except OSError:
                     pass  # Best effort cleanup
+
+    @staticmethod
+    def _append(stderr, line):
+        return f"{stderr.rstrip()}\n{line}" if stderr.strip() else line
+
+    @staticmethod
+    def _usage(wall_time, rusage):
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        rss_unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return {
+            "wall_time": wall_time,
+            "user_time": rusage.ru_utime,
+            "sys_time": rusage.ru_stime,
+            "peak_rss_mb": rusage.ru_maxrss / rss_unit,
+            "kill_reason": None,
+            "signal": None
+        }
+
+    def _kill_reason(self, status, usage, stderr):
+        """
+        Why a program that ended on its own didn't exit normally.
+
+        Returns:
+            (kill_reason, signal name), both None for a normal exit or crash
+        """
+        if os.WIFSIGNALED(status):
+            number = os.WTERMSIG(status)
+            try:
+                name = signal.Signals(number).name
+            except ValueError:
+                name = f"signal {number}"
+            # RLIMIT_CPU sends SIGXCPU at the soft limit and SIGKILL at the hard one
+            cpu_time = usage["user_time"] + usage["sys_time"]
+            if number == signal.SIGXCPU or (number == signal.SIGKILL and cpu_time >= self.cpu_limit):
+                return "cpu_limit", name
+            return "signal", name
+        # Under RLIMIT_AS, allocations fail and Python raises MemoryError
+        if os.waitstatus_to_exitcode(status) != 0:
+            lines = stderr.strip().splitlines()
+            if lines and lines[-1].startswith("MemoryError"):
+                return "memory_limit", None
+        return None, None
+
+    def _kill_note(self, usage):
+        """Plain explanation of a resource-limit kill for the repair prompts"""
+        reason = usage["kill_reason"]
+        if reason == "cpu_limit":
+            return (f"[Resource limit] Killed by {usage['signal']} after using its {self.cpu_limit}s CPU time limit "
+                    f"({usage['user_time'] + usage['sys_time']:.2f}s user+sys). The program is too slow or never finishes.")
+        if reason == "memory_limit":
+            return (f"[Resource limit] Ran out of memory: the {self.memory_limit_mb} MB memory limit was reached "
+                    f"(peak RSS {usage['peak_rss_mb']:.1f} MB). The program must use less memory.")
+        if reason == "output_limit":
+            return (f"[Resource limit] Killed after writing more than {self.max_output_bytes} bytes of output. "
+                    "The program prints far too much (an endless or overly verbose loop?).")
+        if reason == "signal":
+            return f"[Execution Error] Program killed by {usage['signal']}"
+        return None
+
+    @staticmethod
+    def _limits_for(cpu_limit, memory_limit_mb):
+        """Build the preexec_fn that applies rlimits in the child"""
+        def set_limits():
+            # SIGXCPU at the limit; the hard limit a second later SIGKILLs a
+            # program that ignores it
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+            memory_bytes = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        return set_limits
+
+    def _get_pool(self):
+        """Return the warm pool for the current limits, rebuilding it if they changed"""
+        limits = (self.cpu_limit, self.memory_limit_mb)
+        with self._pool_lock:
+            if self._pool is None or self._pool_limits != limits:
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = WarmInterpreterPool(
+                    size=self.pool_size,
+                    preexec_fn=self._limits_for(*limits),
+                    preload=self.preload
+                )
+                self._pool_limits = limits
+            return self._pool
+
+    def close(self):
+        """Release warm workers held by the pool backend"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    def _communicate(self, process, cancel_event, program_input=None, on_output=None):
+        """
+        Feed the program its input, collect its output as it is written and
+        reap it with os.wait4 so its resource usage is known, killing it on
+        timeout, when the cancel event is set or once its output passes
+        max_output_bytes. Output is kept in bounded OutputCaptures.
+
+        Returns:
+            (stdout, stderr, wait status, rusage, stopped) where stopped is
+            "timeout", "cancelled" or "output_limit" if the runner killed the
+            program, else None
+        """
+        output = {"stdout": OutputCapture(self.keep_output_bytes), "stderr": OutputCapture(self.keep_output_bytes)}
+        over_limit = threading.Event()
+
+        def read(name, pipe):
+            capture = output[name]
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            fd = pipe.fileno()
+            try:
+                while True:
+                    data = os.read(fd, self.READ_CHUNK)
+                    if not data:
+                        break
+                    capture.feed(data)
+                    if output["stdout"].total + output["stderr"].total > self.max_output_bytes:
+                        over_limit.set()
+                    if on_output is not None:
+                        text = decoder.decode(data)
+                        if text:
+                            on_output(text, name)
+            finally:
+                pipe.close()
+
+        def write():
+            try:
+                if program_input:
+                    process.stdin.write(program_input)
+            except BrokenPipeError:
+                pass  # The program exited without reading its input
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        def watch():
+            # Wait for the exit without reaping, so the pid can't be reused
+            # before a kill below reaches it
+            try:
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            except ChildProcessError:
+                pass
+
+        pipes = [threading.Thread(target=read, args=("stdout", process.stdout), daemon=True),
+                 threading.Thread(target=read, args=("stderr", process.stderr), daemon=True)]
+        if process.stdin is not None:
+            pipes.append(threading.Thread(target=write, daemon=True))
+        for thread in pipes:
+            thread.start()
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+
+        stopped = None
+        deadline = time.monotonic() + self.timeout
+        while watcher.is_alive():
+            if cancel_event is not None and cancel_event.is_set():
+                stopped = "cancelled"
+            elif time.monotonic() >= deadline:
+                stopped = "timeout"
+            elif over_limit.is_set():
+                stopped = "output_limit"
+            if stopped:
+                # Not process.kill(): its poll() could reap the child before wait4
+                os.kill(process.pid, signal.SIGKILL)
+                break
+            remaining = deadline - time.monotonic()
+            watcher.join(min(self.CANCEL_POLL_INTERVAL, remaining))
+        watcher.join()
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # Grandchildren may hold the pipes open; don't wait for them forever
+        for thread in pipes:
+            thread.join(self.CANCEL_POLL_INTERVAL * 20)
+        if stopped is None and over_limit.is_set():
+            # Went over the limit just before exiting on its own
+            stopped = "output_limit"
+        return output["stdout"].getvalue(), output["stderr"].getvalue(), status, rusage, stopped
@@ -0,0 +1,48 @@
+import threading
+
+class StreamBuffer:
+    """
+    Thread-safe hand-off between worker threads and the Tk thread.
+
+    Workers append text per target (e.g. "coder", "log") and queue UI calls;
+    the Tk thread drains everything at a fixed frame rate, getting one
+    coalesced string per target so each widget is updated once per frame no
+    matter how many tokens arrived.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._calls = []
+
+    def put(self, target, text):
+        """Queue text for a target widget"""
+        with self._lock:
+            chunks = self._pending.get(target)
+            if chunks is None:
+                self._pending[target] = [text]
+            else:
+                chunks.append(text)
+
+    def call(self, function, *args, **kwargs):
+        """Queue a UI call (status label, button state) to run on the Tk thread"""
+        with self._lock:
+            self._calls.append((function, args, kwargs))
+
+    def drain(self):
+        """
+        Take everything queued so far.
+
+        Returns:
+            (texts, calls): dict of target -> joined text, and the queued
+            calls in order
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            calls, self._calls = self._calls, []
+        return {target: ''.join(chunks) for target, chunks in pending.items()}, calls
+
+    def clear(self):
+        """Drop queued text (e.g. leftovers of a previous run)"""
+        with self._lock:
+            self._pending = {}
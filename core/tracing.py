@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+
+class _NullSpan:
+    """Span handed out when tracing is off; every method is a no-op"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def first_token(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    One timed stage of a run. Use as a context manager; attributes (sizes,
+    exit codes, ...) can be attached at any point before it closes.
+    """
+
+    __slots__ = ("tracer", "name", "attrs", "start", "end", "ttft", "thread_id", "parent", "span_id")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.end = None
+        self.ttft = None
+        self.thread_id = threading.get_ident()
+        self.parent = None
+        self.span_id = None
+
+    def __enter__(self):
+        self.tracer._open(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._close(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def first_token(self):
+        """Record time-to-first-token (only the first call counts)"""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self):
+        return {
+            "id": self.span_id,
+            "parent": self.parent,
+            "name": self.name,
+            "thread": self.thread_id,
+            "start": self.start - self.tracer.origin,
+            "duration": self.duration,
+            "ttft": self.ttft,
+            "attrs": self.attrs,
+        }
+
+
+class Tracer:
+    """
+    Collects nested timing spans for the stages of a repair run and exports
+    them as JSONL (one span per line) or Chrome trace-event JSON, which
+    chrome://tracing and Perfetto open directly.
+
+    A disabled tracer returns a shared no-op span from span(), so
+    instrumented code costs one attribute check per stage.
+    """
+
+    def __init__(self, enabled=False, output_dir="logs/traces", formats=("chrome",)):
+        """
+        Args:
+            enabled: Record spans; when False span() returns NULL_SPAN
+            output_dir: Directory export() writes trace files to
+            formats: Any of "chrome" and "jsonl"
+        """
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+
+    @classmethod
+    def from_config(cls, tracing_config):
+        """Build a tracer from the [tracing] section of execution.toml"""
+        formats = tracing_config.get('formats', ["chrome"])
+        if isinstance(formats, str):
+            formats = [formats]
+        return cls(
+            enabled=tracing_config.get('enabled', False),
+            output_dir=tracing_config.get('output_dir', "logs/traces"),
+            formats=formats
+        )
+
+    def span(self, name, **attrs):
+        """Open a span: `with tracer.span("coder", model=...) as span: ...`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def _open(self, span):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        span.parent = stack[-1].span_id if stack else None
+        with self._lock:
+            span.span_id = self._next_id
+            self._next_id += 1
+        stack.append(span)
+
+    def _close(self, span):
+        stack = self._local.stack
+        if span in stack:
+            stack.remove(span)
+        with self._lock:
+            # Drop stragglers from before the last clear() (e.g. cancelled
+            # best-of-N candidates that wound down after their run ended)
+            if span.start >= self.origin:
+                self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+
+    def to_jsonl(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+
+    def to_chrome(self):
+        """Chrome trace-event document: complete ("X") events in microseconds"""
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for span in spans:
+            ts = (span.start - self.origin) * 1e6
+            args = dict(span.attrs)
+            if span.ttft is not None:
+                args["ttft_ms"] = round(span.ttft * 1000, 3)
+                # Instant marker so the first token is visible on the timeline
+                events.append({
+                    "name": f"{span.name}:first_token", "ph": "i", "s": "t",
+                    "ts": ts + span.ttft * 1e6, "pid": pid, "tid": span.thread_id
+                })
+            events.append({
+                "name": span.name, "cat": "laph", "ph": "X",
+                "ts": ts, "dur": span.duration * 1e6,
+                "pid": pid, "tid": span.thread_id, "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, basename):
+        """
+        Write the collected spans to output_dir in every configured format.
+
+        Returns:
+            List of written file paths (empty when disabled or nothing recorded)
+        """
+        if not self.enabled or not self.spans:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        if "jsonl" in self.formats:
+            path = os.path.join(self.output_dir, f"{basename}.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.to_jsonl())
+            paths.append(path)
+        if "chrome" in self.formats:
+            path = os.path.join(self.output_dir, f"{basename}.trace.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome(), f, default=str)
+            paths.append(path)
+        return paths
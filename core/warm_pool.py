@@ -0,0 +1,137 @@
+import atexit
+import queue
+import subprocess
+import threading
+
+# Runs inside each worker: pre-import modules, then wait for a program on
+# stdin framed as "<byte length>\n<source>". Anything after the source is
+# left on stdin for the program itself.
+BOOTSTRAP = r'''
+import sys
+for _name in sys.argv[1:]:
+    try:
+        __import__(_name)
+    except Exception:
+        pass
+
+_header = sys.stdin.buffer.readline()
+if not _header.strip():
+    sys.exit(0)
+_source = sys.stdin.buffer.read(int(_header)).decode("utf-8", "replace")
+
+import linecache
+import traceback
+import types
+
+_filename = "<laph-program>"
+linecache.cache[_filename] = (len(_source), None, _source.splitlines(True), _filename)
+sys.argv = [_filename]
+_main = types.ModuleType("__main__")
+_main.__file__ = _filename
+sys.modules["__main__"] = _main
+
+try:
+    exec(compile(_source, _filename, "exec"), _main.__dict__)
+except SystemExit:
+    raise
+except BaseException as _error:
+    # Hide this bootstrap frame so tracebacks look like a plain script run;
+    # the pure-Python printer reads source lines from linecache
+    _tb = _error.__traceback__.tb_next if _error.__traceback__ else None
+    traceback.print_exception(type(_error), _error.with_traceback(_tb), _tb)
+    sys.exit(1)
+'''
+
+# Stdlib modules most generated programs import; loaded before the code arrives
+DEFAULT_PRELOAD = (
+    "os", "re", "json", "math", "random", "time", "datetime",
+    "collections", "itertools", "functools", "typing"
+)
+
+
+class WarmInterpreterPool:
+    """
+    Keeps a few Python interpreters started, limited and pre-imported so a run
+    only pays for the program itself. Each worker serves exactly one program
+    and is then discarded; a background thread refills the pool.
+    """
+
+    def __init__(self, size=2, preexec_fn=None, preload=DEFAULT_PRELOAD, python="python3"):
+        """
+        Args:
+            size: Number of idle workers to keep ready
+            preexec_fn: Applied in each worker before the interpreter starts
+                (CodeRunner passes its rlimit setup)
+            preload: Module names imported by every worker up front
+            python: Interpreter executable
+        """
+        self.size = size
+        self.preexec_fn = preexec_fn
+        self.preload = tuple(preload)
+        self.python = python
+        self._ready = queue.Queue()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._refill_loop, name="laph-warm-pool", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+        atexit.register(self.close)
+
+    @staticmethod
+    def frame(code: str) -> bytes:
+        """Encode a program for a worker's stdin"""
+        source = code.encode('utf-8')
+        return str(len(source)).encode() + b"\n" + source
+
+    def acquire(self) -> subprocess.Popen:
+        """Take a ready worker, or start one synchronously if none is idle"""
+        if self._closed:
+            raise RuntimeError("Warm interpreter pool is closed")
+        worker = None
+        while worker is None:
+            try:
+                candidate = self._ready.get_nowait()
+            except queue.Empty:
+                worker = self._spawn()
+                break
+            # Skip workers that died while idle
+            if candidate.poll() is None:
+                worker = candidate
+        self._wakeup.set()
+        return worker
+
+    def close(self):
+        """Stop refilling and kill idle workers"""
+        self._closed = True
+        atexit.unregister(self.close)
+        self._wakeup.set()
+        while True:
+            try:
+                worker = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            worker.kill()
+            worker.wait()
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [self.python, "-c", BOOTSTRAP, *self.preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=self.preexec_fn
+        )
+
+    def _refill_loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._closed and self._ready.qsize() < self.size:
+                try:
+                    self._ready.put(self._spawn())
+                except OSError:
+                    break
+            if self._closed:
+                # close() may race with a spawn; don't leak that worker
+                self.close()
+                return
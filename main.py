@@ -1,10 +1,49 @@
-import tkinter as tk
-from core.gui import LAPH_GUI
+import argparse
+import sys
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="L.A.P.H. — Local Autonomous Programming Helper")
+    parser.add_argument("--batch", metavar="SOURCE",
+                        help="Run headless on a directory of task JSON files, a JSONL file, or '-' for JSONL on stdin")
+    parser.add_argument("--output", metavar="FILE", help="Write JSONL results here instead of stdout")
+    parser.add_argument("--workers", type=int, default=4, help="Tasks processed concurrently (default: 4)")
+    parser.add_argument("--per-model", type=int, default=2, help="Maximum concurrent requests per model (default: 2)")
+    parser.add_argument("--max-iters", type=int, default=20, help="Iteration budget per task (default: 20)")
+    parser.add_argument("--candidates", type=int, default=None, help="Best-of-N coder candidates per iteration")
+    return parser.parse_args(argv)
+
+def run_batch(args):
+    # Imported lazily so headless runs never touch Tk
+    from core.batch import BatchRunner, load_tasks
+
+    tasks = load_tasks(args.batch)
+    runner = BatchRunner(
+        workers=max(1, args.workers),
+        per_model_limit=max(1, args.per_model),
+        max_iters=max(1, args.max_iters),
+        candidates=args.candidates
+    )
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        succeeded, total = runner.run(tasks, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{succeeded}/{total} tasks succeeded", file=sys.stderr)
+    return 0 if succeeded == total else 1
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch:
+        return run_batch(args)
+
+    import tkinter as tk
+    from core.gui import LAPH_GUI
 
-def main():
     root = tk.Tk()
     app = LAPH_GUI(root)
     root.mainloop()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
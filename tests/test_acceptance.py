@@ -0,0 +1,151 @@
+import time
+import unittest
+from core.acceptance import AcceptanceSuite, AcceptanceCase
+from core.runner import CodeRunner
+from tests.test_repair_loop import ScriptedModel, make_loop
+
+ADD = "def add(a, b):\n    return a + b\n\nif __name__ == '__main__':\n    print(add(*map(int, input().split())))\n"
+CASES = [AcceptanceCase("small", "2 3\n", "5"), AcceptanceCase("negative", "-4 10\n", "6\n\n")]
+TESTS = "def test_small():\n    assert add(2, 3) == 5\n\ndef test_negative():\n    assert add(-4, 10) == 6\n\ndef helper():\n    pass\n"
+
+
+class TestAcceptanceSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = CodeRunner()
+
+    def test_stdin_cases_pass(self):
+        """Test that matching output passes, ignoring trailing whitespace"""
+        report = AcceptanceSuite(CASES).run(self.runner, ADD)
+        self.assertTrue(report.passed)
+        self.assertEqual((report.total, report.ran), (2, 2))
+
+    def test_wrong_output_reported(self):
+        """Test that a wrong answer from a clean exit is a compact failure"""
+        wrong = "a, b = input().split()\nprint(a + b)\n"
+        report = AcceptanceSuite(CASES, fail_fast=False).run(self.runner, wrong)
+        self.assertFalse(report.passed)
+        self.assertEqual(len(report.failures), 2)
+        summary = report.summary()
+        self.assertIn("small: input '2 3\\n' expected '5', got '23'", summary)
+        self.assertTrue(summary.startswith("Acceptance checks failed (2 failing, 2 of 2 run)"))
+
+    def test_test_functions(self):
+        """Test that test_* functions run with the program's globals in scope"""
+        suite = AcceptanceSuite(tests=TESTS, shards=2)
+        self.assertEqual(suite.test_names, ["test_small", "test_negative"])
+        self.assertTrue(suite.run(self.runner, ADD).passed)
+
+        report = suite.run(self.runner, "def add(a, b):\n    return a - b\n")
+        self.assertFalse(report.passed)
+        # Both tests fail; which shard reports first depends on scheduling
+        self.assertIn(report.failures[0].detail, (
+            "AssertionError (tests line 2: assert add(2, 3) == 5)",
+            "AssertionError (tests line 5: assert add(-4, 10) == 6)",
+        ))
+
+    def test_program_that_fails_to_load(self):
+        """Test that a program crashing on import fails its tests"""
+        report = AcceptanceSuite(tests=TESTS).run(self.runner, "raise ValueError('boom')\n")
+        self.assertFalse(report.passed)
+        self.assertIn("program failed to load: ValueError: boom", report.failures[0].detail)
+
+    def test_program_reading_input_at_load(self):
+        """Test that a program reading stdin at top level loads with the first case's input"""
+        program = "def add(a, b):\n    return a + b\n\nprint(add(*map(int, input().split())), end='')\n"
+        report = AcceptanceSuite(CASES, tests=TESTS).run(self.runner, program)
+        self.assertTrue(report.passed, report.summary())
+        self.assertEqual(report.ran, 4)
+
+    def test_fail_fast_cancels_other_shards(self):
+        """Test that the first failing shard stops the slow ones"""
+        program = "import time\nvalue = input()\nif value == 'slow':\n    time.sleep(5)\nprint(value)\n"
+        cases = [AcceptanceCase("slow", "slow\n", "slow"), AcceptanceCase("fast", "fast\n", "wrong")]
+        start = time.monotonic()
+        report = AcceptanceSuite(cases, shards=2).run(self.runner, program)
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual([failure.name for failure in report.failures], ["fast"])
+        self.assertEqual(report.ran, 1)
+
+    def test_from_task(self):
+        """Test building a suite from a task file entry"""
+        suite = AcceptanceSuite.from_task({"cases": [{"stdin": "1\n", "stdout": "1"}], "tests": TESTS}, {"shards": 3})
+        self.assertEqual(suite.total, 3)
+        self.assertEqual(suite.cases[0].name, "case 1")
+        self.assertEqual(suite.primary_stdin, "1\n")
+        self.assertIsNone(AcceptanceSuite.from_task({}, {}))
+
+    def test_from_task_skips_malformed_checks(self):
+        """Test that bad cases and unparsable tests are reported and skipped"""
+        warnings = []
+        acceptance = {"cases": [{"stdin": "1\n", "stdout": "1"}, "2", {"stdin": 3, "stdout": "3"}],
+                      "tests": "def test_broken(:\n    pass\n"}
+        suite = AcceptanceSuite.from_task(acceptance, {}, warn=warnings.append)
+        self.assertEqual([case.stdin for case in suite.cases], ["1\n"])
+        self.assertEqual(suite.test_names, [])
+        self.assertEqual(len(warnings), 3)
+        self.assertIn("case 2", warnings[0])
+        self.assertIn("not valid Python", warnings[2])
+        self.assertIsNone(AcceptanceSuite.from_task({"cases": "x", "tests": 5}, {}, warn=warnings.append))
+
+
+class TestRepairLoopAcceptance(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = make_loop(self)
+        self.loop._sleep = lambda seconds, reason: None
+        self.loop.models['thinker'] = ScriptedModel("Read two ints and print their sum.")
+        self.acceptance = {"cases": [{"stdin": "2 3\n", "stdout": "5"}, {"stdin": "1 1\n", "stdout": "2"}]}
+
+    def test_clean_exit_with_wrong_output_is_not_success(self):
+        """Test that failing checks send the loop round again with the failures as the error"""
+        coder = ScriptedModel(lambda index, options: [
+            "a, b = input().split()\nprint(a + b)\n",
+            "a, b = map(int, input().split())\nprint(a + b)\n"
+        ][min(index, 1)])
+        self.loop.models['coder'] = coder
+        code = self.loop.run_task("add two numbers", max_iters=3, candidates=1, acceptance=self.acceptance)
+
+        self.assertEqual(code, "a, b = map(int, input().split())\nprint(a + b)")
+        self.assertEqual(self.loop.last_run_stats['iterations'], 2)
+        self.assertIn("expected '5', got '23'", coder.prompts[1])
+        self.assertIn("Acceptance checks:", self.loop.models['thinker'].prompts[0])
+
+    def test_candidates_must_pass_checks(self):
+        """Test that best-of-N only picks a candidate that passes its checks"""
+        def responses(index, options):
+            if options["seed"] % 1000 == 1:
+                return "a, b = map(int, input().split())\nprint(a + b)\n"
+            return "a, b = input().split()\nprint(a + b)\n"
+
+        self.loop.models['coder'] = ScriptedModel(responses)
+        code = self.loop.run_task("add two numbers", max_iters=1, candidates=2, acceptance=self.acceptance)
+        self.assertEqual(code, "a, b = map(int, input().split())\nprint(a + b)")
+
+    def test_malformed_tests_dont_fail_the_task(self):
+        """Test that a task file with broken tests still runs, with the warning logged"""
+        self.loop.models['coder'] = ScriptedModel("a, b = map(int, input().split())\nprint(a + b)\n")
+        acceptance = dict(self.acceptance, tests="def test_broken(:\n")
+        code = self.loop.run_task("sum", max_iters=1, candidates=1, acceptance=acceptance)
+        self.assertEqual(code, "a, b = map(int, input().split())\nprint(a + b)")
+        self.assertTrue(self.loop.logger.flush())
+        with open(self.loop.logger.path, encoding="utf-8") as f:
+            self.assertIn("WARNING: Acceptance tests are not valid Python", f.read())
+
+    def test_generated_tests(self):
+        """Test that the tester model writes tests once per task when enabled"""
+        self.loop.acceptance_config = dict(self.loop.acceptance_config, generate_tests=True)
+        tester = self.loop.models['tester'] = ScriptedModel("```python\ndef test_add():\n    assert add(2, 3) == 5\n```\n")
+        self.loop.models['coder'] = ScriptedModel(lambda index, options: [
+            "def add(a, b):\n    return a - b\n",
+            "def add(a, b):\n    return a + b\n"
+        ][min(index, 1)])
+        code = self.loop.run_task("write add(a, b)", max_iters=3, candidates=1)
+
+        self.assertEqual(code, "def add(a, b):\n    return a + b")
+        self.assertEqual(len(tester.calls), 1)
+        self.assertIn("test_add: AssertionError", self.loop.models['coder'].prompts[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
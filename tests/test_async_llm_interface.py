@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+import unittest
+from contextlib import aclosing
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.async_llm_interface import AsyncLLMInterface, ThreadedLLMInterface
+from core.errors import LLMConnectionError, LLMResponseError
+
+
+def tokens(count):
+    return "".join(f"t{i} " for i in range(count))
+
+
+class TestAsyncLLMInterface(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOllamaServer({"fake": [tokens(5)]}, token_rate=100, latency=0).start()
+        self.base_url = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_generate_streams_tokens(self):
+        """Test that /api/generate is streamed as an async iterator"""
+        client = AsyncLLMInterface("fake", base_url=self.base_url)
+
+        async def collect():
+            return [chunk async for chunk in client.generate("hi")]
+
+        self.assertEqual(asyncio.run(collect()), [f"t{i} " for i in range(5)])
+
+    def test_chat_streams_tokens(self):
+        """Test that /api/chat message content is streamed"""
+        client = AsyncLLMInterface("fake", base_url=self.base_url)
+
+        async def collect():
+            messages = [{"role": "user", "content": "hi"}]
+            return "".join([chunk async for chunk in client.chat(messages)])
+
+        self.assertEqual(asyncio.run(collect()), "t0 t1 t2 t3 t4 ")
+
+    def test_connection_pool_is_bounded(self):
+        """Test that concurrent streams never exceed max_connections"""
+        client = AsyncLLMInterface("fake", base_url=self.base_url, max_connections=2)
+
+        async def collect():
+            return "".join([chunk async for chunk in client.generate("hi")])
+
+        async def main():
+            return await asyncio.gather(*(collect() for _ in range(6)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(results), 6)
+        self.assertLessEqual(self.server.peak, 2)
+
+    def test_early_close_drops_connection(self):
+        """Test that abandoning a stream closes the socket on the server side"""
+        self.server.script["fake"] = [tokens(200)]
+        client = AsyncLLMInterface("fake", base_url=self.base_url)
+
+        async def first_token():
+            async with aclosing(client.generate("hi")) as stream:
+                async for chunk in stream:
+                    return chunk
+
+        self.assertEqual(asyncio.run(first_token()), "t0 ")
+        deadline = time.monotonic() + 2
+        while self.server.aborted == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.aborted, 1)
+
+    def test_connection_error_is_raised(self):
+        """Test that an unreachable server raises a typed error"""
+        client = AsyncLLMInterface("fake", base_url="http://127.0.0.1:1")
+
+        async def collect():
+            return [chunk async for chunk in client.generate("hi", timeout=1)]
+
+        with self.assertRaises(LLMConnectionError):
+            asyncio.run(collect())
+
+    def test_stale_pooled_connection_retried(self):
+        """Test that a request on a keep-alive connection the server dropped is retried on a new one"""
+        connections = []
+
+        async def serve_once(reader, writer):
+            # Answer one request per connection, then close the connection
+            # when the next request arrives, like a server's idle timeout
+            connections.append(writer)
+            for answered in (False, True):
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+                await reader.readexactly(length)
+                if answered:
+                    break
+                body = b'{"response": "ok", "done": true}\n'
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+                await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(serve_once, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = AsyncLLMInterface("fake", base_url=f"http://127.0.0.1:{port}")
+            try:
+                return [[chunk async for chunk in client.generate("hi", timeout=2)] for _ in range(2)]
+            finally:
+                await client.aclose()
+                server.close()
+
+        self.assertEqual(asyncio.run(main()), [["ok"], ["ok"]])
+        self.assertEqual(len(connections), 2)
+
+    def test_base_url_scheme(self):
+        """Test that https URLs use TLS on port 443 and other schemes are rejected"""
+        client = AsyncLLMInterface("fake", base_url="https://ollama.example.com")
+        self.assertEqual(client.port, 443)
+        self.assertIsNotNone(client.ssl)
+        plain = AsyncLLMInterface("fake", base_url="http://localhost:11434")
+        self.assertEqual(plain.port, 11434)
+        self.assertIsNone(plain.ssl)
+        with self.assertRaises(ValueError):
+            AsyncLLMInterface("fake", base_url="ftp://localhost:11434")
+
+    def test_http_error_is_raised(self):
+        """Test that an error status surfaces through the sync bridge"""
+        self.server.failing = True
+        client = ThreadedLLMInterface("fake", base_url=self.base_url)
+        with self.assertRaises(LLMResponseError) as raised:
+            list(client.generate("hi"))
+        self.assertEqual(raised.exception.status, 503)
+
+    def test_threaded_cancel_event(self):
+        """Test that the sync bridge stops streaming when cancelled"""
+        self.server.script["fake"] = [tokens(200)]
+        client = ThreadedLLMInterface("fake", base_url=self.base_url)
+        cancel_event = threading.Event()
+
+        chunks = []
+        for chunk in client.generate("hi", cancel_event=cancel_event):
+            chunks.append(chunk)
+            if len(chunks) == 3:
+                cancel_event.set()
+
+        self.assertEqual(len(chunks), 3)
+        deadline = time.monotonic() + 2
+        while self.server.aborted == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.aborted, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
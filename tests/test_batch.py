@@ -0,0 +1,144 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from core.batch import BatchRunner, GatedModel, ModelGate, load_tasks, log_filename
+from tests.test_repair_loop import make_loop
+
+
+class EchoModel:
+    """Stand-in model that records how many generate() calls overlap."""
+    
+    def __init__(self, model_name, response, delay=0.0):
+        self.model_name = model_name
+        self.response = response
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+    
+    def generate(self, prompt, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            yield self.response
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestLoadTasks(unittest.TestCase):
+    
+    def test_directory_of_task_files(self):
+        """Test loading the examples/ task file format from a directory"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("b.json", "a.json"):
+                with open(os.path.join(tmpdir, name), "w") as f:
+                    json.dump({"task": f"task {name}"}, f)
+            tasks = load_tasks(tmpdir)
+        
+        self.assertEqual([t["id"] for t in tasks], ["a", "b"])
+        self.assertEqual(tasks[0]["task"], "task a.json")
+    
+    def test_jsonl_file(self):
+        """Test loading tasks from a JSONL stream"""
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write('{"task": "one"}\n\n{"id": "custom", "task": "two"}\n')
+        try:
+            tasks = load_tasks(f.name)
+        finally:
+            os.remove(f.name)
+        
+        self.assertEqual([t["id"] for t in tasks], ["task-1", "custom"])
+    
+    def test_missing_task_rejected(self):
+        """Test that entries without a task description are rejected"""
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write('{"id": "x"}\n')
+        try:
+            with self.assertRaises(ValueError):
+                load_tasks(f.name)
+        finally:
+            os.remove(f.name)
+    
+    def test_empty_id_rejected(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write('{"id": " ", "task": "say ok"}\n')
+        try:
+            with self.assertRaises(ValueError):
+                load_tasks(f.name)
+        finally:
+            os.remove(f.name)
+    
+    def test_log_filename_stays_in_log_dir(self):
+        """Test that path separators in task ids can't move the log file"""
+        self.assertEqual(log_filename("../x"), ".._x.log")
+        self.assertEqual(log_filename("a/b\\c"), "a_b_c.log")
+        self.assertEqual(log_filename(7), "7.log")
+        self.assertEqual(log_filename("task-1.v2"), "task-1.v2.log")
+
+
+class TestModelGate(unittest.TestCase):
+    
+    def test_concurrency_bounded_per_model(self):
+        """Test that a shared gate caps concurrent calls to one model"""
+        model = EchoModel("m", "x", delay=0.05)
+        gated = GatedModel(model, ModelGate(2).semaphore_for("m"))
+        threads = [threading.Thread(target=lambda: list(gated.generate("p"))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(model.peak, 2)
+    
+    def test_clients_gated_when_first_created(self):
+        """Test that gating a worker's models keeps them lazy"""
+        runner = BatchRunner(workers=1)
+        loop = make_loop(self, runner._loop)
+        self.assertFalse(loop.models.loaded('vision'))
+        
+        coder = loop.models['coder']
+        self.assertIsInstance(coder, GatedModel)
+        self.assertIs(coder.semaphore, runner.gate.semaphore_for(coder.model_name))
+        self.assertIs(loop.models['tester'], coder)
+        self.assertFalse(loop.models.loaded('vision'))
+        self.assertFalse(loop.models.loaded('thinker'))
+
+
+class TestBatchRunner(unittest.TestCase):
+    
+    def test_results_streamed_as_jsonl(self):
+        """Test that every task produces one JSONL record"""
+        coder = EchoModel("coder", "print('ok')\n", delay=0.01)
+        
+        class ScriptedBatchRunner(BatchRunner):
+            def _loop(self, logger):
+                loop = super()._loop(logger)
+                loop.models['thinker'] = GatedModel(EchoModel("thinker", "spec"), self.gate.semaphore_for("thinker"))
+                loop.models['coder'] = GatedModel(coder, self.gate.semaphore_for("coder"))
+                return loop
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            runner = ScriptedBatchRunner(workers=3, per_model_limit=1, max_iters=2, log_dir=tmpdir)
+            out = io.StringIO()
+            tasks = [{"id": f"t{i}", "task": "say ok"} for i in range(3)] + [{"id": "../t3", "task": "say ok"}]
+            succeeded, total = runner.run(tasks, out)
+            logs = sorted(os.listdir(tmpdir))
+        
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual((succeeded, total), (4, 4))
+        self.assertEqual(sorted(r["id"] for r in records), ["../t3", "t0", "t1", "t2"])
+        self.assertEqual(logs, [".._t3.log", "t0.log", "t1.log", "t2.log"])
+        self.assertTrue(all(r["status"] == "success" and r["iterations"] == 1 for r in records))
+        self.assertIn("coder", records[0]["timings"])
+        self.assertEqual(coder.peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
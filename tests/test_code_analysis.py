@@ -0,0 +1,73 @@
+import unittest
+from core.code_analysis import analyze_code
+
+
+class TestCodeAnalysis(unittest.TestCase):
+
+    def test_findings_resolve_aliases(self):
+        """Test that calls are found through import aliases, with line numbers"""
+        code = (
+            "import os as o\n"
+            "from subprocess import run\n"
+            "from urllib.request import urlopen\n"
+            "o.system('ls')\n"
+            "run(['ls'])\n"
+            "urlopen('http://example.com')\n"
+        )
+        findings = {(f.category, f.name, f.line) for f in analyze_code(code).findings}
+        self.assertEqual(findings, {
+            ("code_execution", "os.system", 4),
+            ("subprocess", "subprocess.run", 5),
+            ("network", "urllib.request.urlopen", 6),
+        })
+
+    def test_strings_and_comments_ignored(self):
+        """Test that mentions in strings and comments are not findings"""
+        code = "# never call eval() here\nprint('os.system(\"ls\") and requests.get')\n"
+        self.assertEqual(analyze_code(code).findings, ())
+
+    def test_open_modes(self):
+        """Test that open() is classified by its mode"""
+        code = "open('a.txt')\nopen('b.txt', 'w')\nopen('c.txt', mode='a')\n"
+        self.assertEqual(
+            [f.category for f in analyze_code(code).findings],
+            ["file_open", "file_write", "file_write"]
+        )
+
+    def test_imports_and_loops(self):
+        """Test import and loop counts"""
+        code = "import json\nfrom math import sqrt\nfor i in range(3):\n    while False:\n        pass\nsquares = [i * i for i in range(3)]\n"
+        analysis = analyze_code(code)
+        self.assertEqual(analysis.imports, ("json", "math"))
+        self.assertEqual(analysis.loop_count, 3)
+
+    def test_undefined_names(self):
+        """Test that names read but never bound are reported at their first use"""
+        code = (
+            "def total(values, *rest):\n"
+            "    return sum(values) + offset\n"
+            "try:\n"
+            "    print(total([1]), totl)\n"
+            "except Exception as e:\n"
+            "    print(e, totl)\n"
+        )
+        self.assertEqual(analyze_code(code).undefined_names, (("offset", 2), ("totl", 4)))
+        # A star import could bind anything
+        self.assertEqual(analyze_code("from math import *\nprint(sqrt(2))").undefined_names, ())
+
+    def test_syntax_error(self):
+        """Test that unparseable and uncompilable code report the error and its line"""
+        analysis = analyze_code("x = 1\nfor i in range(3)\n    print(i)\n")
+        self.assertFalse(analysis.valid)
+        self.assertIn("Syntax error", analysis.syntax_error)
+        self.assertEqual(analysis.error_line, 2)
+        self.assertFalse(analyze_code("return 1").valid)
+
+    def test_cached_by_hash(self):
+        """Test that the same code is parsed once"""
+        code = "print('cached analysis')\n"
+        self.assertIs(analyze_code(code), analyze_code("".join([code])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
+import time
 import unittest
-from core.code_extractor import CodeExtractor
+from core.code_extractor import CodeExtractor, StreamingCodeExtractor
 
 
 class TestCodeExtractor(unittest.TestCase):
@@ -100,6 +101,116 @@ def main():
         result = CodeExtractor.extract_code(text)
         self.assertIn("def main", result)
         self.assertIn("Full version", result)
+    
+    def test_foreign_fences_skipped(self):
+        """Test that blocks in other languages are not taken for the program"""
+        text = "Install it:\n```bash\npip install requests\n```\nThen run:\n```\nprint('done')\n```\n"
+        self.assertEqual(CodeExtractor.extract_code(text), "print('done')")
+    
+    def test_truncated_block(self):
+        """Test that a response cut off inside its code block still yields the code"""
+        text = "Sure:\n```python\nimport math\nprint(math.pi)\n"
+        self.assertEqual(CodeExtractor.extract_code(text), "import math\nprint(math.pi)")
+    
+    def test_code_tags(self):
+        """Test <code> tags, including one left open"""
+        text = "Use <code>x = 1</code> or <code>print(2)\nprint(3)</code> and <code>never closed"
+        self.assertEqual(CodeExtractor.extract_code(text), "print(2)\nprint(3)")
+    
+    def test_baseline_parity(self):
+        """Test responses mixing tags and fences extract what the original regex extractor did"""
+        cases = [
+            # An unclosed tag is plain text; the fence after it still counts
+            ("Use <code>x = 1 for the value.\n```python\nprint(1)\n```\n", "print(1)"),
+            # A fence inside a tag wins over the tag
+            ("<code>\n```python\nprint(1)\n```\n</code>", "print(1)"),
+            # A fence closed at the end of a code line is not a block
+            ("```python\nprint(3)```", "```python\nprint(3)```"),
+            ("<code>print(1)</code>\n```python\nprint(2)\n```\n", "print(2)"),
+            ("<code>a = 1 <code>b = 2</code> <code>unclosed", "a = 1 <code>b = 2"),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(CodeExtractor.extract_code(text), expected)
+    
+    def test_adversarial_input_is_linear(self):
+        """Test that unclosed tags and fences don't make extraction quadratic"""
+        for text in ("<code>x = 1 " * 50000, "```js\nconsole.log(1)\n" * 20000, ("```python" + " " * 200) * 2000):
+            start = time.perf_counter()
+            CodeExtractor.extract_code(text)
+            self.assertLess(time.perf_counter() - start, 1.0)
+
+
+def feed_all(extractor, text, size=3):
+    """Feed text in small chunks; returns the number of chunks consumed"""
+    for index in range(0, len(text), size):
+        if extractor.feed(text[index:index + size]):
+            return index // size + 1
+    extractor.finish()
+    return None
+
+
+class TestStreamingCodeExtractor(unittest.TestCase):
+    
+    def test_stops_when_block_closes(self):
+        """Test that a closed, valid python block stops the stream"""
+        text = "Sure:\n```python\nprint('hi')\n```\nThis prints hi. " + "More words. " * 50
+        extractor = StreamingCodeExtractor()
+        consumed = feed_all(extractor, text)
+        self.assertIsNotNone(consumed)
+        self.assertLess(len(extractor.text), 40)
+        self.assertEqual(extractor.code(), "print('hi')")
+    
+    def test_closing_fence_without_newline(self):
+        """Test that the stop doesn't wait for the newline after the fence"""
+        extractor = StreamingCodeExtractor()
+        self.assertFalse(extractor.feed("```python\nx = 1\n"))
+        self.assertTrue(extractor.feed("```"))
+        self.assertEqual(extractor.code(), "x = 1")
+    
+    def test_code_tag(self):
+        """Test <code> blocks on one or several lines, which are read to the end"""
+        extractor = StreamingCodeExtractor()
+        self.assertFalse(extractor.feed("Answer: <code>print(1)</code> done"))
+        self.assertEqual(extractor.blocks, ["print(1)"])
+        self.assertEqual(extractor.code(), "print(1)")
+        
+        extractor = StreamingCodeExtractor()
+        self.assertFalse(extractor.feed("<code>\nimport os\n"))
+        self.assertFalse(extractor.feed("print(os.sep)</code>\n"))
+        self.assertEqual(extractor.code(), "import os\nprint(os.sep)")
+    
+    def test_bare_block_then_python_block(self):
+        """Test that a bare block doesn't stop the stream before the ```python block the extractor picks"""
+        text = ("The input looks like:\n```\nvalue = 3\n```\nHere is the program:\n"
+                "```python\nvalue = int(input())\nprint(value * 2)\n```\nDone.\n")
+        extractor = StreamingCodeExtractor()
+        self.assertIsNotNone(feed_all(extractor, text))
+        self.assertEqual(extractor.code(), "value = int(input())\nprint(value * 2)")
+        self.assertEqual(extractor.code(), CodeExtractor.extract_code(text))
+    
+    def test_invalid_or_foreign_blocks_keep_streaming(self):
+        """Test that shell blocks and broken code don't stop the stream"""
+        text = "```bash\npip install rich\n```\n```python\ndef broken(\n```\n```python\nprint('ok')\n```\n"
+        extractor = StreamingCodeExtractor()
+        feed_all(extractor, text)
+        self.assertEqual(extractor.code(), "print('ok')")
+        self.assertEqual(len(extractor.blocks), 3)
+    
+    def test_plain_code_falls_back_to_extract_code(self):
+        """Test that unfenced output is extracted once the stream ends"""
+        text = "import sys\ndef main():\n    print(sys.argv)\n"
+        extractor = StreamingCodeExtractor()
+        self.assertIsNone(feed_all(extractor, text))
+        self.assertEqual(extractor.code(), CodeExtractor.extract_code(text))
+    
+    def test_early_stop_disabled(self):
+        """Test that early_stop=False consumes the whole stream"""
+        text = "```python\nprint(1)\n```\nexplanation"
+        extractor = StreamingCodeExtractor(early_stop=False)
+        self.assertIsNone(feed_all(extractor, text))
+        self.assertEqual(extractor.text, text)
+        self.assertEqual(extractor.code(), "print(1)")
 
 
 if __name__ == "__main__":
@@ -67,6 +67,13 @@ print(calculate(10))
         self.assertFalse(is_safe)
         self.assertTrue(any('eval(' in r for r in reasons))
     
+    def test_unparsable_code_not_safe(self):
+        """Test that code which doesn't parse is not safe for auto-execution"""
+        code = "import os\nos.system('ls')\ndef broken(:\n"
+        is_safe, reasons = CodeSanitizer.is_safe_for_auto_execution(code)
+        self.assertFalse(is_safe)
+        self.assertTrue(any('Syntax error' in r for r in reasons))
+
     def test_file_ops_with_permission(self):
         """Test file operations are allowed when permitted"""
         code = "with open('test.txt', 'w') as f:\n    f.write('test')"
@@ -81,6 +88,20 @@ print(calculate(10))
         is_safe, reasons = CodeSanitizer.is_safe_for_auto_execution(code, allow_network=True)
         # Network ops should be allowed
         self.assertTrue(all('network operation' not in r for r in reasons))
+    
+    def test_aliased_call_detected(self):
+        """Test that dangerous calls are found through import aliases"""
+        code = "from os import system as run_shell\nrun_shell('ls')"
+        warnings, errors = CodeSanitizer.analyze(code)
+        self.assertTrue(any('os.system()' in w and 'line 2' in w for w in warnings))
+    
+    def test_strings_and_comments_not_flagged(self):
+        """Test that operations only mentioned in strings or comments are not flagged"""
+        code = "# don't use eval( here\nprint('call os.system( or requests.get')"
+        warnings, errors = CodeSanitizer.analyze(code)
+        self.assertEqual(warnings, [])
+        is_safe, reasons = CodeSanitizer.is_safe_for_auto_execution(code)
+        self.assertTrue(is_safe)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+import unittest
+from core.context_builder import ContextBuilder
+
+
+def deep_traceback(depth):
+    lines = ["Traceback (most recent call last):",
+             '  File "/tmp/tmpabc.py", line 9, in <module>',
+             "    main()"]
+    for level in range(depth):
+        lines.append(f'  File "/usr/lib/python3.11/json/decoder.py", line {100 + level}, in decode')
+        lines.append("    obj, end = self.raw_decode(s, idx=_w(s, 0).end())")
+    lines.append('  File "/tmp/tmpabc.py", line 4, in parse')
+    lines.append("    return json.loads(text)")
+    lines.append("json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)")
+    return "\n".join(lines)
+
+
+class TestContextBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.builder = ContextBuilder(default_budget=2000, max_frames=4, min_error_tokens=50, min_code_tokens=100)
+
+    def test_short_traceback_untouched(self):
+        """Test that a traceback within max_frames is kept as is"""
+        text = deep_traceback(1)
+        self.assertEqual(self.builder.trim_traceback(text), text)
+
+    def test_library_frames_dropped(self):
+        """Test that deep library frames are omitted but program frames and the exception stay"""
+        trimmed = self.builder.trim_traceback(deep_traceback(30))
+        self.assertIn('File "/tmp/tmpabc.py", line 9', trimmed)
+        self.assertIn('File "/tmp/tmpabc.py", line 4', trimmed)
+        self.assertIn("frames omitted", trimmed)
+        self.assertTrue(trimmed.endswith("JSONDecodeError: Expecting value: line 1 column 1 (char 0)"))
+        self.assertLess(trimmed.count("decoder.py"), 5)
+
+    def test_dedupe_lines(self):
+        """Test that runs of identical lines collapse"""
+        text = "start\n" + "warning: spam\n" * 500 + "end"
+        self.assertEqual(
+            ContextBuilder.dedupe_lines(text),
+            "start\nwarning: spam\n  [Previous line repeated 499 more times]\nend"
+        )
+
+    def test_within_budget_only_cleans_error(self):
+        """Test that small contexts pass through"""
+        context = self.builder.compact("system", "print(1)", "NameError: x")
+        self.assertEqual(context.code, "print(1)")
+        self.assertEqual(context.error, "NameError: x")
+        self.assertEqual(context.tokens_saved, 0)
+
+    def test_over_budget_keeps_exception(self):
+        """Test that a huge error is cut down but keeps its final exception line"""
+        noise = "\n".join(f"debug line {index}" for index in range(5000))
+        error = noise + "\nValueError: the real problem"
+        context = self.builder.compact("system", "print(1)", error)
+        self.assertLessEqual(context.tokens_after, 2000)
+        self.assertGreater(context.tokens_saved, 0)
+        self.assertTrue(context.error.endswith("ValueError: the real problem"))
+        self.assertIn("lines omitted", context.error)
+
+    def test_code_shrunk_last(self):
+        """Test that previous code is trimmed only when the error alone isn't enough"""
+        code = "\n".join(f"value_{index} = {index}" for index in range(3000))
+        context = self.builder.compact("system", code, "IndexError: list index out of range")
+        self.assertEqual(context.error, "IndexError: list index out of range")
+        self.assertIn("# ... ", context.code)
+        self.assertTrue(context.code.startswith("value_0 = 0"))
+        self.assertTrue(context.code.endswith("value_2999 = 2999"))
+        self.assertLessEqual(context.tokens_after, 2000)
+
+    def test_code_kept_whole(self):
+        """Test that trim_code=False cuts only the error, even over budget"""
+        code = "\n".join(f"value_{index} = {index}" for index in range(3000))
+        error = "\n".join(f"debug line {index}" for index in range(5000)) + "\nIndexError: list index out of range"
+        context = self.builder.compact("system", code, error, trim_code=False)
+        self.assertEqual(context.code, code)
+        self.assertTrue(context.error.endswith("IndexError: list index out of range"))
+        self.assertIn("lines omitted", context.error)
+
+    def test_disabled_passes_through(self):
+        """Test that a disabled builder leaves everything alone"""
+        builder = ContextBuilder(enabled=False, default_budget=10)
+        error = "x\n" * 100
+        context = builder.compact("system", "code", error)
+        self.assertEqual(context.error, error)
+        self.assertEqual(context.tokens_saved, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+from core.deadline import Deadline
+from core.errors import DeadlineExceeded
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_no_deadline(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertEqual(deadline.timeout(300), 300)
+        deadline.check()
+        self.assertFalse(deadline.child().wait(0.01))
+
+    def test_expiry_sets_events(self):
+        """Test that expiry sets the deadline's event and every child event"""
+        deadline = Deadline(0.1)
+        self.assertLessEqual(deadline.timeout(300), 0.1)
+        child = deadline.child()
+        self.assertTrue(child.wait(1))
+        self.assertTrue(deadline.event.is_set())
+        self.assertTrue(deadline.child().is_set())
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+    def test_child_set_independently(self):
+        deadline = Deadline(10)
+        child = deadline.child()
+        child.set()
+        self.assertFalse(deadline.event.is_set())
+        deadline.cancel()
+
+    def test_cancel_stops_timer(self):
+        deadline = Deadline(0.05)
+        deadline.cancel()
+        time.sleep(0.1)
+        self.assertFalse(deadline.event.is_set())
+        self.assertTrue(deadline.expired())
+
+
+if __name__ == "__main__":
+    unittest.main()
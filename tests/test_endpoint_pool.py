@@ -0,0 +1,153 @@
+import threading
+import time
+import unittest
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.endpoint_pool import EndpointPool, PooledModel
+from core.errors import LLMResponseError
+from core.llm_interface import GenerationContext, LLMInterface
+from core.model_scheduler import ScheduledModel
+from tests.test_repair_loop import make_loop
+
+URLS = ["http://127.0.0.1:1", "http://127.0.0.1:2", "http://127.0.0.1:3"]
+
+
+class TestEndpointPool(unittest.TestCase):
+
+    def test_least_outstanding(self):
+        pool = EndpointPool(URLS)
+        first = [pool.acquire() for _ in URLS]
+        self.assertEqual(sorted(endpoint.url for endpoint in first), URLS)
+        pool.release(first[1])
+        self.assertIs(pool.acquire(), first[1])
+
+    def test_sticky_route(self):
+        """Test that calls of one task stay on one endpoint even when it is busier"""
+        pool = EndpointPool(URLS)
+        endpoint = pool.acquire("task-1")
+        self.assertIs(pool.acquire("task-1"), endpoint)
+        self.assertIsNot(pool.acquire("task-2"), endpoint)
+
+        unsticky = EndpointPool(URLS, sticky=False)
+        endpoint = unsticky.acquire("task-1")
+        self.assertIsNot(unsticky.acquire("task-1"), endpoint)
+
+    def test_ejects_after_failures(self):
+        pool = EndpointPool(URLS[:2], max_failures=2, probe_interval=60)
+        bad = pool.acquire("task-1")
+        pool.release(bad, ok=False)
+        self.assertIn(bad.url, pool.healthy())
+        pool.release(pool.acquire("task-1"), ok=False)
+        self.assertNotIn(bad.url, pool.healthy())
+        # Sticky routes move off an ejected endpoint
+        self.assertIsNot(pool.acquire("task-1"), bad)
+
+    def test_excluded_endpoints(self):
+        pool = EndpointPool(URLS[:2])
+        first = pool.acquire()
+        second = pool.acquire(exclude=[first])
+        self.assertIsNot(second, first)
+        self.assertIsNone(pool.acquire(exclude=[first, second]))
+
+
+class TestPooledModel(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = [FakeOllamaServer({"*": ["hello there"]}, token_rate=0, latency=0.1).start() for _ in range(2)]
+        self.pool = EndpointPool([server.url for server in self.servers], max_failures=1, probe_interval=0.1)
+        self.route = None
+        self.model = PooledModel("m", self.pool, lambda url: LLMInterface("m", base_url=url),
+                                 route_key=lambda: self.route)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def requests_per_server(self):
+        return [len(server.requests) for server in self.servers]
+
+    def test_spreads_concurrent_calls(self):
+        outputs = []
+        threads = [threading.Thread(target=lambda: outputs.append("".join(self.model.generate("hi"))))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(outputs, ["hello there"] * 6)
+        self.assertEqual(self.requests_per_server(), [3, 3])
+
+    def test_sticky_per_task(self):
+        self.route = "task-1"
+        for _ in range(3):
+            self.assertEqual("".join(self.model.generate("hi")), "hello there")
+        self.assertEqual(sorted(self.requests_per_server()), [0, 3])
+
+    def test_fails_over_and_readmits(self):
+        """Test that a failing server is ejected without losing the call, then re-admitted once healthy"""
+        self.route = "task-1"
+        "".join(self.model.generate("hi"))
+        sticky = 0 if self.servers[0].requests else 1
+        self.servers[sticky].failing = True
+
+        self.assertEqual("".join(self.model.generate("hi")), "hello there")
+        self.assertEqual(self.pool.healthy(), [self.servers[1 - sticky].url])
+        "".join(self.model.generate("hi"))
+        self.assertEqual(len(self.servers[sticky].requests), 1)
+
+        self.servers[sticky].failing = False
+        time.sleep(0.15)
+        self.route = "task-2"
+        "".join(self.model.generate("hi"))
+        self.assertEqual(len(self.pool.healthy()), 2)
+        self.assertEqual(len(self.servers[sticky].requests), 2)
+
+    def test_fail_over_keeps_context(self):
+        """Test that the call retried on another server still continues the conversation"""
+        self.route = "task-1"
+        context = GenerationContext()
+        "".join(self.model.generate("hi", context=context))
+        history = context.tokens
+        self.assertTrue(history)
+        sticky = 0 if self.servers[0].requests else 1
+        self.servers[sticky].failing = True
+
+        self.assertEqual("".join(self.model.generate("again", context=context)), "hello there")
+        path, payload = self.servers[1 - sticky].requests[-1]
+        self.assertEqual(payload["prompt"], "again")
+        self.assertEqual(payload.get("context"), history)
+
+    def test_all_endpoints_failing(self):
+        for server in self.servers:
+            server.failing = True
+        with self.assertRaises(LLMResponseError):
+            "".join(self.model.generate("hi"))
+        self.assertEqual(self.pool.check(), [])
+
+
+class TestModelEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = make_loop(self)
+
+    def test_several_endpoints_use_a_pool(self):
+        cfg = {"name": "m", "provider": "ollama", "endpoints": URLS[:2]}
+        client = self.loop._make_model(cfg)
+        if isinstance(client, ScheduledModel):
+            client = client.model
+        self.assertIsInstance(client, PooledModel)
+        self.assertEqual([endpoint.url for endpoint in client.pool.endpoints], URLS[:2])
+
+    def test_single_endpoint_uses_plain_client(self):
+        client = self.loop._make_model({"name": "m", "endpoints": URLS[:1]})
+        if isinstance(client, ScheduledModel):
+            client = client.model
+        self.assertIsInstance(client, LLMInterface)
+        self.assertEqual(client.base_url, URLS[0])
+
+    def test_unsupported_provider(self):
+        with self.assertRaises(ValueError):
+            self.loop._make_model({"name": "gpt", "provider": "openai"})
+
+
+if __name__ == "__main__":
+    unittest.main()
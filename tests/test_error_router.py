@@ -0,0 +1,71 @@
+import unittest
+from core.code_analysis import analyze_code
+from core.error_router import ErrorRouter
+
+NAME_ERROR = """Traceback (most recent call last):
+  File "/tmp/tmpabc.py", line 2, in <module>
+    print(totl)
+          ^^^^
+NameError: name 'totl' is not defined. Did you mean: 'total'?"""
+
+SYNTAX_ERROR = """  File "/tmp/tmpabc.py", line 1
+    for i in range(1, 6)
+                        ^
+SyntaxError: expected ':'"""
+
+CHAINED = """Traceback (most recent call last):
+  File "/tmp/tmpabc.py", line 3, in <module>
+    import yaml
+ModuleNotFoundError: No module named 'yaml'
+
+During handling of the above exception, another exception occurred:
+
+Traceback (most recent call last):
+  File "/tmp/tmpabc.py", line 5, in <module>
+    raise RuntimeError("no parser")
+RuntimeError: no parser"""
+
+
+class TestErrorRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = ErrorRouter(max_fast_attempts=2)
+
+    def test_classify(self):
+        """Test that the final exception decides the kind of failure"""
+        self.assertEqual(self.router.classify(NAME_ERROR), ("simple", "NameError"))
+        self.assertEqual(self.router.classify(SYNTAX_ERROR), ("simple", "SyntaxError"))
+        self.assertEqual(self.router.classify("json.decoder.JSONDecodeError: Expecting value"), ("logic", "JSONDecodeError"))
+        self.assertEqual(self.router.classify(CHAINED), ("logic", "RuntimeError"))
+        self.assertEqual(self.router.classify("wrong answer, no traceback"), ("logic", None))
+
+    def test_route_simple_errors_to_patch(self):
+        """Test that mechanical failures take the fast path until the attempts run out"""
+        self.assertEqual(self.router.route(NAME_ERROR, 0), ErrorRouter.PATCH)
+        self.assertEqual(self.router.route(SYNTAX_ERROR, 1), ErrorRouter.PATCH)
+        self.assertEqual(self.router.route(NAME_ERROR, 2), ErrorRouter.FULL)
+
+    def test_route_full_path(self):
+        """Test that logic errors, empty errors, repeats and a disabled router take the full path"""
+        self.assertEqual(self.router.route(CHAINED, 0), ErrorRouter.FULL)
+        self.assertEqual(self.router.route("", 0), ErrorRouter.FULL)
+        self.assertEqual(self.router.route(NAME_ERROR, 0, repeated=True), ErrorRouter.FULL)
+        self.assertEqual(ErrorRouter(enabled=False).route(NAME_ERROR, 0), ErrorRouter.FULL)
+
+    def test_from_config(self):
+        """Test that the simple error list comes from config"""
+        router = ErrorRouter.from_config({"simple_errors": ["KeyError"], "max_fast_attempts": 1})
+        self.assertEqual(router.classify("KeyError: 'port'"), ("simple", "KeyError"))
+        self.assertEqual(router.classify(NAME_ERROR)[0], "logic")
+        self.assertEqual(router.route("KeyError: 'port'", 1), ErrorRouter.FULL)
+
+    def test_analysis_fills_in_missing_traceback(self):
+        """Test that the program's analysis classifies a failure without a traceback"""
+        undefined = analyze_code("print(totl)\n")
+        self.assertEqual(self.router.classify("", undefined), ("simple", "NameError"))
+        self.assertEqual(self.router.route("", 0, analysis=undefined), ErrorRouter.PATCH)
+        self.assertEqual(self.router.route("", 0, analysis=analyze_code("raise SystemExit(2)\n")), ErrorRouter.FULL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+from core.fix_store import FixStore, apply_diff, error_signature, make_diff
+
+NAME_ERROR = """Traceback (most recent call last):
+  File "/tmp/tmpa1b2c3.py", line 2, in <module>
+    print(totl)
+          ^^^^
+NameError: name 'totl' is not defined. Did you mean: 'total'?
+"""
+
+LIBRARY_ERROR = """Traceback (most recent call last):
+  File "/tmp/tmpzz9.py", line 4, in <module>
+    data = json.loads(raw)
+  File "/usr/lib/python3.11/json/__init__.py", line 346, in loads
+    return _default_decoder.decode(s)
+json.decoder.JSONDecodeError: Expecting value: line 1 column 1 (char 0)
+"""
+
+SYNTAX_ERROR = """  File "<laph-program>", line 3
+    def f(
+         ^
+SyntaxError: '(' was never closed
+"""
+
+
+class TestErrorSignature(unittest.TestCase):
+
+    def test_masks_run_specific_parts(self):
+        """Test that temp paths, numbers and suggestions don't change the fingerprint"""
+        other = NAME_ERROR.replace("tmpa1b2c3", "tmpq9").replace("line 2", "line 40").replace(". Did you mean: 'total'?", "")
+        self.assertEqual(error_signature(NAME_ERROR), error_signature(other))
+        signature = error_signature(NAME_ERROR)
+        self.assertEqual(signature.exception, "NameError")
+        self.assertEqual(signature.message, "NameError: name 'totl' is not defined")
+        self.assertEqual(signature.source_line, "print(totl)")
+
+    def test_uses_program_frame(self):
+        """Test that library frames are skipped when picking the raising line"""
+        signature = error_signature(LIBRARY_ERROR)
+        self.assertEqual(signature.exception, "JSONDecodeError")
+        self.assertEqual(signature.source_line, "data = json.loads(raw)")
+        self.assertIn("line <n> column <n> (char <n>)", signature.message)
+
+    def test_syntax_error(self):
+        signature = error_signature(SYNTAX_ERROR)
+        self.assertEqual(signature.exception, "SyntaxError")
+        self.assertEqual(signature.source_line, "def f(")
+
+    def test_same_message_different_line(self):
+        """Test that the key groups failures while the fingerprint separates lines"""
+        other = error_signature(NAME_ERROR.replace("    print(totl)", "    x = totl * 2"))
+        signature = error_signature(NAME_ERROR)
+        self.assertEqual(signature.key, other.key)
+        self.assertNotEqual(signature.fingerprint, other.fingerprint)
+
+    def test_no_traceback(self):
+        self.assertIsNone(error_signature(""))
+        self.assertIsNone(error_signature("Acceptance checks failed (1 failing, 1 of 1 run):\n- case 1: expected '3', got '4'"))
+
+
+class TestApplyDiff(unittest.TestCase):
+
+    def test_applies_to_shifted_program(self):
+        """Test that a recorded diff applies where its lines moved"""
+        failed = "total = 3\nprint(totl)\n"
+        fixed = "total = 3\nprint(total)\n"
+        diff = make_diff(failed, fixed)
+        shifted = "import sys\n\n" + failed
+        self.assertEqual(apply_diff(shifted, diff), "import sys\n\ntotal = 3\nprint(total)")
+
+    def test_refuses_missing_or_ambiguous_context(self):
+        diff = make_diff("total = 3\nprint(totl)\n", "total = 3\nprint(total)\n")
+        self.assertIsNone(apply_diff("print('other')\n", diff))
+        self.assertIsNone(apply_diff("total = 3\nprint(totl)\ntotal = 3\nprint(totl)\n", diff))
+
+
+class TestFixStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = FixStore(path=os.path.join(self.tmpdir.name, "fixes.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_record_and_lookup(self):
+        """Test that a recorded fix is found again for the same failure in a later run"""
+        self.assertTrue(self.store.record(NAME_ERROR, "total = 3\nprint(totl)", "total = 3\nprint(total)"))
+        fixes = self.store.lookup(NAME_ERROR.replace("tmpa1b2c3", "tmpother"))
+        self.assertEqual(len(fixes), 1)
+        self.assertTrue(fixes[0].exact)
+        self.assertIn("+print(total)", fixes[0].diff)
+        self.assertIn("fixed once", FixStore.describe(fixes))
+
+    def test_exact_fixes_rank_first(self):
+        """Test that fixes for the same line outrank more frequent fixes for other lines"""
+        elsewhere = NAME_ERROR.replace("    print(totl)", "    x = totl * 2")
+        for _ in range(3):
+            self.store.record(elsewhere, "x = totl * 2", "x = total * 2")
+        self.store.record(NAME_ERROR, "print(totl)", "print(total)")
+        self.store.record(NAME_ERROR, "print(totl)", "print(total)")
+
+        fixes = self.store.lookup(NAME_ERROR)
+        self.assertEqual([(fix.exact, fix.hits) for fix in fixes], [(True, 2), (False, 3)])
+
+    def test_skips_unusable_fixes(self):
+        """Test that errors without a traceback, rewrites and no-op changes are not stored"""
+        self.assertFalse(self.store.record("killed", "a = 1", "a = 2"))
+        self.assertFalse(self.store.record(NAME_ERROR, "print(totl)", "print(totl)"))
+        self.store.max_diff_chars = 10
+        self.assertFalse(self.store.record(NAME_ERROR, "print(totl)", "print(total)"))
+        self.assertEqual(self.store.lookup(NAME_ERROR), [])
+
+    def test_eviction(self):
+        self.store.max_entries = 2
+        for index in range(4):
+            self.store.record(NAME_ERROR, "print(totl)", f"print(total + {index})")
+        self.assertEqual(len(self.store.lookup(NAME_ERROR, limit=10)), 2)
+
+    def test_disabled(self):
+        self.store.enabled = False
+        self.assertFalse(self.store.record(NAME_ERROR, "print(totl)", "print(total)"))
+        self.assertEqual(self.store.lookup(NAME_ERROR), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import tempfile
+import threading
+import unittest
+from core.errors import LLMError
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.llm_cache import LLMCache
+from core.llm_interface import LLMInterface
+from tests.test_repair_loop import make_loop
+
+
+class TestLLMCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite")
+        # Sampling options don't matter for these tests
+        self.cache = LLMCache(path=self.path, deterministic_only=False)
+        self.calls = 0
+    
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+    
+    def live(self, chunks):
+        def generate():
+            self.calls += 1
+            yield from chunks
+        return generate
+    
+    def test_key_depends_on_model_options_and_prompt(self):
+        """Test that every part of the request changes the cache key"""
+        base = LLMCache.make_key("m", "prompt", {"temperature": 0})
+        self.assertEqual(base, LLMCache.make_key("m", "prompt", {"temperature": 0}))
+        self.assertNotEqual(base, LLMCache.make_key("other", "prompt", {"temperature": 0}))
+        self.assertNotEqual(base, LLMCache.make_key("m", "prompt!", {"temperature": 0}))
+        self.assertNotEqual(base, LLMCache.make_key("m", "prompt", {"temperature": 0.5}))
+    
+    def test_hit_replays_original_chunks(self):
+        """Test that a cached response streams the same chunks without a model call"""
+        first = list(self.cache.stream("m", "p", None, self.live(["a", "b", "c"])))
+        second = list(self.cache.stream("m", "p", None, self.live(["x"])))
+        
+        self.assertEqual(first, ["a", "b", "c"])
+        self.assertEqual(second, ["a", "b", "c"])
+        self.assertEqual(self.calls, 1)
+    
+    def test_persists_across_instances(self):
+        """Test that entries survive reopening the database"""
+        list(self.cache.stream("m", "p", None, self.live(["a"])))
+        reopened = LLMCache(path=self.path, deterministic_only=False)
+        self.assertEqual(list(reopened.stream("m", "p", None, self.live(["x"]))), ["a"])
+        reopened.close()
+    
+    def test_errors_and_cancelled_streams_not_stored(self):
+        """Test that failed or cancelled responses are never replayed"""
+        def failing():
+            yield "partial"
+            raise LLMError("boom")
+        with self.assertRaises(LLMError):
+            list(self.cache.stream("m", "p", None, failing))
+        cancel_event = threading.Event()
+        cancel_event.set()
+        list(self.cache.stream("m", "q", None, self.live(["partial"]), cancel_event))
+        
+        self.assertIsNone(self.cache.get(LLMCache.make_key("m", "p")))
+        self.assertIsNone(self.cache.get(LLMCache.make_key("m", "q")))
+    
+    def test_stream_closed_early_stores_prefix(self):
+        """Test that a consumer stopping early with the whole answer caches what it read and closes the live stream"""
+        closed = []
+        
+        def generate():
+            try:
+                yield from ["a", "b", "c"]
+            finally:
+                closed.append(True)
+        
+        complete = threading.Event()
+        stream = self.cache.stream("m", "p", None, generate, complete_event=complete)
+        self.assertEqual(next(stream), "a")
+        complete.set()
+        stream.close()
+        
+        self.assertEqual(closed, [True])
+        self.assertEqual(self.cache.get(LLMCache.make_key("m", "p")), ["a"])
+    
+    def test_abandoned_stream_not_stored(self):
+        """Test that a stream closed without being marked complete (consumer error, GC) is not replayed later"""
+        stream = self.cache.stream("m", "p", None, self.live(["a", "b"]), complete_event=threading.Event())
+        next(stream)
+        stream.close()
+        stream = self.cache.stream("m", "q", None, self.live(["a", "b"]))
+        next(stream)
+        del stream
+        
+        self.assertIsNone(self.cache.get(LLMCache.make_key("m", "p")))
+        self.assertIsNone(self.cache.get(LLMCache.make_key("m", "q")))
+    
+    def test_sampled_requests_not_cached_by_default(self):
+        cache = LLMCache(path=self.path)
+        list(cache.stream("m", "p", None, self.live(["a"])))
+        list(cache.stream("m", "p", {"temperature": 0.8}, self.live(["a"])))
+        list(cache.stream("m", "p", {"temperature": 0.8}, self.live(["a"])))
+        self.assertEqual(self.calls, 3)
+        cache.close()
+    
+    def test_deterministic_only(self):
+        """Test that deterministic-only mode skips sampled requests"""
+        cache = LLMCache(path=self.path, deterministic_only=True)
+        list(cache.stream("m", "p", {"temperature": 0.7}, self.live(["a"])))
+        list(cache.stream("m", "p", {"temperature": 0.7}, self.live(["a"])))
+        list(cache.stream("m", "p", {"temperature": 0}, self.live(["a"])))
+        list(cache.stream("m", "p", {"temperature": 0}, self.live(["a"])))
+        
+        self.assertEqual(self.calls, 3)
+        cache.close()
+    
+    def test_disabled_bypasses_cache(self):
+        """Test that a disabled cache always calls the model"""
+        self.cache.enabled = False
+        list(self.cache.stream("m", "p", None, self.live(["a"])))
+        list(self.cache.stream("m", "p", None, self.live(["a"])))
+        self.assertEqual(self.calls, 2)
+    
+    def test_lru_eviction(self):
+        """Test that least recently used entries are evicted over budget"""
+        cache = LLMCache(path=self.path, max_size_mb=250 / (1024 * 1024))
+        for name in ("one", "two"):
+            cache.put(LLMCache.make_key("m", name), "m", ["x" * 100])
+        cache.get(LLMCache.make_key("m", "one"))
+        cache.put(LLMCache.make_key("m", "three"), "m", ["x" * 100])
+        
+        self.assertIsNotNone(cache.get(LLMCache.make_key("m", "one")))
+        self.assertIsNone(cache.get(LLMCache.make_key("m", "two")))
+        self.assertIsNotNone(cache.get(LLMCache.make_key("m", "three")))
+        cache.close()
+
+
+
+class TestEarlyStopCaching(unittest.TestCase):
+    
+    def test_early_stopped_coder_response_cached(self):
+        """Test that the coder response cut at its code block is cached, and replayed on the next run"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = LLMCache(path=os.path.join(tmpdir, "cache.sqlite"), deterministic_only=False)
+            coder_response = "```python\nprint('hello')\n```\n" + "Explanation.\n" * 50
+            with FakeOllamaServer({"thinker": ["Greet."], "coder": [coder_response]}, token_rate=0, latency=0) as server:
+                for _ in range(2):
+                    loop = make_loop(self)
+                    loop.models['thinker'] = LLMInterface("thinker", base_url=server.url)
+                    loop.models['coder'] = LLMInterface("coder", base_url=server.url, cache=cache)
+                    self.assertEqual(loop.run_task("greet", max_iters=1, candidates=1), "print('hello')")
+                coder_requests = [payload for path, payload in server.requests if payload["model"] == "coder"]
+            cache.close()
+        self.assertEqual(len(coder_requests), 1)
+
+    def test_first_spec_cached_by_default(self):
+        """Test that with the default deterministic_only cache, a task run again replays its first spec"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = LLMCache(path=os.path.join(tmpdir, "cache.sqlite"))
+            with FakeOllamaServer({"thinker": ["Greet."], "coder": ["print('hello')\n"]}, token_rate=0, latency=0) as server:
+                for _ in range(2):
+                    loop = make_loop(self)
+                    loop.models['thinker'] = LLMInterface("thinker", base_url=server.url, cache=cache)
+                    loop.models['coder'] = LLMInterface("coder", base_url=server.url, cache=cache)
+                    self.assertEqual(loop.run_task("greet", max_iters=1, candidates=1), "print('hello')")
+                thinker_requests = [payload for path, payload in server.requests if payload["model"] == "thinker"]
+                coder_requests = [payload for path, payload in server.requests if payload["model"] == "coder"]
+            cache.close()
+        self.assertEqual(len(thinker_requests), 1)
+        self.assertEqual(thinker_requests[0]["options"]["temperature"], 0)
+        self.assertEqual(len(coder_requests), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import threading
+import unittest
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.llm_cache import LLMCache
+from core.llm_interface import LLMInterface, GenerationContext
+from tests.test_repair_loop import make_loop
+
+
+class TestLLMInterface(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOllamaServer({"fake": ["one two three"]}, token_rate=0, latency=0).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def payload(self, index):
+        return self.server.requests[index][1]
+
+    def test_default_options_and_keep_alive(self):
+        """Test that configured options are sent and per-call options win"""
+        client = LLMInterface("fake", base_url=self.server.url, keep_alive="30m",
+                              options={"num_ctx": 8192, "temperature": 0.2})
+        self.assertEqual("".join(client.generate("hi", options={"temperature": 0.9, "seed": 1})), "one two three")
+        payload = self.payload(0)
+        self.assertEqual(payload["keep_alive"], "30m")
+        self.assertEqual(payload["options"], {"num_ctx": 8192, "temperature": 0.9, "seed": 1})
+
+    def test_context_is_sent_back(self):
+        """Test that the returned context continues the next request"""
+        client = LLMInterface("fake", base_url=self.server.url)
+        context = GenerationContext()
+        list(client.generate("first prompt", system="You are a test.", context=context))
+        self.assertEqual(self.payload(0)["system"], "You are a test.")
+        self.assertNotIn("context", self.payload(0))
+        returned = context.tokens
+        self.assertTrue(returned)
+
+        list(client.generate("follow up", context=context))
+        self.assertEqual(self.payload(1)["context"], returned)
+        self.assertGreater(len(context.tokens), len(returned))
+
+    def test_oversized_context_starts_fresh(self):
+        """Test that a history past max_tokens is not sent"""
+        client = LLMInterface("fake", base_url=self.server.url)
+        context = GenerationContext(max_tokens=3)
+        list(client.generate("a long first prompt here", context=context))
+        self.assertFalse(context.usable())
+        list(client.generate("again", context=context))
+        self.assertNotIn("context", self.payload(1))
+
+    def test_cancelled_stream_drops_context(self):
+        """Test that an incomplete response doesn't leave a stale context"""
+        client = LLMInterface("fake", base_url=self.server.url)
+        context = GenerationContext()
+        context.update([1, 2, 3])
+        cancel_event = threading.Event()
+        cancel_event.set()
+        list(client.generate("hi", context=context, cancel_event=cancel_event))
+        self.assertIsNone(context.tokens)
+
+    def test_cache_key_covers_system_and_context(self):
+        """Test that system prompt and context are part of the cache key"""
+        base = LLMCache.make_key("m", "prompt", {})
+        self.assertEqual(base, LLMCache.make_key("m", "prompt", {}, system=None, context=None))
+        self.assertNotEqual(base, LLMCache.make_key("m", "prompt", {}, system="sys"))
+        self.assertNotEqual(base, LLMCache.make_key("m", "prompt", {}, context=[1, 2]))
+
+
+class TestRepairLoopContextReuse(unittest.TestCase):
+
+    def test_thinker_followup_skips_prefix(self):
+        """Test that later thinker turns continue the conversation instead of resending the prefix"""
+        with FakeOllamaServer({"thinker": ["Print hello."], "coder": ["raise SystemExit(1)\n", "print('hello')\n"]},
+                              token_rate=0, latency=0) as server:
+            loop = make_loop(self)
+            loop.role_configs['thinker'] = {"name": "thinker", "reuse_context": True}
+            loop.role_configs['coder'] = {"name": "coder", "reuse_context": True}
+            loop.models['thinker'] = LLMInterface("thinker", base_url=server.url)
+            loop.models['coder'] = LLMInterface("coder", base_url=server.url)
+            loop._sleep = lambda seconds, reason: None
+
+            code = loop.run_task("greet the user", max_iters=2, candidates=1)
+
+        self.assertEqual(code, "print('hello')")
+        thinker = [payload for path, payload in server.requests if payload["model"] == "thinker"]
+        coder = [payload for path, payload in server.requests if payload["model"] == "coder"]
+        self.assertIn("Task: greet the user", thinker[0]["prompt"])
+        self.assertIn("system", thinker[0])
+        self.assertNotIn("Task:", thinker[1]["prompt"])
+        self.assertNotIn("system", thinker[1])
+        self.assertIn("context", thinker[1])
+        # The coder's previous answer is in its context; the code isn't resent
+        self.assertIn("context", coder[1])
+        self.assertNotIn("Previous code", coder[1]["prompt"])
+
+    def test_coder_context_reused_with_early_stop(self):
+        """Test that a coder reusing its context reads up to the final message even with early_stop on"""
+        explanation = "This program does what was asked.\n" * 20
+        responses = ["```python\nraise SystemExit(1)\n```\n" + explanation, "```python\nprint('hello')\n```\n" + explanation]
+        with FakeOllamaServer({"thinker": ["Print hello."], "coder": responses}, token_rate=0, latency=0) as server:
+            loop = make_loop(self)
+            loop.early_stop = True
+            loop.role_configs['coder'] = {"name": "coder", "reuse_context": True}
+            loop.models['thinker'] = LLMInterface("thinker", base_url=server.url)
+            loop.models['coder'] = LLMInterface("coder", base_url=server.url)
+            loop._sleep = lambda seconds, reason: None
+
+            code = loop.run_task("greet the user", max_iters=2, candidates=1)
+
+        self.assertEqual(code, "print('hello')")
+        coder = [payload for path, payload in server.requests if payload["model"] == "coder"]
+        self.assertIn("context", coder[1])
+        self.assertNotIn("Previous code", coder[1]["prompt"])
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def test_warm_up_loads_each_model_once(self):
+        """Test that warm-up sends one empty request per distinct model, with its keep_alive and options"""
+        with FakeOllamaServer({"mini": ["Print hello."], "coder": ["print('hello')\n"]}, token_rate=0, latency=0) as server:
+            loop = make_loop(self)
+            mini = LLMInterface("mini", base_url=server.url, keep_alive="30m", options={"num_ctx": 8192})
+            loop.models['thinker'] = loop.models['patcher'] = mini
+            loop.models['coder'] = LLMInterface("coder", base_url=server.url, keep_alive="30m")
+            for thread in loop.warm_up(['thinker', 'patcher', 'coder']):
+                thread.join(5)
+
+            loads = sorted((payload["model"], payload["prompt"], payload["keep_alive"]) for path, payload in server.requests)
+            self.assertEqual(loads, [("coder", "", "30m"), ("mini", "", "30m")])
+            self.assertEqual(server.requests[[p["model"] for _, p in server.requests].index("mini")][1]["options"],
+                             {"num_ctx": 8192})
+
+            # Loading doesn't use up scripted responses, and the run reports time to first token
+            loop._sleep = lambda seconds, reason: None
+            code = loop.run_task("greet the user", max_iters=1, candidates=1)
+
+        self.assertEqual(code, "print('hello')")
+        self.assertEqual(set(loop.last_run_stats['ttft']), {"thinker", "coder"})
+
+
+if __name__ == "__main__":
+    unittest.main()
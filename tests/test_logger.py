@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from core.logger import Logger
+
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="laph-logger-")
+        self.path = os.path.join(self.directory, "laph.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read(self, path=None):
+        with open(path or self.path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_lines_written_after_flush(self):
+        """Test that queued lines reach the file in order"""
+        logger = Logger(self.path)
+        for index in range(100):
+            logger.log(f"line {index}")
+        self.assertTrue(logger.flush())
+        lines = self.read().splitlines()
+        self.assertEqual(len(lines), 100)
+        self.assertTrue(lines[0].endswith("line 0"))
+        self.assertTrue(lines[-1].endswith("line 99"))
+        logger.close()
+
+    def test_close_flushes_and_stops(self):
+        """Test that close writes pending lines and later logs are ignored"""
+        logger = Logger(self.path, flush_interval=10)
+        logger.log("before close")
+        logger.close()
+        logger.log("after close")
+        self.assertIn("before close", self.read())
+        self.assertNotIn("after close", self.read())
+        self.assertFalse(logger._writer.is_alive())
+
+    def test_slow_callback_does_not_block(self):
+        """Test that callbacks run off the logging thread"""
+        logger = Logger(self.path)
+        release = threading.Event()
+        received = []
+
+        def slow(message):
+            release.wait(5)
+            received.append(message)
+
+        logger.register_callback(slow)
+        start = time.monotonic()
+        logger.log("first")
+        logger.log("second")
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        release.set()
+        self.assertTrue(logger.flush())
+        self.assertEqual(len(received), 2)
+        self.assertTrue(received[0].endswith("first\n"))
+        logger.close()
+
+    def test_rotation_by_size(self):
+        """Test that the file rotates once it reaches max_bytes"""
+        logger = Logger(self.path, max_bytes=200, backup_count=2)
+        for index in range(30):
+            logger.log(f"message number {index:03d}")
+            logger.flush()
+        logger.close()
+
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertTrue(os.path.exists(self.path + ".2"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertLessEqual(os.path.getsize(self.path + ".1"), 200 + 64)
+        self.assertIn("message number 029", self.read())
+
+    def test_long_messages_truncated(self):
+        """Test that oversized messages keep only head and tail"""
+        logger = Logger(self.path, max_message_chars=100)
+        logger.log("A" * 50 + "B" * 1000 + "C" * 50)
+        logger.close()
+        content = self.read()
+        self.assertIn("A" * 50, content)
+        self.assertIn("C" * 50, content)
+        self.assertIn("[1000 chars truncated]", content)
+
+    def test_clear(self):
+        """Test that clear empties the file"""
+        logger = Logger(self.path)
+        logger.log("old")
+        logger.clear()
+        logger.log("new")
+        logger.close()
+        content = self.read()
+        self.assertNotIn("old", content)
+        self.assertIn("new", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
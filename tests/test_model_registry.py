@@ -0,0 +1,43 @@
+import unittest
+from core.model_registry import ModelRegistry
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.registry = ModelRegistry(
+            {'thinker': 'mini', 'patcher': 'mini', 'coder': 'coder'},
+            {'thinker': {'name': 'small'}, 'patcher': {'name': 'small'}, 'coder': {'name': 'big'}},
+            self.create
+        )
+
+    def create(self, config):
+        self.created.append(config['name'])
+        return object()
+
+    def test_clients_created_on_first_use(self):
+        """Test that no client exists until a role is used"""
+        self.assertEqual(self.created, [])
+        self.assertEqual(list(self.registry), ['thinker', 'patcher', 'coder'])
+        self.assertFalse(self.registry.loaded('coder'))
+        self.registry['coder']
+        self.assertEqual(self.created, ['big'])
+        self.assertTrue(self.registry.loaded('coder'))
+
+    def test_roles_share_a_section_client(self):
+        self.assertIs(self.registry['thinker'], self.registry['patcher'])
+        self.assertEqual(self.created, ['small'])
+
+    def test_assigned_client_replaces_configured_one(self):
+        """Test that assigning a role never creates the configured client"""
+        scripted = object()
+        self.registry['coder'] = scripted
+        self.assertIs(self.registry['coder'], scripted)
+        self.assertEqual(self.created, [])
+        del self.registry['coder']
+        self.assertIsNot(self.registry['coder'], scripted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import threading
+import time
+import unittest
+from benchmarks.fake_ollama import FakeOllamaServer
+from core.llm_interface import LLMInterface
+from core.model_scheduler import ModelScheduler, ScheduledModel
+
+
+def cancelled():
+    event = threading.Event()
+    event.set()
+    return event
+
+
+class TestModelScheduler(unittest.TestCase):
+
+    def acquire_later(self, scheduler, model, admitted):
+        def run():
+            scheduler.acquire(model)
+            admitted.append(model)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_evicts_idle_model_at_capacity(self):
+        scheduler = ModelScheduler(max_resident=1, base_url=None)
+        scheduler.acquire("a")
+        scheduler.release("a")
+        scheduler.acquire("b")
+        self.assertEqual(list(scheduler.resident), ["b"])
+        self.assertEqual((scheduler.loads, scheduler.evictions), (2, 1))
+
+    def test_waits_while_resident_model_busy(self):
+        """Test that a model is not swapped in while requests for the resident one run"""
+        scheduler = ModelScheduler(max_resident=1, base_url=None)
+        scheduler.acquire("a")
+        admitted = []
+        thread = self.acquire_later(scheduler, "b", admitted)
+        time.sleep(0.1)
+        self.assertEqual(admitted, [])
+        # The resident model keeps serving new requests meanwhile
+        self.assertTrue(scheduler.acquire("a"))
+        scheduler.release("a")
+        scheduler.release("a")
+        thread.join(1)
+        self.assertEqual(admitted, ["b"])
+
+    def test_max_streak_makes_way(self):
+        """Test that a resident model stops admitting after max_streak requests while another waits"""
+        scheduler = ModelScheduler(max_resident=1, max_streak=2, base_url=None)
+        scheduler.acquire("a")
+        admitted = []
+        thread = self.acquire_later(scheduler, "b", admitted)
+        time.sleep(0.1)
+        self.assertTrue(scheduler.acquire("a"))
+        self.assertTrue(scheduler.acquire("a"))
+        self.assertFalse(scheduler.acquire("a", cancel_event=cancelled()))
+        for _ in range(3):
+            scheduler.release("a")
+        thread.join(1)
+        self.assertEqual(admitted, ["b"])
+
+    def test_max_wait_makes_way(self):
+        scheduler = ModelScheduler(max_resident=1, max_wait=0.05, base_url=None)
+        scheduler.acquire("a")
+        admitted = []
+        thread = self.acquire_later(scheduler, "b", admitted)
+        time.sleep(0.1)
+        self.assertFalse(scheduler.acquire("a", cancel_event=cancelled()))
+        scheduler.release("a")
+        thread.join(1)
+        self.assertEqual(admitted, ["b"])
+
+    def test_most_pending_requests_load_first(self):
+        """Test that the model with the larger group of waiting requests gets the free slot"""
+        scheduler = ModelScheduler(max_resident=1, base_url=None)
+        scheduler.acquire("a")
+        admitted = []
+        threads = [self.acquire_later(scheduler, "b", admitted)]
+        time.sleep(0.05)
+        threads += [self.acquire_later(scheduler, "c", admitted) for _ in range(2)]
+        time.sleep(0.1)
+        scheduler.release("a")
+        time.sleep(0.1)
+        self.assertEqual(admitted, ["c", "c"])
+        scheduler.release("c")
+        scheduler.release("c")
+        for thread in threads:
+            thread.join(1)
+        self.assertEqual(admitted, ["c", "c", "b"])
+
+
+class TestSchedulerWithServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOllamaServer({"a": ["from a"], "b": ["from b"]}, token_rate=0, latency=0.2,
+                                       load_time=0.05, max_loaded=1).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_refresh_and_unload(self):
+        """Test that the resident set follows /api/ps and evicted models are unloaded"""
+        scheduler = ModelScheduler(max_resident=1, base_url=self.server.url, unload=True)
+        scheduler.acquire("a")
+        self.server.ensure_loaded("a")
+        scheduler.release("a")
+        scheduler.refresh(force=True)
+        self.assertEqual(list(scheduler.resident), ["a"])
+
+        scheduler.acquire("b")
+        scheduler.release("b")
+        self.assertEqual(self.server.unloads, 1)
+        self.assertNotIn("a", self.server.loaded)
+
+    def test_refresh_only_on_residency_miss(self):
+        """Test that requests for a resident model don't query /api/ps"""
+        scheduler = ModelScheduler(max_resident=1, base_url=self.server.url, refresh_interval=0)
+        refreshes = []
+        refresh = scheduler.refresh
+        scheduler.refresh = lambda force=False: (refreshes.append(force), refresh(force))
+        scheduler.acquire("a")
+        scheduler.release("a")
+        self.assertEqual(len(refreshes), 1)
+        for _ in range(3):
+            scheduler.acquire("a")
+            scheduler.release("a")
+        self.assertEqual(len(refreshes), 1)
+
+    def test_foreign_models_left_alone(self):
+        """Test that models other clients loaded take up slots but are never evicted or unloaded"""
+        self.server.ensure_loaded("a")
+        scheduler = ModelScheduler(max_resident=2, base_url=self.server.url, unload=True)
+        scheduler.refresh(force=True)
+        self.assertEqual(list(scheduler.resident), [])
+        self.assertEqual(scheduler.foreign, {"a"})
+
+        scheduler.acquire("b")
+        scheduler.release("b")
+        # One slot is left for this process, so loading c evicts b rather than a
+        scheduler.acquire("c")
+        scheduler.release("c")
+        self.assertEqual(list(scheduler.resident), ["c"])
+        self.assertEqual(scheduler.evictions, 1)
+        unloaded = [payload["model"] for _, payload in self.server.requests if payload.get("keep_alive") == 0]
+        self.assertEqual(unloaded, ["b"])
+        self.assertIn("a", self.server.loaded)
+
+    def test_concurrent_requests_grouped_by_model(self):
+        """Test that interleaved requests for two models load each model once"""
+        scheduler = ModelScheduler(max_resident=1, base_url=self.server.url, refresh_interval=0)
+        models = {name: ScheduledModel(LLMInterface(name, base_url=self.server.url), scheduler) for name in "ab"}
+        outputs = []
+
+        def call(name):
+            outputs.append("".join(models[name].generate("hi")))
+
+        threads = [threading.Thread(target=call, args=(name,)) for name in "abababab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(sorted(outputs), ["from a"] * 4 + ["from b"] * 4)
+        self.assertEqual(self.server.loads, 2)
+        self.assertEqual(scheduler.loads, 2)
+
+    def test_cancelled_while_waiting(self):
+        """Test that a request cancelled before admission yields nothing"""
+        scheduler = ModelScheduler(max_resident=1, base_url=None)
+        scheduler.acquire("a")
+        model = ScheduledModel(LLMInterface("b", base_url=self.server.url), scheduler)
+        self.assertEqual(list(model.generate("hi", cancel_event=cancelled())), [])
+        self.assertNotIn("b", scheduler.resident)
+
+
+if __name__ == "__main__":
+    unittest.main()
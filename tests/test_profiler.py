@@ -0,0 +1,75 @@
+import unittest
+from core.profiler import Measurement, Profiler
+from core.runner import CodeRunner
+
+SLOW = """
+def total(n):
+    return sum(i * i for i in range(n))
+
+data = [list(range(1000)) for _ in range(100)]
+print(total(int(input())))
+"""
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = CodeRunner()
+        self.profiler = Profiler(repeats=2, min_improvement=0.1, top_n=3)
+
+    def test_profile_finds_hotspots(self):
+        report = self.profiler.profile(self.runner, SLOW, stdin="200000\n")
+        self.assertIsNotNone(report)
+        self.assertLessEqual(len(report.hotspots), 3)
+        self.assertEqual(report.hotspots[0].function, "<genexpr>")
+        self.assertEqual(report.allocations[0].line, 5)
+        self.assertGreater(report.peak_traced_mb, 1)
+        text = Profiler.describe(self.profiler.measure(self.runner, SLOW, stdin="10\n"), report)
+        self.assertIn("<genexpr> (line 3)", text)
+        self.assertIn("data = [list(range(1000))", text)
+
+    def test_profile_of_unfinished_program(self):
+        """Test that a program killed under the profiler gives no report, while one that raises still does"""
+        runner = CodeRunner(timeout=0.5)
+        self.assertIsNone(self.profiler.profile(runner, "import time\ntime.sleep(5)\n"))
+        report = self.profiler.profile(runner, "def f():\n    raise ValueError()\nf()\n")
+        self.assertIn("f", [spot.function for spot in report.hotspots])
+
+    def test_measure_keeps_output_and_bypasses_memo(self):
+        measurement = self.profiler.measure(self.runner, SLOW, stdin="10\n")
+        self.assertEqual(measurement.stdout, "285\n")
+        self.assertGreater(measurement.wall_time, 0)
+        self.assertIsNone(self.runner.lookup(SLOW, "10\n"))
+        self.assertIsNone(self.profiler.measure(self.runner, "raise SystemExit(1)\n"))
+        self.assertIsNone(self.profiler.measure(self.runner, "import random\nprint(random.random())\n"))
+
+    def test_compare(self):
+        baseline = Measurement(1.0, 50.0, "42\n")
+        self.assertTrue(self.profiler.compare(baseline, Measurement(0.5, 50.0, "42"))[0])
+        self.assertTrue(self.profiler.compare(baseline, Measurement(1.05, 30.0, "42\n"))[0])
+        improved, reason = self.profiler.compare(baseline, Measurement(0.95, 50.0, "42\n"))
+        self.assertFalse(improved)
+        self.assertIn("no measurable improvement", reason)
+        improved, reason = self.profiler.compare(baseline, Measurement(0.5, 80.0, "42\n"))
+        self.assertFalse(improved)
+        self.assertIn("worse", reason)
+        improved, reason = self.profiler.compare(baseline, Measurement(0.1, 50.0, "43\n"))
+        self.assertFalse(improved)
+        self.assertIn("output differs", reason)
+        self.assertFalse(self.profiler.compare(baseline, None)[0])
+
+    def test_compare_ignores_noise(self):
+        """Test that changes below the absolute floor or the spread between repeats don't count"""
+        improved, reason = self.profiler.compare(Measurement(0.020, 20.0, "42"), Measurement(0.015, 20.0, "42"))
+        self.assertFalse(improved)
+        self.assertIn("no measurable improvement", reason)
+        self.assertFalse(self.profiler.compare(Measurement(1.0, 20.0, "42", wall_spread=0.3),
+                                               Measurement(0.8, 20.0, "42"))[0])
+        self.assertFalse(self.profiler.compare(Measurement(0.020, 20.0, "42"), Measurement(0.030, 20.0, "42"))[0])
+        self.assertTrue(self.profiler.compare(Measurement(1.0, 20.0, "42", wall_spread=0.1),
+                                              Measurement(0.8, 20.0, "42"))[0])
+        self.assertFalse(self.profiler.compare(Measurement(1.0, 20.0, "42"), Measurement(1.0, 19.0, "42"))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
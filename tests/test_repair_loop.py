@@ -0,0 +1,460 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from core.errors import LLMConnectionError
+from core.fix_store import FixStore
+from core.logger import Logger
+from core.profiler import Profiler
+from core.repair_loop import RepairLoop
+
+
+def make_loop(test, factory=RepairLoop):
+    """
+    Build a RepairLoop whose log, response cache, fix store and traces live
+    in a temporary directory removed after the test.
+
+    Args:
+        test: The running TestCase (for cleanups)
+        factory: Called with the Logger to build the loop
+    """
+    directory = tempfile.mkdtemp(prefix="laph-test-")
+    test.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+    logger = Logger(os.path.join(directory, "laph.log"))
+    test.addCleanup(logger.close)
+    loop = factory(logger)
+    loop.cache.path = os.path.join(directory, "llm_cache.sqlite")
+    loop.fixes.path = os.path.join(directory, "fixes.sqlite")
+    loop.tracer.output_dir = os.path.join(directory, "traces")
+    return loop
+
+
+class ScriptedModel:
+    """Stand-in for LLMInterface that streams canned responses."""
+    
+    model_name = "scripted"
+    
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+        self.prompts = []
+        self.lock = threading.Lock()
+    
+    def generate(self, prompt, options=None, cancel_event=None, **kwargs):
+        with self.lock:
+            self.calls.append(options)
+            self.prompts.append(prompt)
+            index = len(self.calls) - 1
+        response = self.responses(index, options) if callable(self.responses) else self.responses
+        for line in response.splitlines(keepends=True):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield line
+
+
+
+class ContextModel(ScriptedModel):
+    """ScriptedModel that fills in the context like Ollama's final message does"""
+    
+    def __init__(self, responses):
+        super().__init__(responses)
+        self.contexts = []
+    
+    def generate(self, prompt, options=None, cancel_event=None, context=None, **kwargs):
+        self.contexts.append(context.take() if context is not None else None)
+        yield from super().generate(prompt, options, cancel_event, **kwargs)
+        if context is not None:
+            context.update([len(self.calls)])
+
+class TestRepairLoop(unittest.TestCase):
+    
+    def setUp(self):
+        self.loop = make_loop(self)
+        self.loop.fixes = FixStore(enabled=False)
+        self.loop.models['thinker'] = ScriptedModel("Print a greeting.")
+    
+    def test_single_candidate_success(self):
+        """Test the classic loop returns the first working program"""
+        self.loop.models['coder'] = ScriptedModel("print('hello')\n")
+        code = self.loop.run_task("greet", max_iters=2, candidates=1)
+        self.assertEqual(code, "print('hello')")
+    
+    def test_coder_stream_stops_after_code_block(self):
+        """Test that the coder stream is closed once a valid code block is complete"""
+        coder = ScriptedModel("```python\nprint('hello')\n```\n" + "Explanation line.\n" * 100)
+        yielded = []
+        generate = coder.generate
+        
+        def counting(*args, **kwargs):
+            for line in generate(*args, **kwargs):
+                yielded.append(line)
+                yield line
+        
+        coder.generate = counting
+        self.loop.models['coder'] = coder
+        code = self.loop.run_task("greet", max_iters=1, candidates=1)
+        
+        self.assertEqual(code, "print('hello')")
+        self.assertEqual(len(yielded), 3)
+    
+    def test_best_of_n_returns_working_candidate(self):
+        """Test that best-of-N keeps the candidate that exits 0"""
+        def responses(index, options):
+            if options["seed"] % 1000 == 2:
+                return "print('winner')\n"
+            return "raise SystemExit(3)\n"
+        
+        coder = ScriptedModel(responses)
+        self.loop.models['coder'] = coder
+        code = self.loop.run_task("greet", max_iters=1, candidates=3)
+        
+        self.assertEqual(code, "print('winner')")
+        seeds = sorted(options["seed"] for options in coder.calls)
+        self.assertEqual(seeds, [0, 1, 2])
+    
+    def test_best_of_n_all_fail(self):
+        """Test that best-of-N reports failure when no candidate works"""
+        self.loop.models['coder'] = ScriptedModel("raise SystemExit(1)\n")
+        code = self.loop.run_task("greet", max_iters=1, candidates=2)
+        self.assertIsNone(code)
+
+    
+    def test_repeated_attempt_changes_sampling(self):
+        """Test that a repeated failing program escalates sampling and is not re-run"""
+        coder = ScriptedModel("raise SystemExit(2)\n")
+        self.loop.models['coder'] = coder
+        code = self.loop.run_task("greet", max_iters=3, candidates=1)
+        
+        self.assertIsNone(code)
+        self.assertIsNone(coder.calls[1])
+        self.assertGreater(coder.calls[2]["temperature"], 0.8)
+        self.assertIn("already failed in iteration 1", coder.prompts[2])
+        self.assertIsNotNone(self.loop.runner.lookup("raise SystemExit(2)"))
+    
+    def test_escalation_ends_with_new_program(self):
+        """Test that sampling goes back to normal once the coder writes a different program"""
+        coder = ScriptedModel(lambda index, options: "raise SystemExit(3)\n" if index >= 2 else "raise SystemExit(2)\n")
+        self.loop.models['coder'] = coder
+        self.loop.run_task("greet", max_iters=4, candidates=1)
+        
+        self.assertGreater(coder.calls[2]["temperature"], 0.8)
+        self.assertIsNone(coder.calls[3])
+    
+    def test_memory_limit_explained_to_models(self):
+        """Test that a program killed by the memory limit is reported as such in the next prompt and the stats"""
+        self.loop.runner.memory_limit_mb = 64
+        thinker = self.loop.models['thinker']
+        self.loop.models['coder'] = ScriptedModel(
+            lambda index, options: "data = b'x' * (256 * 1024 * 1024)\n" if index == 0 else "print('small')\n"
+        )
+        code = self.loop.run_task("allocate", max_iters=2, candidates=1)
+        
+        self.assertEqual(code, "print('small')")
+        self.assertIn("[Resource limit] Ran out of memory", "".join(thinker.prompts))
+        resources = self.loop.last_run_stats['resources']
+        self.assertEqual((resources['runs'], resources['kills']), (2, {'memory_limit': 1}))
+        self.assertIsNone(self.loop.last_run_stats['usage']['kill_reason'])
+    
+    def test_program_output_streamed(self):
+        """Test that the program's output reaches stream_callback under the "runner" source"""
+        self.loop.models['coder'] = ScriptedModel("print('hello')\n")
+        streamed = []
+        code = self.loop.run_task("greet", max_iters=1, candidates=1,
+                                  stream_callback=lambda chunk, source: streamed.append((chunk, source)))
+        
+        self.assertEqual(code, "print('hello')")
+        self.assertEqual("".join(chunk for chunk, source in streamed if source == "runner"), "hello\n")
+
+
+class TestRepairRouting(unittest.TestCase):
+    
+    def setUp(self):
+        self.loop = make_loop(self)
+        self.loop.fixes = FixStore(enabled=False)
+        self.loop._sleep = lambda seconds, reason: None
+        self.thinker = self.loop.models['thinker'] = ScriptedModel("Print the total.")
+        self.patcher = self.loop.models['patcher'] = ScriptedModel("total = 3\nprint(total)\n")
+    
+    def test_name_error_skips_thinker(self):
+        """Test that a NameError is fixed by the patcher without a second thinker call"""
+        coder = self.loop.models['coder'] = ScriptedModel("total = 3\nprint(totl)\n")
+        code = self.loop.run_task("print a total", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "total = 3\nprint(total)")
+        self.assertEqual((len(self.thinker.calls), len(coder.calls), len(self.patcher.calls)), (1, 1, 1))
+        self.assertIn("print(totl)", self.patcher.prompts[0])
+        self.assertIn("NameError", self.patcher.prompts[0])
+        self.assertGreater(self.loop.last_run_stats['timings']['patcher'], 0)
+    
+    def test_logic_error_takes_full_path(self):
+        """Test that a logic error goes back through the thinker"""
+        self.loop.models['coder'] = ScriptedModel(
+            lambda index, options: "raise ValueError('bad total')\n" if index == 0 else "print(3)\n"
+        )
+        code = self.loop.run_task("print a total", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "print(3)")
+        self.assertEqual(len(self.thinker.calls), 2)
+        self.assertEqual(self.patcher.calls, [])
+    
+    def test_patcher_gets_whole_program(self):
+        """Test that the patcher's previous code is never trimmed to the prompt budget"""
+        filler = "".join(f"value_{index} = {index}\n" for index in range(3000))
+        self.loop.models['coder'] = ScriptedModel(filler + "print(totl)\n")
+        self.loop.run_task("sum", max_iters=2, candidates=1)
+        
+        self.assertIn(filler, self.patcher.prompts[0])
+        self.assertNotIn("lines omitted", self.patcher.prompts[0])
+
+    def test_patcher_misses_fall_back_to_thinker(self):
+        """Test that the full path runs again once the fast attempts are used up"""
+        self.loop.router.max_fast_attempts = 2
+        self.loop.models['coder'] = ScriptedModel("print(totl)\n")
+        self.patcher.responses = lambda index, options: f"print(totl + {index})\n"
+        self.loop.run_task("print a total", max_iters=4, candidates=1)
+        
+        self.assertEqual(len(self.patcher.calls), 2)
+        self.assertEqual(len(self.thinker.calls), 2)
+
+    
+    def test_patched_program_resent_to_coder(self):
+        """Test that a coder reusing its context gets the patched program, not its own older answer"""
+        self.loop.role_configs['coder'] = dict(self.loop.role_configs['coder'], reuse_context=True)
+        self.patcher.responses = "total = 3\nraise ValueError('patched program fails')\n"
+        coder = self.loop.models['coder'] = ContextModel(
+            lambda index, options: "total = 3\nprint(totl)\n" if index == 0 else "print(3)\n"
+        )
+        code = self.loop.run_task("print a total", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "print(3)")
+        self.assertEqual(len(self.patcher.calls), 1)
+        self.assertIn("Previous code: total = 3\nraise ValueError('patched program fails')", coder.prompts[1])
+        self.assertIsNone(coder.contexts[1])
+
+
+class TestKnownFixes(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fixes = FixStore(path=os.path.join(self.tmpdir.name, "fixes.sqlite"))
+    
+    def tearDown(self):
+        self.fixes.close()
+        self.tmpdir.cleanup()
+    
+    def make_loop(self, coder_response):
+        loop = make_loop(self)
+        loop.fixes = self.fixes
+        loop._sleep = lambda seconds, reason: None
+        loop.models['thinker'] = ScriptedModel("Print the total.")
+        loop.models['patcher'] = ScriptedModel("total = 3\nprint(total)\n")
+        loop.models['coder'] = ScriptedModel(coder_response)
+        return loop
+    
+    def test_known_fix_replayed_without_model(self):
+        """Test that a failure fixed in an earlier task is fixed again without calling a model"""
+        first = self.make_loop("total = 3\nprint(totl)\n")
+        self.assertEqual(first.run_task("print a total", max_iters=3, candidates=1), "total = 3\nprint(total)")
+        
+        second = self.make_loop("import sys\ntotal = 3\nprint(totl)\n")
+        code = second.run_task("print a total to stdout", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "import sys\ntotal = 3\nprint(total)")
+        self.assertEqual(second.models['patcher'].calls, [])
+        self.assertEqual(second.last_run_stats['fixes_replayed'], 1)
+        self.assertEqual(self.fixes.lookup("NameError: name 'totl' is not defined")[0].hits, 2)
+    
+    def test_different_failure_not_recorded(self):
+        """Test that a change that only swaps one error for another is not stored as a fix"""
+        loop = self.make_loop("total = 3\nprint(totl)\n")
+        loop.models['patcher'] = ScriptedModel("total = 3\nprint(total / 0)\n")
+        loop.run_task("print a total", max_iters=2, candidates=1)
+        
+        self.assertEqual(self.fixes.lookup("NameError: name 'totl' is not defined"), [])
+    
+    def test_known_fixes_in_prompt(self):
+        """Test that fixes for the same error on another line are shown to the patcher"""
+        first = self.make_loop("total = 3\nprint(totl)\n")
+        first.run_task("print a total", max_iters=3, candidates=1)
+        
+        second = self.make_loop("total = 3\nprint(totl * 2)\n")
+        second.run_task("print twice the total", max_iters=3, candidates=1)
+        
+        prompt = second.models['patcher'].prompts[0]
+        self.assertIn("Fixes that resolved this error", prompt)
+        self.assertIn("+print(total)", prompt)
+
+
+
+class FailingModel(ScriptedModel):
+    """ScriptedModel whose first `failures` calls fail like an unreachable server"""
+    
+    def __init__(self, responses, failures):
+        super().__init__(responses)
+        self.failures = failures
+    
+    def generate(self, prompt, options=None, cancel_event=None, **kwargs):
+        with self.lock:
+            failing = len(self.calls) < self.failures
+            if failing:
+                self.calls.append(options)
+        if failing:
+            raise LLMConnectionError("Cannot connect to Ollama")
+        yield from super().generate(prompt, options, cancel_event, **kwargs)
+
+
+class TestFailuresAndDeadlines(unittest.TestCase):
+    
+    def setUp(self):
+        self.loop = make_loop(self)
+        self.loop.fixes = FixStore(enabled=False)
+        self.loop.retry_config = {'initial_delay': 0.5, 'max_delay': 1, 'exponential_backoff': True, 'max_attempts': 3}
+        self.sleeps = []
+        self.loop._sleep = lambda seconds, reason: self.sleeps.append((seconds, reason))
+        self.loop.models['coder'] = ScriptedModel("print('hello')\n")
+    
+    def test_llm_error_retried_with_backoff(self):
+        self.loop.models['thinker'] = FailingModel("Print a greeting.", failures=1)
+        code = self.loop.run_task("greet", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "print('hello')")
+        self.assertEqual(self.sleeps, [(0.5, "llm_error_backoff")])
+    
+    def test_gives_up_after_max_attempts(self):
+        """Test that a model failing every call ends the task instead of using up the iterations"""
+        thinker = self.loop.models['thinker'] = FailingModel("Print a greeting.", failures=100)
+        code = self.loop.run_task("greet", max_iters=20, candidates=1)
+        
+        self.assertIsNone(code)
+        self.assertEqual(self.loop.last_run_stats['status'], 'llm_error')
+        self.assertEqual(len(thinker.calls), 3)
+        self.assertEqual([seconds for seconds, reason in self.sleeps], [0.5, 1])
+    
+    def test_failed_runs_do_not_sleep(self):
+        self.loop.models['thinker'] = ScriptedModel("Print a greeting.")
+        self.loop.models['coder'] = ScriptedModel(
+            lambda index, options: "raise ValueError('no')\n" if index == 0 else "print('hello')\n"
+        )
+        code = self.loop.run_task("greet", max_iters=3, candidates=1)
+        
+        self.assertEqual(code, "print('hello')")
+        self.assertEqual(self.sleeps, [])
+    
+    def test_deadline_stops_running_program(self):
+        """Test that the task deadline kills a running program and ends the task"""
+        self.loop.models['thinker'] = ScriptedModel("Wait.")
+        self.loop.models['coder'] = ScriptedModel("import time\ntime.sleep(5)\n")
+        start = time.monotonic()
+        code = self.loop.run_task("wait", max_iters=3, candidates=1, deadline=0.5)
+        
+        self.assertIsNone(code)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(self.loop.last_run_stats['status'], 'timeout')
+        self.assertEqual(self.loop.last_run_stats['iterations'], 1)
+        self.assertIsNone(self.loop.runner.lookup("import time\ntime.sleep(5)"))
+    
+    def test_deadline_closes_model_stream(self):
+        def slow(index, options):
+            return "".join(f"line {n}\n" for n in range(1000))
+        
+        thinker = self.loop.models['thinker'] = ScriptedModel(slow)
+        generate = thinker.generate
+        
+        def throttled(*args, **kwargs):
+            for line in generate(*args, **kwargs):
+                time.sleep(0.01)
+                yield line
+        
+        thinker.generate = throttled
+        start = time.monotonic()
+        self.assertIsNone(self.loop.run_task("greet", max_iters=3, candidates=1, deadline=0.3))
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(self.loop.last_run_stats['status'], 'timeout')
+        self.assertEqual(self.loop.models['coder'].calls, [])
+
+
+SLOW_PROGRAM = "import time\ntime.sleep(0.3)\nprint(42)\n"
+
+
+class TestOptimize(unittest.TestCase):
+    
+    def setUp(self):
+        self.loop = make_loop(self)
+        self.loop.fixes = FixStore(enabled=False)
+        self.loop.profiler = Profiler(repeats=1, min_improvement=0.1)
+        self.loop.optimize_config = {'enabled': False, 'max_iters': 2, 'time_budget': 60}
+        self.loop.models['thinker'] = ScriptedModel("Print 42.")
+        # Programs still run (for their output), but their cost is scripted
+        # so the comparison doesn't depend on timing noise
+        self.costs = {}
+        measure = self.loop.profiler.measure
+        
+        def scripted_cost(runner, code, stdin="", cancel_event=None):
+            measurement = measure(runner, code, stdin, cancel_event)
+            if measurement is None:
+                return None
+            return measurement._replace(wall_time=self.costs.get(code.strip(), 0.5), peak_rss_mb=20.0)
+        
+        self.loop.profiler.measure = scripted_cost
+    
+    def coder(self, *versions):
+        coder = ScriptedModel(lambda index, options: versions[min(index, len(versions) - 1)])
+        self.loop.models['coder'] = coder
+        return coder
+    
+    def test_keeps_faster_version(self):
+        coder = self.coder(SLOW_PROGRAM, "print(42)\n", "print(6 * 7)\n")
+        self.costs.update({"print(42)": 0.1, "print(6 * 7)": 0.1})
+        code = self.loop.run_task("print 42", max_iters=1, candidates=1, optimize=True)
+        
+        self.assertEqual(code, "print(42)")
+        self.assertEqual(self.loop.last_run_stats['status'], 'success')
+        stats = self.loop.last_run_stats['optimize']
+        self.assertEqual((stats['attempts'], stats['accepted']), (2, 1))
+        self.assertEqual((stats['baseline']['wall_time'], stats['best']['wall_time']), (0.5, 0.1))
+        self.assertIn("Hottest functions", coder.prompts[1])
+        self.assertIn("time.sleep(0.3)", coder.prompts[1])
+        # The second attempt starts from the kept version; an equally fast one isn't kept
+        self.assertIn("Program:\nprint(42)", coder.prompts[2])
+    
+    def test_rejects_changed_output(self):
+        coder = self.coder(SLOW_PROGRAM, "print(43)\n")
+        code = self.loop.run_task("print 42", max_iters=1, candidates=1, optimize=True)
+        
+        self.assertEqual(code, SLOW_PROGRAM.strip())
+        self.assertEqual(self.loop.last_run_stats['optimize']['accepted'], 0)
+        self.assertIn("not kept: its output differs", coder.prompts[2])
+    
+    def test_rejects_version_failing_acceptance(self):
+        acceptance = {"tests": "def test_answer():\n    assert answer() == 42\n"}
+        slow = "import time\ndef answer():\n    time.sleep(0.3)\n    return 42\nprint(answer())\n"
+        self.coder(slow, "def answer():\n    return 41\nprint(42)\n")
+        self.loop.optimize_config['max_iters'] = 1
+        code = self.loop.run_task("print 42", max_iters=1, candidates=1, acceptance=acceptance, optimize=True)
+        
+        self.assertEqual(code, slow.strip())
+        self.assertEqual(self.loop.last_run_stats['optimize']['accepted'], 0)
+    
+    def test_time_budget(self):
+        coder = self.coder(SLOW_PROGRAM, "print(42)\n")
+        self.loop.optimize_config.update(max_iters=5, time_budget=0.2)
+        start = time.monotonic()
+        code = self.loop.run_task("print 42", max_iters=1, candidates=1, optimize=True)
+        
+        self.assertEqual(code, SLOW_PROGRAM.strip())
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(len(coder.calls), 1)
+    
+    def test_off_by_default(self):
+        coder = self.coder(SLOW_PROGRAM, "print(42)\n")
+        code = self.loop.run_task("print 42", max_iters=1, candidates=1)
+        
+        self.assertEqual(code, SLOW_PROGRAM.strip())
+        self.assertNotIn('optimize', self.loop.last_run_stats)
+        self.assertEqual(len(coder.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
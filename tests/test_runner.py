@@ -1,5 +1,6 @@
 import unittest
-from core.runner import CodeRunner
+import time
+from core.runner import CodeRunner, OutputCapture, format_usage
 
 
 class TestCodeRunner(unittest.TestCase):
@@ -61,6 +62,252 @@ class TestCodeRunner(unittest.TestCase):
         self.assertEqual(exitcode, 0)
         self.assertIn("Hello", stdout)
 
+    
+    def test_cancel_event_stops_process(self):
+        """Test that setting the cancel event kills a running program"""
+        import threading
+        import time
+        
+        cancel_event = threading.Event()
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.monotonic()
+        stdout, stderr, exitcode = self.runner.run_code("import time\ntime.sleep(5)", cancel_event=cancel_event)
+        
+        self.assertEqual(exitcode, -1)
+        self.assertIn("cancelled", stderr)
+        self.assertLess(time.monotonic() - start, 2)
+    
+    def test_timeout_with_cancel_event(self):
+        """Test that the timeout still applies while polling for cancellation"""
+        import threading
+        
+        runner = CodeRunner(timeout=1)
+        stdout, stderr, exitcode = runner.run_code("while True: pass", cancel_event=threading.Event())
+        
+        self.assertEqual(exitcode, -1)
+        self.assertIn("timed out", stderr)
+
+    
+    def test_fingerprint_ignores_formatting(self):
+        """Test that whitespace and comments don't change the fingerprint"""
+        a = CodeRunner.fingerprint("x = 1\nprint(x)\n")
+        b = CodeRunner.fingerprint("# comment\nx  =  1\n\n\nprint( x )   \n")
+        c = CodeRunner.fingerprint("x = 2\nprint(x)\n")
+        
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+    
+    def test_memoized_result_reused(self):
+        """Test that a program differing only in trailing whitespace is not run twice"""
+        first = self.runner.execute("import sys\nsys.exit(3)")
+        second = self.runner.execute("import sys   \r\nsys.exit(3)\n\n")
+        
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.exitcode, 3)
+        self.assertIn("wall_time", second.usage)
+    
+    def test_moved_lines_not_memoized_together(self):
+        """Test that a reformatted program reports its own line numbers"""
+        self.runner.execute("x = 1\nraise ValueError(x)")
+        result = self.runner.execute("# a\n\n# b\nx = 1\nraise ValueError(x)")
+        self.assertFalse(result.cached)
+        self.assertIn("line 5", result.stderr)
+    
+    def test_timeout_not_memoized(self):
+        """Test that a run killed by the timeout is tried again next time"""
+        self.runner.timeout = 0.5
+        result = self.runner.execute("import time\ntime.sleep(5)")
+        self.assertEqual(result.usage['kill_reason'], "timeout")
+        self.assertIsNone(self.runner.lookup("import time\ntime.sleep(5)"))
+    
+    def test_memoized_output_replayed(self):
+        self.runner.execute("print('hi')")
+        chunks = []
+        result = self.runner.execute("print('hi')", on_output=lambda text, name: chunks.append((text, name)))
+        self.assertTrue(result.cached)
+        self.assertEqual(chunks, [("hi\n", "stdout")])
+    
+    def test_memo_is_per_limit_profile(self):
+        """Test that results don't leak between different resource limits"""
+        self.runner.execute("print('a')")
+        self.runner.memory_limit_mb = 512
+        self.assertIsNone(self.runner.lookup("print('a')"))
+    
+    def test_cancelled_run_not_memoized(self):
+        """Test that a cancelled run leaves no memo entry"""
+        import threading
+        
+        cancel_event = threading.Event()
+        cancel_event.set()
+        self.runner.execute("print('x')", cancel_event=cancel_event)
+        self.assertIsNone(self.runner.lookup("print('x')"))
+    
+    def test_stdin(self):
+        """Test that stdin reaches the program and is part of the memo key"""
+        code = "a, b = map(int, input().split())\nprint(a + b)"
+        self.assertEqual(self.runner.execute(code, stdin="2 3\n").stdout, "5\n")
+        self.assertEqual(self.runner.execute(code, stdin="4 4\n").stdout, "8\n")
+        self.assertTrue(self.runner.execute(code, stdin="2 3\n").cached)
+        self.assertIsNone(self.runner.lookup(code))
+    
+    def test_from_config(self):
+        """Test that execution.toml resource limits reach the runner"""
+        runner = CodeRunner.from_config({'memoize': False}, {'cpu_limit': 2, 'memory_limit_mb': 128, 'timeout': 3})
+        self.assertEqual((runner.cpu_limit, runner.memory_limit_mb, runner.timeout), (2, 128, 3))
+        self.assertFalse(runner.memoize)
+        self.assertEqual(runner.backend, "subprocess")
+
+
+
+class TestWarmPoolRunner(TestCodeRunner):
+    """Run the same behavioural tests against the warm interpreter pool"""
+    
+    def setUp(self):
+        self.runner = CodeRunner(backend="pool", pool_size=1)
+    
+    def tearDown(self):
+        self.runner.close()
+    
+    def test_worker_used_once(self):
+        """Test that state never leaks between runs on warm workers"""
+        self.runner.memoize = False
+        self.runner.run_code("import os\nos.environ['LAPH_LEAK'] = '1'")
+        stdout, stderr, exitcode = self.runner.run_code("import os\nprint(os.environ.get('LAPH_LEAK'))")
+        self.assertEqual(stdout.strip(), "None")
+    
+    def test_closed_pool_leaves_no_exit_handler(self):
+        """Test that closing a runner's pool drops the pool's atexit handler"""
+        from unittest import mock
+        
+        runner = CodeRunner(backend="pool", pool_size=1)
+        with mock.patch("core.warm_pool.atexit") as exit_hooks:
+            runner.run_code("print(1)")
+            pool = runner._pool
+            runner.close()
+        exit_hooks.register.assert_called_once_with(pool.close)
+        exit_hooks.unregister.assert_called_with(pool.close)
+    
+    def test_main_guard_and_traceback_source(self):
+        """Test that programs run as __main__ and tracebacks show source lines"""
+        stdout, stderr, exitcode = self.runner.run_code("if __name__ == '__main__':\n    print('main')\n    1 / 0")
+        self.assertIn("main", stdout)
+        self.assertIn("ZeroDivisionError", stderr)
+        self.assertIn("1 / 0", stderr)
+        self.assertNotIn("exec(compile", stderr)
+    
+    def test_memory_limit_applies(self):
+        """Test that warm workers still carry the address-space rlimit"""
+        runner = CodeRunner(backend="pool", pool_size=1, memory_limit_mb=64)
+        stdout, stderr, exitcode = runner.run_code("x = bytearray(256 * 1024 * 1024)")
+        runner.close()
+        self.assertNotEqual(exitcode, 0)
+        self.assertIn("MemoryError", stderr)
+
+
+
+class TestResourceUsage(unittest.TestCase):
+    
+    backend = "subprocess"
+    
+    def runner(self, **limits):
+        runner = CodeRunner(backend=self.backend, pool_size=1, memoize=False, **limits)
+        self.addCleanup(runner.close)
+        return runner
+    
+    def test_usage_of_normal_run(self):
+        result = self.runner().execute("data = b'x' * (64 * 1024 * 1024)\nprint(len(data))")
+        usage = result.usage
+        self.assertEqual(result.exitcode, 0)
+        self.assertGreater(usage["peak_rss_mb"], 60)
+        self.assertGreaterEqual(usage["user_time"] + usage["sys_time"], 0)
+        self.assertIsNone(usage["kill_reason"])
+        self.assertIn("peak RSS", format_usage(usage))
+    
+    def test_memory_limit_reported(self):
+        """Test that hitting RLIMIT_AS is reported as such, not just as a MemoryError"""
+        result = self.runner(memory_limit_mb=64).execute("x = b'x' * (256 * 1024 * 1024)")
+        self.assertEqual(result.usage["kill_reason"], "memory_limit")
+        self.assertIn("MemoryError", result.stderr)
+        self.assertIn("[Resource limit] Ran out of memory: the 64 MB memory limit was reached", result.stderr)
+    
+    def test_cpu_limit_reported(self):
+        result = self.runner(cpu_limit=1, timeout=10).execute("while True: pass")
+        self.assertEqual(result.usage["kill_reason"], "cpu_limit")
+        self.assertEqual(result.usage["signal"], "SIGXCPU")
+        self.assertGreaterEqual(result.usage["user_time"] + result.usage["sys_time"], 0.9)
+        self.assertIn("CPU time limit", result.stderr)
+    
+    def test_signal_reported(self):
+        result = self.runner().execute("import os, signal\nos.kill(os.getpid(), signal.SIGSEGV)")
+        self.assertEqual(result.exitcode, -11)
+        self.assertEqual((result.usage["kill_reason"], result.usage["signal"]), ("signal", "SIGSEGV"))
+        self.assertIn("killed by SIGSEGV", result.stderr)
+    
+    def test_timeout_keeps_partial_output(self):
+        result = self.runner(timeout=1).execute("import time\nprint('started', flush=True)\ntime.sleep(5)")
+        self.assertEqual(result.exitcode, -1)
+        self.assertEqual(result.stdout, "started\n")
+        self.assertEqual(result.usage["kill_reason"], "timeout")
+        self.assertIn("timed out after 1 seconds", result.stderr)
+
+    
+    def test_output_limit_kills_program(self):
+        """Test that a program printing in a tight loop is killed once over the cap, keeping head and tail"""
+        runner = self.runner(timeout=10, max_output_bytes=256 * 1024, keep_output_bytes=1024)
+        start = time.monotonic()
+        result = runner.execute("print('first')\nwhile True:\n    print('spam' * 20)")
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(result.exitcode, -1)
+        self.assertEqual(result.usage["kill_reason"], "output_limit")
+        self.assertIn("more than 262144 bytes of output", result.stderr)
+        self.assertTrue(result.stdout.startswith("first\n"))
+        self.assertIn("bytes of output omitted", result.stdout)
+        self.assertLess(len(result.stdout), 1200)
+    
+    def test_output_streamed_while_running(self):
+        chunks = []
+        code = "import time\nprint('tick', flush=True)\ntime.sleep(0.5)\nprint('tock')\nraise SystemExit('bye')"
+        start = time.monotonic()
+        result = self.runner().execute(code, on_output=lambda text, name: chunks.append((time.monotonic() - start, text, name)))
+        self.assertEqual(result.stdout, "tick\ntock\n")
+        self.assertEqual("".join(text for _, text, name in chunks if name == "stdout"), result.stdout)
+        self.assertEqual("".join(text for _, text, name in chunks if name == "stderr"), "bye\n")
+        # The first line arrived before the program finished
+        self.assertLess(chunks[0][0], 0.4)
+
+
+class TestOutputCapture(unittest.TestCase):
+    
+    def test_small_output_kept_whole(self):
+        capture = OutputCapture(10)
+        capture.feed(b"abc")
+        capture.feed(b"defg")
+        self.assertEqual(capture.getvalue(), b"abcdefg")
+    
+    def test_head_and_tail(self):
+        capture = OutputCapture(8)
+        for chunk in (b"0123", b"4567", b"89ab", b"cdef"):
+            capture.feed(chunk)
+        self.assertEqual(capture.getvalue(), b"0123\n... [8 bytes of output omitted] ...\ncdef")
+        self.assertLessEqual(capture.tail_size, 8)
+        self.assertEqual(capture.total, 16)
+
+    def test_tiny_keep_size(self):
+        """Test that keeping fewer than two bytes drops output instead of failing"""
+        expected = {0: b"\n... [8 bytes of output omitted] ...\n", 1: b"\n... [7 bytes of output omitted] ...\n7"}
+        for keep, value in expected.items():
+            capture = OutputCapture(keep)
+            capture.feed(b"0123")
+            capture.feed(b"4567")
+            self.assertEqual(capture.getvalue(), value)
+        self.assertEqual(CodeRunner.from_config({'keep_output_bytes': 0}, {}).keep_output_bytes, 2)
+
+
+class TestWarmPoolResourceUsage(TestResourceUsage):
+    
+    backend = "pool"
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,60 @@
+import threading
+import unittest
+from core.stream_buffer import StreamBuffer
+
+
+class TestStreamBuffer(unittest.TestCase):
+
+    def test_coalesces_per_target(self):
+        """Test that chunks are joined per target in arrival order"""
+        buffer = StreamBuffer()
+        for chunk in ["pri", "nt(", "1)"]:
+            buffer.put("coder", chunk)
+            buffer.put("log", chunk)
+        buffer.put("thinker", "spec")
+
+        texts, calls = buffer.drain()
+        self.assertEqual(texts, {"coder": "print(1)", "log": "print(1)", "thinker": "spec"})
+        self.assertEqual(calls, [])
+        self.assertEqual(buffer.drain(), ({}, []))
+
+    def test_calls_are_queued_in_order(self):
+        """Test that UI calls are returned in order for the Tk thread"""
+        buffer = StreamBuffer()
+        results = []
+        buffer.call(results.append, 1)
+        buffer.call(results.append, 2)
+        _, calls = buffer.drain()
+        for function, args, kwargs in calls:
+            function(*args, **kwargs)
+        self.assertEqual(results, [1, 2])
+
+    def test_clear_drops_text(self):
+        """Test that clear drops pending text"""
+        buffer = StreamBuffer()
+        buffer.put("log", "stale")
+        buffer.clear()
+        self.assertEqual(buffer.drain()[0], {})
+
+    def test_concurrent_producers(self):
+        """Test that no chunk is lost with several producer threads"""
+        buffer = StreamBuffer()
+
+        def produce():
+            for _ in range(1000):
+                buffer.put("log", "x")
+
+        threads = [threading.Thread(target=produce) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        collected = []
+        while any(thread.is_alive() for thread in threads):
+            collected.append(buffer.drain()[0].get("log", ""))
+        for thread in threads:
+            thread.join()
+        collected.append(buffer.drain()[0].get("log", ""))
+        self.assertEqual(len(''.join(collected)), 4000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from core.runner import CodeRunner
+from core.tracing import Tracer, NULL_SPAN
+from tests.test_repair_loop import ScriptedModel, make_loop
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix="laph-traces-")
+        self.tracer = Tracer(enabled=True, output_dir=self.output_dir, formats=("chrome", "jsonl"))
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def test_disabled_tracer_records_nothing(self):
+        """Test that a disabled tracer hands out the shared no-op span"""
+        tracer = Tracer(enabled=False, output_dir=self.output_dir)
+        with tracer.span("coder", size=3) as span:
+            span.first_token()
+            span.set(chunks=1)
+        self.assertIs(span, NULL_SPAN)
+        self.assertEqual(tracer.spans, [])
+        self.assertEqual(tracer.export("run"), [])
+
+    def test_nested_spans_record_parent_and_ttft(self):
+        """Test that spans nest per thread and keep attributes"""
+        with self.tracer.span("task") as outer:
+            with self.tracer.span("coder", prompt_chars=10) as inner:
+                inner.first_token()
+                inner.set(output_chars=42)
+
+        self.assertEqual(inner.parent, outer.span_id)
+        self.assertIsNone(outer.parent)
+        self.assertIsNotNone(inner.ttft)
+        self.assertEqual(inner.attrs, {"prompt_chars": 10, "output_chars": 42})
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def test_spans_on_other_threads_are_roots(self):
+        """Test that a span opened on a worker thread doesn't nest under another thread's span"""
+        with self.tracer.span("task"):
+            worker = threading.Thread(target=lambda: self.tracer.span("candidate").__enter__().__exit__(None, None, None))
+            worker.start()
+            worker.join()
+        candidate = next(s for s in self.tracer.spans if s.name == "candidate")
+        self.assertIsNone(candidate.parent)
+
+    def test_exception_is_recorded(self):
+        """Test that a failing stage is recorded with its error"""
+        with self.assertRaises(ValueError):
+            with self.tracer.span("validation"):
+                raise ValueError("bad code")
+        self.assertEqual(self.tracer.spans[0].attrs["error"], "ValueError: bad code")
+
+    def test_export_formats(self):
+        """Test JSONL and Chrome trace-event export"""
+        with self.tracer.span("thinker", model="m") as span:
+            span.first_token()
+        paths = self.tracer.export("run")
+
+        jsonl_path = os.path.join(self.output_dir, "run.jsonl")
+        chrome_path = os.path.join(self.output_dir, "run.trace.json")
+        self.assertEqual(sorted(paths), sorted([jsonl_path, chrome_path]))
+
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records[0]["name"], "thinker")
+        self.assertEqual(records[0]["attrs"], {"model": "m"})
+
+        with open(chrome_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)["traceEvents"]
+        complete = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(complete[0]["name"], "thinker")
+        self.assertIn("ttft_ms", complete[0]["args"])
+        self.assertTrue(any(e["ph"] == "i" for e in events))
+
+    def test_runner_execution_span(self):
+        """Test that CodeRunner records an execution span per run"""
+        runner = CodeRunner(tracer=self.tracer)
+        runner.execute("print('hi')")
+        runner.execute("print('hi')")
+        spans = [s for s in self.tracer.spans if s.name == "execution"]
+        self.assertEqual([s.attrs["cached"] for s in spans], [False, True])
+        self.assertEqual(spans[0].attrs["stdout_chars"], 3)
+        self.assertEqual(spans[0].attrs["exitcode"], 0)
+
+    def test_repair_loop_stages(self):
+        """Test that a repair run produces one span per stage and a trace file"""
+        loop = make_loop(self)
+        loop.tracer = self.tracer
+        loop.runner.tracer = self.tracer
+        loop.models['thinker'] = ScriptedModel("Print a greeting.")
+        loop.models['coder'] = ScriptedModel("print('hello')\n")
+
+        loop.run_task("greet", max_iters=1, candidates=1)
+
+        names = [s.name for s in sorted(self.tracer.spans, key=lambda s: s.start)]
+        self.assertEqual(
+            names,
+            ["task", "iteration", "compaction", "thinker", "compaction", "coder",
+             "extraction", "validation", "sanitize", "execution"]
+        )
+        self.assertEqual(len(loop.last_run_stats["trace"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()